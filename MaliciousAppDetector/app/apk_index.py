@@ -0,0 +1,307 @@
+# app/apk_index.py
+"""Zero-extraction index of an APK's zip entries.
+
+The central directory is parsed straight out of a read-only mmap of the APK.
+Entry data is only touched on demand: `read()` inflates one entry in memory
+and `sha256()` streams it through zlib in chunks, so nothing is ever written
+to disk. Indexes are cached per file (path + size + mtime), giving manifest
+parsing, signature reading, triage and fingerprinting one shared view.
+"""
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+
+APK_INDEX_CACHE_SIZE = int(os.getenv("APK_INDEX_CACHE_SIZE", "32"))
+HASH_CHUNK_SIZE = 1024 * 1024
+
+_EOCD = struct.Struct("<4sHHHHIIH")             # end of central directory record
+_ZIP64_LOCATOR = struct.Struct("<4sIQI")
+_ZIP64_EOCD = struct.Struct("<4sQHHIIQQQQ")
+_CENTRAL = struct.Struct("<4sHHHHHHIIIHHHHHII")  # central directory file header
+_LOCAL = struct.Struct("<4sHHHHHIIIHH")          # local file header
+
+STORED = 0
+DEFLATED = 8
+
+
+class ApkIndexError(ValueError):
+    pass
+
+
+class ApkEntryTooLarge(ApkIndexError):
+    """An entry declares or inflates to more bytes than the caller allowed (e.g. a zip bomb)."""
+
+
+def _entry_kind(name):
+    lower = name.lower()
+    if lower.endswith(".dex"):
+        return "dex"
+    if lower.endswith(".so"):
+        return "so"
+    if lower.endswith((".apk", ".jar", ".zip")):
+        return "archive"
+    return None
+
+
+class ApkIndex:
+    """Central-directory view of one APK. Use `open_apk_index` to get the shared cached instance."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._readers = 0  # threads currently reading entry data; close() waits for them
+        self._close_pending = False
+        self._mm = None
+        self._file = open(path, "rb")
+        try:
+            self.size = os.fstat(self._file.fileno()).st_size
+            if self.size < _EOCD.size:
+                raise ApkIndexError(f"{path} is too small to be a zip archive")
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.cd_offset, self.entries = self._read_central_directory()
+        except BaseException:
+            self.close()
+            raise
+        self._by_name = {e["name"]: e for e in self.entries}
+
+    # --- central directory ---
+    def _read_central_directory(self):
+        mm = self._mm
+        eocd = mm.rfind(b"PK\x05\x06", max(0, self.size - 65535 - _EOCD.size))
+        if eocd < 0:
+            raise ApkIndexError(f"{self.path}: no end-of-central-directory record")
+        _, _, _, _, count, cd_size, cd_offset, _ = _EOCD.unpack_from(mm, eocd)
+        if cd_offset == 0xFFFFFFFF or count == 0xFFFF:
+            loc = eocd - _ZIP64_LOCATOR.size
+            sig, _, z64_offset, _ = _ZIP64_LOCATOR.unpack_from(mm, loc)
+            if sig != b"PK\x06\x07":
+                raise ApkIndexError(f"{self.path}: ZIP64 locator missing")
+            fields = _ZIP64_EOCD.unpack_from(mm, z64_offset)
+            count, cd_size, cd_offset = fields[7], fields[8], fields[9]
+        if cd_offset + cd_size > self.size:
+            raise ApkIndexError(f"{self.path}: central directory runs past end of file")
+
+        entries = []
+        pos = cd_offset
+        for _ in range(count):
+            (sig, _, _, flags, method, _, _, crc, csize, usize,
+             n_name, n_extra, n_comment, _, _, _, offset) = _CENTRAL.unpack_from(mm, pos)
+            if sig != b"PK\x01\x02":
+                raise ApkIndexError(f"{self.path}: corrupt central directory at {pos}")
+            name_start = pos + _CENTRAL.size
+            name = mm[name_start:name_start + n_name].decode("utf-8" if flags & 0x800 else "cp437", "replace")
+            if 0xFFFFFFFF in (csize, usize, offset):
+                usize, csize, offset = self._zip64_sizes(name_start + n_name, n_extra, usize, csize, offset)
+            entries.append({
+                "name": name,
+                "method": method,
+                "crc32": crc,
+                "compressed_size": csize,
+                "size": usize,
+                "ratio": round(usize / csize, 3) if csize else None,
+                "header_offset": offset,
+                "kind": _entry_kind(name),
+            })
+            pos = name_start + n_name + n_extra + n_comment
+        return cd_offset, entries
+
+    def _zip64_sizes(self, extra_pos, n_extra, usize, csize, offset):
+        end = extra_pos + n_extra
+        while extra_pos + 4 <= end:
+            tag, length = struct.unpack_from("<HH", self._mm, extra_pos)
+            if tag == 0x0001:
+                values = iter(struct.unpack_from(f"<{length // 8}Q", self._mm, extra_pos + 4))
+                usize = next(values) if usize == 0xFFFFFFFF else usize
+                csize = next(values) if csize == 0xFFFFFFFF else csize
+                offset = next(values) if offset == 0xFFFFFFFF else offset
+                break
+            extra_pos += 4 + length
+        return usize, csize, offset
+
+    # --- entry data ---
+    def __contains__(self, name):
+        return name in self._by_name
+
+    def entry(self, name):
+        try:
+            return self._by_name[name]
+        except KeyError:
+            raise KeyError(f"{self.path} has no entry {name}") from None
+
+    @contextmanager
+    def _reading(self):
+        with self._lock:
+            if self._mm is None or self._close_pending:
+                raise ApkIndexError(f"{self.path}: index was closed")
+            self._readers += 1
+        try:
+            yield self._mm
+        finally:
+            with self._lock:
+                self._readers -= 1
+                if self._close_pending and not self._readers:
+                    self._release()
+
+    def _data_span(self, entry):
+        sig, *_, n_name, n_extra = _LOCAL.unpack_from(self._mm, entry["header_offset"])
+        if sig != b"PK\x03\x04":
+            raise ApkIndexError(f"{self.path}: bad local header for {entry['name']}")
+        # Lengths come from the local header: Android does the same, and they may differ from the central copy
+        start = entry["header_offset"] + _LOCAL.size + n_name + n_extra
+        return start, start + entry["compressed_size"]
+
+    def iter_chunks(self, name, chunk_size=HASH_CHUNK_SIZE):
+        """Yield the uncompressed bytes of an entry in bounded chunks."""
+        entry = self.entry(name)
+        with self._reading() as mm:
+            start, end = self._data_span(entry)
+            if entry["method"] == STORED:
+                for pos in range(start, end, chunk_size):
+                    yield mm[pos:min(pos + chunk_size, end)]
+            elif entry["method"] == DEFLATED:
+                inflater = zlib.decompressobj(-15)
+                for pos in range(start, end, chunk_size):
+                    # max_length bounds each output chunk even for highly compressible entries
+                    data = inflater.decompress(mm[pos:min(pos + chunk_size, end)], chunk_size)
+                    while True:
+                        if data:
+                            yield data
+                        if not inflater.unconsumed_tail:
+                            break
+                        data = inflater.decompress(inflater.unconsumed_tail, chunk_size)
+                tail = inflater.flush()
+                if tail:
+                    yield tail
+            else:
+                raise ApkIndexError(f"{self.path}: {name} uses unsupported compression method {entry['method']}")
+
+    def read(self, name, max_size=None):
+        """Inflate one entry into memory; with `max_size`, refuse entries declaring or inflating to more bytes."""
+        if max_size is None:
+            return b"".join(self.iter_chunks(name))
+        entry = self.entry(name)
+        if entry["size"] > max_size:
+            raise ApkEntryTooLarge(f"{self.path}: {name} declares {entry['size']} bytes (limit {max_size})")
+        # The declared size is attacker-controlled, so the inflated bytes are counted too
+        chunks, total = [], 0
+        for chunk in self.iter_chunks(name, chunk_size=min(HASH_CHUNK_SIZE, max_size + 1)):
+            total += len(chunk)
+            if total > max_size:
+                raise ApkEntryTooLarge(f"{self.path}: {name} inflates past {max_size} bytes")
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    def read_range(self, start, end):
+        """Raw bytes of the archive itself (e.g. the APK Signing Block before the central directory)."""
+        with self._reading() as mm:
+            return mm[max(0, start):min(end, self.size)]
+
+    def sha256(self, name):
+        """SHA-256 of an entry's uncompressed content, streamed and cached; also checks its CRC."""
+        entry = self.entry(name)
+        with self._lock:
+            if "sha256" in entry:
+                return entry["sha256"]
+        h = hashlib.sha256()
+        crc = 0
+        for chunk in self.iter_chunks(name):
+            h.update(chunk)
+            crc = zlib.crc32(chunk, crc)
+        with self._lock:
+            entry["sha256"] = h.hexdigest()
+            entry["crc_ok"] = crc == entry["crc32"]
+        return entry["sha256"]
+
+    def code_hashes(self, kinds=("dex", "so")):
+        """{entry name: sha256} for every DEX / native library entry, hashed lazily on first call."""
+        return {e["name"]: self.sha256(e["name"]) for e in self.entries if e["kind"] in kinds}
+
+    # --- summary ---
+    def summary(self):
+        dex = [e for e in self.entries if e["kind"] == "dex"]
+        so = [e for e in self.entries if e["kind"] == "so"]
+        total = sum(e["size"] for e in self.entries)
+        compressed = sum(e["compressed_size"] for e in self.entries)
+        return {
+            "entries": len(self.entries),
+            "uncompressed_bytes": total,
+            "compressed_bytes": compressed,
+            "ratio": round(total / compressed, 3) if compressed else None,
+            "dex_files": len(dex),
+            "dex_bytes": sum(e["size"] for e in dex),
+            "native_libraries": len(so),
+            "abis": sorted({e["name"].split("/")[1] for e in so if e["name"].startswith("lib/")
+                            and e["name"].count("/") >= 2}),
+            # DEX outside the root, or archives bundled as assets, are common droppers' payload spots
+            "hidden_dex": [e["name"] for e in dex if "/" in e["name"]],
+            "nested_archives": [e["name"] for e in self.entries if e["kind"] == "archive"],
+        }
+
+    def close(self):
+        """Unmap the APK, or once the last in-flight reader finishes if some are still reading."""
+        with self._lock:
+            if self._readers:
+                self._close_pending = True
+                return
+            self._release()
+
+    def _release(self):
+        mm, self._mm = getattr(self, "_mm", None), None
+        if mm is not None:
+            mm.close()
+        if getattr(self, "_file", None) is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _cache_key(path):
+    st = os.stat(path)
+    return os.path.realpath(path), st.st_size, st.st_mtime_ns
+
+
+def open_apk_index(path):
+    """Shared ApkIndex for `path`; re-parsed only when the file changes. Do not close it yourself."""
+    key = _cache_key(path)
+    with _cache_lock:
+        index = _cache.get(key)
+        if index is not None:
+            _cache.move_to_end(key)
+            return index
+    index = ApkIndex(path)
+    with _cache_lock:
+        existing = _cache.get(key)
+        if existing is not None:  # another thread indexed it meanwhile
+            index.close()
+            return existing
+        _cache[key] = index
+        while len(_cache) > APK_INDEX_CACHE_SIZE:
+            # Not closed here: another thread may still be reading it; the mmap goes with the last reference
+            _cache.popitem(last=False)
+    return index
+
+
+def evict_apk_index(path):
+    """Drop cached indexes of `path` (call before deleting the APK).
+
+    Threads still reading one (e.g. triage of a request that was cancelled)
+    finish first; the mmap is released when the last of them is done.
+    """
+    real = os.path.realpath(path)
+    with _cache_lock:
+        for key in [k for k in _cache if k[0] == real]:
+            _cache.pop(key).close()
@@ -0,0 +1,285 @@
+# app/apk_manifest.py
+"""Decoder for the binary XML (AXML) AndroidManifest.xml inside an APK.
+
+Only the manifest entry is read from the zip; nothing is extracted and no
+Android tooling is needed.
+"""
+import os
+import struct
+
+from app.apk_index import ApkEntryTooLarge, open_apk_index
+
+MANIFEST_ENTRY = "AndroidManifest.xml"
+MANIFEST_MAX_SIZE = int(os.getenv("MANIFEST_MAX_SIZE", str(4 * 1024 * 1024)))  # real manifests are a few KB
+ANDROID_NS = "http://schemas.android.com/apk/res/android"
+
+# Chunk types (frameworks/base/libs/androidfw/include/androidfw/ResourceTypes.h)
+RES_STRING_POOL_TYPE = 0x0001
+RES_XML_TYPE = 0x0003
+RES_XML_START_NAMESPACE_TYPE = 0x0100
+RES_XML_END_NAMESPACE_TYPE = 0x0101
+RES_XML_START_ELEMENT_TYPE = 0x0102
+RES_XML_END_ELEMENT_TYPE = 0x0103
+RES_XML_RESOURCE_MAP_TYPE = 0x0180
+UTF8_FLAG = 0x100
+
+# Res_value data types
+TYPE_NULL = 0x00
+TYPE_REFERENCE = 0x01
+TYPE_STRING = 0x03
+TYPE_FLOAT = 0x04
+TYPE_INT_DEC = 0x10
+TYPE_INT_HEX = 0x11
+TYPE_INT_BOOLEAN = 0x12
+
+# android:* attribute resource ids. Obfuscators blank the attribute name strings,
+# but the framework resolves attributes by id, so these are authoritative.
+ANDROID_ATTRS = {
+    0x01010003: "name",
+    0x01010006: "permission",
+    0x01010010: "exported",
+    0x0101000f: "debuggable",
+    0x0101020c: "minSdkVersion",
+    0x0101021b: "versionCode",
+    0x0101021c: "versionName",
+    0x01010270: "targetSdkVersion",
+    0x01010271: "maxSdkVersion",
+    0x01010280: "allowBackup",
+    0x010104ec: "usesCleartextTraffic",
+}
+
+# Permissions MobSF reports with status "dangerous"
+DANGEROUS_PERMISSIONS = frozenset(f"android.permission.{p}" for p in (
+    "READ_CALENDAR", "WRITE_CALENDAR", "CAMERA", "READ_CONTACTS", "WRITE_CONTACTS", "GET_ACCOUNTS",
+    "ACCESS_FINE_LOCATION", "ACCESS_COARSE_LOCATION", "ACCESS_BACKGROUND_LOCATION", "ACCESS_MEDIA_LOCATION",
+    "RECORD_AUDIO", "READ_PHONE_STATE", "READ_PHONE_NUMBERS", "CALL_PHONE", "ANSWER_PHONE_CALLS",
+    "READ_CALL_LOG", "WRITE_CALL_LOG", "ADD_VOICEMAIL", "USE_SIP", "PROCESS_OUTGOING_CALLS",
+    "BODY_SENSORS", "BODY_SENSORS_BACKGROUND", "SEND_SMS", "RECEIVE_SMS", "READ_SMS", "RECEIVE_WAP_PUSH",
+    "RECEIVE_MMS", "READ_EXTERNAL_STORAGE", "WRITE_EXTERNAL_STORAGE", "MANAGE_EXTERNAL_STORAGE",
+    "ACTIVITY_RECOGNITION", "ACCEPT_HANDOVER", "UWB_RANGING", "NEARBY_WIFI_DEVICES", "BLUETOOTH_SCAN",
+    "BLUETOOTH_CONNECT", "BLUETOOTH_ADVERTISE", "POST_NOTIFICATIONS", "READ_MEDIA_IMAGES",
+    "READ_MEDIA_VIDEO", "READ_MEDIA_AUDIO", "READ_MEDIA_VISUAL_USER_SELECTED",
+    "SYSTEM_ALERT_WINDOW", "WRITE_SETTINGS", "REQUEST_INSTALL_PACKAGES",
+))
+
+_CHUNK = struct.Struct("<HHI")
+_STRING_POOL = struct.Struct("<IIIII")  # stringCount, styleCount, flags, stringsStart, stylesStart
+_START_ELEMENT = struct.Struct("<IIHHHHHH")
+_ATTRIBUTE = struct.Struct("<IIIHBBI")
+
+
+class ManifestParseError(ValueError):
+    pass
+
+
+def _decode_string_pool(buf, start, header_size):
+    count, _, flags, strings_start, _ = _STRING_POOL.unpack_from(buf, start + 8)
+    offsets = struct.unpack_from(f"<{count}I", buf, start + header_size)
+    base = start + strings_start
+    utf8 = flags & UTF8_FLAG
+    strings = []
+    for off in offsets:
+        pos = base + off
+        if utf8:
+            # UTF-16 length (skipped), then UTF-8 byte length; each 1 or 2 bytes
+            pos += 2 if buf[pos] & 0x80 else 1
+            n = buf[pos]
+            if n & 0x80:
+                n = ((n & 0x7F) << 8) | buf[pos + 1]
+                pos += 1
+            pos += 1
+            strings.append(bytes(buf[pos:pos + n]).decode("utf-8", "replace"))
+        else:
+            n = struct.unpack_from("<H", buf, pos)[0]
+            pos += 2
+            if n & 0x8000:
+                n = ((n & 0x7FFF) << 16) | struct.unpack_from("<H", buf, pos)[0]
+                pos += 2
+            strings.append(bytes(buf[pos:pos + 2 * n]).decode("utf-16-le", "replace"))
+    return strings
+
+
+def _typed_value(strings, raw, data_type, data):
+    if data_type == TYPE_STRING:
+        return strings[data] if data < len(strings) else ""
+    if data_type == TYPE_INT_BOOLEAN:
+        return data != 0
+    if data_type in (TYPE_INT_DEC, TYPE_INT_HEX):
+        return data - (1 << 32) if data & 0x80000000 else data
+    if data_type == TYPE_FLOAT:
+        return struct.unpack("<f", struct.pack("<I", data))[0]
+    if data_type == TYPE_REFERENCE:
+        return f"@0x{data:08x}"
+    if raw != 0xFFFFFFFF and raw < len(strings):
+        return strings[raw]
+    return None if data_type == TYPE_NULL else data
+
+
+def iter_elements(buf):
+    """Yield ("start", tag, attrs, depth) / ("end", tag, None, depth) events from AXML bytes.
+
+    Attributes in the android namespace (or resolved through the resource map)
+    are keyed as "android:<name>".
+    """
+    if len(buf) < 8:
+        raise ManifestParseError("Truncated binary XML")
+    kind, header_size, total = _CHUNK.unpack_from(buf, 0)
+    if kind != RES_XML_TYPE:
+        raise ManifestParseError(f"Not a binary XML document (chunk type 0x{kind:04x})")
+    end = min(total, len(buf))
+    strings, resource_ids = [], ()
+    depth = 0
+    pos = header_size
+    while pos + 8 <= end:
+        kind, header_size, size = _CHUNK.unpack_from(buf, pos)
+        if size < 8:
+            raise ManifestParseError(f"Corrupt chunk at {pos}")
+        if kind == RES_STRING_POOL_TYPE:
+            strings = _decode_string_pool(buf, pos, header_size)
+        elif kind == RES_XML_RESOURCE_MAP_TYPE:
+            resource_ids = struct.unpack_from(f"<{(size - header_size) // 4}I", buf, pos + header_size)
+        elif kind == RES_XML_START_ELEMENT_TYPE:
+            ext = pos + header_size
+            ns, name, attr_start, attr_size, attr_count, _, _, _ = _START_ELEMENT.unpack_from(buf, ext)
+            attrs = {}
+            for i in range(attr_count):
+                a_ns, a_name, raw, _, _, data_type, data = _ATTRIBUTE.unpack_from(
+                    buf, ext + attr_start + i * attr_size)
+                res_id = resource_ids[a_name] if a_name < len(resource_ids) else None
+                if res_id in ANDROID_ATTRS:
+                    key = f"android:{ANDROID_ATTRS[res_id]}"
+                else:
+                    key = strings[a_name] if a_name < len(strings) else f"attr{a_name}"
+                    if a_ns != 0xFFFFFFFF and a_ns < len(strings) and strings[a_ns] == ANDROID_NS:
+                        key = f"android:{key}"
+                attrs[key] = _typed_value(strings, raw, data_type, data)
+            yield "start", strings[name] if name < len(strings) else "", attrs, depth
+            depth += 1
+        elif kind == RES_XML_END_ELEMENT_TYPE:
+            depth -= 1
+            name = struct.unpack_from("<I", buf, pos + header_size + 4)[0]
+            yield "end", strings[name] if name < len(strings) else "", None, depth
+        pos += size
+
+
+def _bool(value):
+    if isinstance(value, str):
+        return value.lower() == "true"
+    return bool(value)
+
+
+def _sdk(value):
+    # Usually an int; preview builds use a codename string
+    if isinstance(value, str) and value.isdigit():
+        return int(value)
+    return value
+
+
+def _component_name(package, name):
+    if name and package and name.startswith("."):
+        return package + name
+    if name and package and "." not in name:
+        return f"{package}.{name}"
+    return name
+
+
+COMPONENT_TAGS = {
+    "activity": "activities",
+    "activity-alias": "activities",
+    "service": "services",
+    "receiver": "receivers",
+    "provider": "providers",
+}
+
+
+def parse_manifest(buf):
+    """Summarise a binary AndroidManifest.xml.
+
+    Returns package, version, SDK levels, requested permissions (and the
+    dangerous subset), application flags, the launcher activity and every
+    component with its effective exported state.
+    """
+    info = {
+        "package": None,
+        "version_code": None,
+        "version_name": None,
+        "min_sdk": None,
+        "target_sdk": None,
+        "max_sdk": None,
+        "permissions": [],
+        "debuggable": False,
+        "allow_backup": None,  # None = attribute absent (the platform then defaults to true)
+        "uses_cleartext_traffic": None,
+        "main_activity": None,
+        "components": {kind: [] for kind in dict.fromkeys(COMPONENT_TAGS.values())},
+    }
+    component = None  # component element currently open: (depth, record)
+    actions, categories = set(), set()
+    for event, tag, attrs, depth in iter_elements(buf):
+        if event == "end":
+            if component is not None and depth == component[0]:
+                record = component[1]
+                if record["exported"] is None:
+                    # Pre-Android 12 default: exported exactly when an intent-filter is declared
+                    record["exported"] = record.pop("has_intent_filter")
+                else:
+                    record.pop("has_intent_filter")
+                if (COMPONENT_TAGS.get(tag) == "activities" and info["main_activity"] is None and "android.intent.action.MAIN" in actions
+                        and "android.intent.category.LAUNCHER" in categories):
+                    info["main_activity"] = record["name"]
+                component = None
+            continue
+        if tag == "manifest" and depth == 0:
+            info["package"] = attrs.get("package")
+            info["version_code"] = attrs.get("android:versionCode")
+            info["version_name"] = attrs.get("android:versionName")
+        elif tag == "uses-sdk" and depth == 1:
+            info["min_sdk"] = _sdk(attrs.get("android:minSdkVersion"))
+            info["target_sdk"] = _sdk(attrs.get("android:targetSdkVersion"))
+            info["max_sdk"] = _sdk(attrs.get("android:maxSdkVersion"))
+        elif tag in ("uses-permission", "uses-permission-sdk-23") and depth == 1:
+            name = attrs.get("android:name")
+            if name and name not in info["permissions"]:
+                info["permissions"].append(name)
+        elif tag == "application" and depth == 1:
+            info["debuggable"] = _bool(attrs.get("android:debuggable"))
+            if "android:allowBackup" in attrs:
+                info["allow_backup"] = _bool(attrs["android:allowBackup"])
+            if "android:usesCleartextTraffic" in attrs:
+                info["uses_cleartext_traffic"] = _bool(attrs["android:usesCleartextTraffic"])
+        elif tag in COMPONENT_TAGS and depth == 2:
+            record = {
+                "name": _component_name(info["package"], attrs.get("android:name")),
+                "exported": _bool(attrs["android:exported"]) if "android:exported" in attrs else None,
+                "permission": attrs.get("android:permission"),
+                "has_intent_filter": False,
+            }
+            info["components"][COMPONENT_TAGS[tag]].append(record)
+            component = (depth, record)
+            actions, categories = set(), set()
+        elif component is not None:
+            if tag == "intent-filter":
+                component[1]["has_intent_filter"] = True
+            elif tag == "action":
+                actions.add(attrs.get("android:name"))
+            elif tag == "category":
+                categories.add(attrs.get("android:name"))
+    if info["package"] is None:
+        raise ManifestParseError("Manifest has no package attribute")
+    info["dangerous_permissions"] = [p for p in info["permissions"] if p in DANGEROUS_PERMISSIONS]
+    return info
+
+
+def read_manifest_bytes(apk_path):
+    """Return the raw AndroidManifest.xml entry (read via the central directory, nothing extracted)."""
+    index = open_apk_index(apk_path)
+    if MANIFEST_ENTRY not in index:
+        raise ManifestParseError(f"{apk_path} has no {MANIFEST_ENTRY}")
+    try:
+        return index.read(MANIFEST_ENTRY, max_size=MANIFEST_MAX_SIZE)
+    except ApkEntryTooLarge as e:
+        raise ManifestParseError(f"Unparseable manifest: {e}") from None
+
+
+def read_manifest(apk_path):
+    return parse_manifest(read_manifest_bytes(apk_path))
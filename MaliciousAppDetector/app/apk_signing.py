@@ -0,0 +1,215 @@
+# app/apk_signing.py
+"""Signer certificates of an APK, read in-process.
+
+Certificates come from the APK Signing Block (v2/v3 schemes, stored just before
+the zip central directory) and from v1 JAR signatures (PKCS#7 blocks under
+META-INF/). Only the DER structure needed to reach each certificate's subject,
+issuer, serial and validity is walked; signatures are not verified, this is
+for triage and reputation, not trust decisions.
+"""
+import hashlib
+import os
+import re
+import struct
+import zlib
+from datetime import datetime, timezone
+
+from app.apk_index import ApkEntryTooLarge, open_apk_index
+
+APK_SIG_BLOCK_MAGIC = b"APK Sig Block 42"
+SIGNATURE_SCHEMES = {
+    0x7109871A: "v2",
+    0xF05368C0: "v3",
+    0x1B93AD61: "v3.1",
+}
+_V1_SIGNATURE = re.compile(r"^META-INF/[^/]+\.(RSA|DSA|EC)$", re.IGNORECASE)
+
+# X.500 attribute OIDs, DER-encoded content bytes -> short name
+_NAME_OIDS = {
+    bytes.fromhex("550403"): "CN",
+    bytes.fromhex("550406"): "C",
+    bytes.fromhex("550407"): "L",
+    bytes.fromhex("550408"): "ST",
+    bytes.fromhex("55040a"): "O",
+    bytes.fromhex("55040b"): "OU",
+    bytes.fromhex("2a864886f70d010901"): "E",
+}
+DEBUG_CERT_SUBJECT = "CN=Android Debug"
+V1_SIGNATURE_MAX_SIZE = int(os.getenv("V1_SIGNATURE_MAX_SIZE", str(1024 * 1024)))  # PKCS#7 blocks are a few KB
+
+
+class SigningParseError(ValueError):
+    pass
+
+
+# --- DER ---
+def _der(buf, pos):
+    """Return (tag, content start, content end) of the DER element at `pos`."""
+    tag = buf[pos]
+    n = buf[pos + 1]
+    pos += 2
+    if n & 0x80:
+        k = n & 0x7F
+        n = int.from_bytes(buf[pos:pos + k], "big")
+        pos += k
+    if pos + n > len(buf):
+        raise SigningParseError("DER element runs past the end of its buffer")
+    return tag, pos, pos + n
+
+
+def _children(buf, start, end):
+    pos = start
+    while pos < end:
+        tag, c_start, c_end = _der(buf, pos)
+        yield tag, c_start, c_end, pos
+        pos = c_end
+
+
+def _name(buf, start, end):
+    parts = []
+    for _, rdn_start, rdn_end, _ in _children(buf, start, end):          # SET
+        for _, atv_start, atv_end, _ in _children(buf, rdn_start, rdn_end):  # SEQUENCE {oid, value}
+            (_, o_start, o_end, _), (v_tag, v_start, v_end, _) = list(_children(buf, atv_start, atv_end))[:2]
+            key = _NAME_OIDS.get(bytes(buf[o_start:o_end]), bytes(buf[o_start:o_end]).hex())
+            raw = bytes(buf[v_start:v_end])
+            value = raw.decode("utf-16-be" if v_tag == 0x1E else "utf-8", "replace")
+            parts.append(f"{key}={value}")
+    return ", ".join(parts)
+
+
+def _time(buf, tag, start, end):
+    text = bytes(buf[start:end]).decode("ascii").rstrip("Z")
+    fmt = "%y%m%d%H%M%S" if tag == 0x17 else "%Y%m%d%H%M%S"  # UTCTime / GeneralizedTime
+    try:
+        return datetime.strptime(text, fmt).replace(tzinfo=timezone.utc).isoformat()
+    except ValueError:
+        return None
+
+
+def parse_certificate(der):
+    """Summarise one DER X.509 certificate."""
+    _, c_start, c_end = _der(der, 0)
+    _, tbs_start, tbs_end, _ = next(_children(der, c_start, c_end))
+    fields = list(_children(der, tbs_start, tbs_end))
+    if fields and fields[0][0] == 0xA0:  # explicit [0] version
+        fields = fields[1:]
+    serial, _, issuer, validity, subject = fields[:5]
+    not_before, not_after = list(_children(der, validity[1], validity[2]))[:2]
+    subject_name = _name(der, subject[1], subject[2])
+    return {
+        "subject": subject_name,
+        "issuer": _name(der, issuer[1], issuer[2]),
+        "serial": "0x" + (bytes(der[serial[1]:serial[2]]).hex().lstrip("0") or "0"),
+        "not_before": _time(der, *not_before[:3]),
+        "not_after": _time(der, *not_after[:3]),
+        "sha256": hashlib.sha256(der).hexdigest(),
+        "sha1": hashlib.sha1(der).hexdigest(),
+        "is_debug": DEBUG_CERT_SUBJECT in subject_name,
+    }
+
+
+def pkcs7_certificates(data):
+    """DER certificates embedded in a PKCS#7 SignedData blob (META-INF/*.RSA and friends)."""
+    _, ci_start, ci_end = _der(data, 0)
+    content = [c for c in _children(data, ci_start, ci_end) if c[0] == 0xA0]
+    if not content:
+        raise SigningParseError("PKCS#7 ContentInfo has no content")
+    _, sd_start, sd_end = _der(data, content[0][1])
+    for tag, start, end, _ in _children(data, sd_start, sd_end):
+        if tag == 0xA0:  # [0] IMPLICIT certificates
+            return [bytes(data[hdr:c_end]) for _, _, c_end, hdr in _children(data, start, end)]
+    return []
+
+
+def _end_entity_certificates(ders):
+    """Drop chain certificates from a PKCS#7 bag: keep those that issued none of the others."""
+    if len(ders) < 2:
+        return ders
+    try:
+        parsed = [parse_certificate(d) for d in ders]
+    except (SigningParseError, IndexError, ValueError):
+        return ders[:1]
+    issuers = {c["issuer"] for c in parsed if c["issuer"] != c["subject"]}
+    return [d for d, c in zip(ders, parsed) if c["subject"] not in issuers] or ders[:1]
+
+
+# --- APK Signing Block ---
+def _length_prefixed(buf, pos):
+    n = struct.unpack_from("<I", buf, pos)[0]
+    return buf[pos + 4:pos + 4 + n], pos + 4 + n
+
+
+def _sequence(buf):
+    pos = 0
+    while pos < len(buf):
+        item, pos = _length_prefixed(buf, pos)
+        yield item
+
+
+def signing_block_pairs(index):
+    """Yield (id, value) pairs of the APK Signing Block, or nothing if the APK has none."""
+    cd_offset = index.cd_offset
+    if cd_offset < 32:
+        return
+    footer = index.read_range(cd_offset - 24, cd_offset)
+    if footer[8:] != APK_SIG_BLOCK_MAGIC:
+        return
+    block_size = struct.unpack_from("<Q", footer)[0]
+    if block_size > cd_offset - 8:
+        raise SigningParseError("APK Signing Block size exceeds its offset")
+    # From just after the leading size field up to the footer
+    block = index.read_range(cd_offset - block_size - 8, cd_offset - 24)
+    pos = 8
+    while pos + 12 <= len(block):
+        length, pair_id = struct.unpack_from("<QI", block, pos)
+        yield pair_id, block[pos + 12:pos + 8 + length]
+        pos += 8 + length
+
+
+def scheme_certificates(value):
+    """DER certificates from a v2/v3 signature scheme block (first certificate of each signer)."""
+    certs = []
+    signers, _ = _length_prefixed(value, 0)
+    for signer in _sequence(signers):
+        signed_data, _ = _length_prefixed(signer, 0)
+        _, pos = _length_prefixed(signed_data, 0)            # digests
+        certificates, _ = _length_prefixed(signed_data, pos)
+        # The rest of the list is the signer's chain (intermediates/CAs), which did not sign the APK
+        signer_cert = next(_sequence(certificates), None)
+        if signer_cert is not None:
+            certs.append(bytes(signer_cert))
+    return certs
+
+
+def read_signing_info(apk_path):
+    """Return {"schemes": [...], "certificates": [...]} for an APK, deduplicated by fingerprint."""
+    schemes, ders = [], []
+    index = open_apk_index(apk_path)
+    for pair_id, value in signing_block_pairs(index):
+        scheme = SIGNATURE_SCHEMES.get(pair_id)
+        if scheme:
+            schemes.append(scheme)
+            ders.extend(scheme_certificates(value))
+    for entry in index.entries:
+        if _V1_SIGNATURE.match(entry["name"]):
+            if "v1" not in schemes:
+                schemes.insert(0, "v1")
+            # A malformed or oversized block only loses its own certificates, not the v2/v3 signers
+            try:
+                data = index.read(entry["name"], max_size=V1_SIGNATURE_MAX_SIZE)
+                ders.extend(_end_entity_certificates(pkcs7_certificates(data)))
+            except ApkEntryTooLarge as e:
+                print(f"⚠️ Skipping oversized signature file: {e}")
+            except (SigningParseError, IndexError, ValueError, zlib.error) as e:
+                print(f"⚠️ Skipping unreadable signature file {entry['name']}: {e}")
+    certificates, seen = [], set()
+    for der in ders:
+        try:
+            cert = parse_certificate(der)
+        except (SigningParseError, IndexError, ValueError) as e:
+            print(f"⚠️ Skipping unreadable certificate: {e}")
+            continue
+        if cert["sha256"] not in seen:
+            seen.add(cert["sha256"])
+            certificates.append(cert)
+    return {"schemes": schemes, "certificates": certificates}
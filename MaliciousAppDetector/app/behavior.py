@@ -0,0 +1,110 @@
+# app/behavior.py
+import re
+from collections import Counter
+
+# Behavior category -> logcat keywords whose occurrences are summed for it
+BEHAVIOR_PATTERNS = {
+    "network_calls": ["http://", "https://"],
+    "file_operations": ["FileOutputStream", "FileInputStream"],
+    "sms_activity": ["SMS", "sendTextMessage"],
+    "location_access": ["LocationManager", "getLastKnownLocation"],
+    "camera_usage": ["Camera", "takePicture"],
+    "contacts_access": ["ContactsContract"],
+    "phone_calls": ["ACTION_CALL", "TelephonyManager"],
+    "permission_requests": ["permission"],
+    "crashes": ["FATAL EXCEPTION"],
+    "native_code": ["JNI", "native"],
+    "crypto_operations": ["Cipher", "encrypt"],
+    "database_operations": ["SQLite", "database"],
+}
+
+
+def _trie_pattern(keywords):
+    """Build a regex source whose alternation is factored into a prefix trie.
+
+    The regex engine then walks one branch per input position instead of
+    retrying every keyword, and a keyword that prefixes another still matches
+    longest-first.
+    """
+    trie = {}
+    for kw in keywords:
+        node = trie
+        for ch in kw:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def build(node):
+        end = "" in node
+        alts = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch != ""]
+        if not alts:
+            return ""
+        if len(alts) == 1 and not end:
+            return alts[0]
+        body = "(?:" + "|".join(alts) + ")"
+        return body + "?" if end else body
+
+    return build(trie)
+
+
+class PatternMatcher:
+    """Single-pass multi-keyword counter compiled from a {category: [keywords]} table.
+
+    All keywords are matched by one compiled automaton in a single scan of the
+    text. Like `str.count`, matches do not overlap; where two different keywords
+    overlap in the text, only the leftmost is counted.
+    """
+
+    def __init__(self, patterns=BEHAVIOR_PATTERNS):
+        self.patterns = patterns
+        self.category_of = {kw: category for category, kws in patterns.items() for kw in kws}
+        self.regex = re.compile(_trie_pattern(self.category_of))
+
+    def count(self, text, counts=None):
+        """Add per-category hit counts for `text` into `counts` (a Counter) and return it."""
+        counts = Counter() if counts is None else counts
+        hits = self.regex.findall(text)
+        if hits:
+            category_of = self.category_of
+            for kw, n in Counter(hits).items():
+                counts[category_of[kw]] += n
+        return counts
+
+
+DEFAULT_MATCHER = PatternMatcher()
+
+
+class BehaviorCounter:
+    """Accumulates behavior counts from logcat text fed incrementally (e.g. line by line).
+
+    This is the streaming path (LogcatStream): on short lines one regex pass
+    beats a `str.count` per keyword. Keywords never contain newlines, so
+    feeding a log one line at a time gives the same totals as counting over
+    the whole dump, barring text where two different keywords overlap.
+    """
+
+    def __init__(self, matcher=DEFAULT_MATCHER):
+        self.matcher = matcher
+        self.patterns = matcher.patterns
+        self.counts = Counter()
+        self.lines = 0
+        self.chars = 0
+
+    def feed(self, text):
+        self.lines += 1
+        self.chars += len(text)
+        self.matcher.count(text, self.counts)
+
+    def summary(self):
+        """Categories with at least one hit, in pattern-table order."""
+        return {k: self.counts[k] for k in self.patterns if self.counts[k] > 0}
+
+
+def count_behavior(logs, patterns=BEHAVIOR_PATTERNS):
+    """Counts for a whole logcat dump held in memory.
+
+    `str.count` per keyword runs at memchr speed over one big string and beats
+    the single-pass regex there (see benchmarks/bench_behavior.py), so whole
+    dumps keep it; BehaviorCounter is for streamed lines.
+    """
+    behavior = {k: sum(logs.count(kw) for kw in kws) for k, kws in patterns.items()}
+    return {k: v for k, v in behavior.items() if v > 0}
@@ -0,0 +1,176 @@
+# app/cert_reputation.py
+"""History of every signer certificate seen, keyed by its SHA-256 fingerprint.
+
+Each finished scan records which certificates signed the APK and the verdict
+it got; a lookup returns how many distinct APKs a certificate has signed, how
+many of them were malicious and when it was first/last seen. Lookups hit an
+in-memory LRU of hot fingerprints (unknown ones included) and otherwise one
+primary-key probe of a WITHOUT ROWID SQLite table, so they stay cheap with
+millions of certificates and can run right after triage, before MobSF.
+"""
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+CERT_REPUTATION_PATH = os.getenv(
+    "CERT_REPUTATION_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "cert_reputation.db"),
+)
+CERT_REPUTATION_HOT_SIZE = int(os.getenv("CERT_REPUTATION_HOT_SIZE", "100000"))
+
+_MOBSF_CERT = re.compile(r"^X\.509 Subject: (?P<subject>.*)$|^sha256: (?P<sha256>[0-9a-f]{64})$", re.MULTILINE)
+
+
+def mobsf_certificates(report):
+    """[{"sha256", "subject"}] from MobSF's certificate_info text, for scans whose triage failed."""
+    try:
+        info = report["static_analysis"]["full_report"]["certificate_analysis"]["certificate_info"]
+    except (KeyError, TypeError):
+        return []
+    certs, subject = [], None
+    for m in _MOBSF_CERT.finditer(info or ""):
+        if m.group("subject") is not None:
+            subject = m.group("subject")
+        else:
+            certs.append({"sha256": m.group("sha256"), "subject": subject})
+    return certs
+
+
+class CertReputation:
+    """Two-tier (LRU + SQLite) index of signer fingerprint -> aggregate scan history."""
+
+    def __init__(self, path=CERT_REPUTATION_PATH, hot_size=CERT_REPUTATION_HOT_SIZE):
+        self.hot_size = hot_size
+        self._hot = OrderedDict()  # fingerprint -> stats dict, or None for "never seen"
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS certificates ("
+            " fingerprint TEXT PRIMARY KEY,"
+            " subject TEXT,"
+            " apps_seen INTEGER NOT NULL,"
+            " malicious INTEGER NOT NULL,"
+            " first_seen REAL NOT NULL,"
+            " last_seen REAL NOT NULL) WITHOUT ROWID"
+        )
+        # Which APKs each certificate signed, so rescans are not double counted and labels can be corrected
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS signed_apps ("
+            " fingerprint TEXT NOT NULL,"
+            " sha256 TEXT NOT NULL,"
+            " malicious INTEGER NOT NULL,"
+            " confirmed INTEGER NOT NULL DEFAULT 0,"
+            " PRIMARY KEY (fingerprint, sha256)) WITHOUT ROWID"
+        )
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(signed_apps)")}
+        if "confirmed" not in columns:  # databases created before analyst labels were kept apart
+            self._db.execute("ALTER TABLE signed_apps ADD COLUMN confirmed INTEGER NOT NULL DEFAULT 0")
+        self._db.execute("CREATE INDEX IF NOT EXISTS signed_apps_sha256 ON signed_apps (sha256)")
+        self._db.commit()
+
+    @staticmethod
+    def _stats(row):
+        fingerprint, subject, apps_seen, malicious, first_seen, last_seen = row
+        return {
+            "fingerprint": fingerprint,
+            "subject": subject,
+            "apps_seen": apps_seen,
+            "malicious": malicious,
+            "malicious_ratio": round(malicious / apps_seen, 3) if apps_seen else 0.0,
+            "first_seen": first_seen,
+            "last_seen": last_seen,
+        }
+
+    def _remember(self, fingerprint, stats):
+        self._hot[fingerprint] = stats
+        self._hot.move_to_end(fingerprint)
+        while len(self._hot) > self.hot_size:
+            self._hot.popitem(last=False)
+
+    def _get(self, fingerprint):
+        if fingerprint in self._hot:
+            self._hot.move_to_end(fingerprint)
+            return self._hot[fingerprint]
+        row = self._db.execute(
+            "SELECT fingerprint, subject, apps_seen, malicious, first_seen, last_seen"
+            " FROM certificates WHERE fingerprint = ?", (fingerprint,)
+        ).fetchone()
+        stats = self._stats(row) if row else None
+        self._remember(fingerprint, stats)
+        return stats
+
+    def get(self, fingerprint):
+        """Stats for one fingerprint, or None if no scanned APK was signed with it."""
+        with self._lock:
+            return self._get(fingerprint.lower())
+
+    def lookup(self, fingerprints):
+        """{fingerprint: stats or None} for several fingerprints (e.g. every signer of one APK)."""
+        with self._lock:
+            return {fp.lower(): self._get(fp.lower()) for fp in fingerprints}
+
+    def record(self, sha256, certificates, malicious):
+        """Count one scanned APK against each of its signer certificates ({"sha256", "subject"} dicts).
+
+        A rescan only refreshes last_seen for APKs whose label was confirmed via `set_label`.
+        """
+        now = time.time()
+        malicious = int(bool(malicious))
+        with self._lock:
+            for cert in certificates:
+                fp = cert["sha256"].lower()
+                prior = self._db.execute(
+                    "SELECT malicious, confirmed FROM signed_apps WHERE fingerprint = ? AND sha256 = ?", (fp, sha256)
+                ).fetchone()
+                new_app = prior is None
+                if new_app:
+                    delta = malicious
+                    self._db.execute("INSERT INTO signed_apps (fingerprint, sha256, malicious) VALUES (?, ?, ?)",
+                                     (fp, sha256, malicious))
+                elif prior[1]:  # an analyst's label outranks the model's verdict on a rescan
+                    delta = 0
+                else:
+                    delta = malicious - prior[0]
+                    self._db.execute("UPDATE signed_apps SET malicious = ? WHERE fingerprint = ? AND sha256 = ?",
+                                     (malicious, fp, sha256))
+                self._db.execute(
+                    "INSERT INTO certificates (fingerprint, subject, apps_seen, malicious, first_seen, last_seen)"
+                    " VALUES (?, ?, 1, ?, ?, ?)"
+                    " ON CONFLICT(fingerprint) DO UPDATE SET"
+                    "  subject = COALESCE(excluded.subject, subject),"
+                    "  apps_seen = apps_seen + ?, malicious = malicious + ?, last_seen = excluded.last_seen",
+                    (fp, cert.get("subject"), malicious, now, now, int(new_app), delta),
+                )
+                self._hot.pop(fp, None)
+            self._db.commit()
+
+    def set_label(self, sha256, malicious):
+        """Apply a confirmed label to an already recorded APK; returns the number of certificates updated."""
+        malicious = int(bool(malicious))
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT fingerprint, malicious FROM signed_apps WHERE sha256 = ?", (sha256,)
+            ).fetchall()
+            for fp, prior in rows:
+                self._db.execute(
+                    "UPDATE signed_apps SET malicious = ?, confirmed = 1 WHERE fingerprint = ? AND sha256 = ?",
+                    (malicious, fp, sha256),
+                )
+                if prior == malicious:
+                    continue
+                self._db.execute("UPDATE certificates SET malicious = malicious + ? WHERE fingerprint = ?",
+                                 (malicious - prior, fp))
+                self._hot.pop(fp, None)
+            self._db.commit()
+            return len(rows)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,130 @@
+# app/device_pool.py
+import os
+import subprocess
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+EMULATOR_SERIALS = [s.strip() for s in os.getenv("EMULATOR_SERIALS", "emulator-5554").split(",") if s.strip()]
+DEVICE_LEASE_TIMEOUT = float(os.getenv("DEVICE_LEASE_TIMEOUT", "900"))
+DEVICE_RECHECK_INTERVAL = float(os.getenv("DEVICE_RECHECK_INTERVAL", "60"))
+
+
+class DeviceUnavailable(Exception):
+    pass
+
+
+def adb_device_healthy(serial):
+    """A device is healthy when adb sees it online and Android has finished booting."""
+    try:
+        state = subprocess.run(["adb", "-s", serial, "get-state"],
+                               capture_output=True, text=True, timeout=5)
+        if state.stdout.strip() != "device":
+            return False
+        boot = subprocess.run(["adb", "-s", serial, "shell", "getprop", "sys.boot_completed"],
+                              capture_output=True, text=True, timeout=5)
+        return boot.stdout.strip() == "1"
+    except Exception:
+        return False
+
+
+class DevicePool:
+    """Lease/release pool of emulator serials with a FIFO wait queue.
+
+    Waiters are served strictly in arrival order. A device is health-checked
+    when it is handed out; failing devices are quarantined and re-checked no
+    more often than every `recheck_interval` seconds.
+    """
+
+    def __init__(self, serials=None, health_check=adb_device_healthy, recheck_interval=DEVICE_RECHECK_INTERVAL):
+        self.serials = list(serials or EMULATOR_SERIALS)
+        self.health_check = health_check
+        self.recheck_interval = recheck_interval
+        self._cond = threading.Condition()
+        self._free = deque(self.serials)
+        self._leased = {}
+        self._quarantined = {}
+        self._waiters = deque()
+
+    def _healthy(self, serial):
+        """Run the health check; a check that raises (adb missing, timeout) counts as unhealthy."""
+        if self.health_check is None:
+            return True
+        try:
+            return bool(self.health_check(serial))
+        except Exception as e:
+            print(f"⚠️ Health check for {serial} raised: {e}")
+            return False
+
+    def _requeue_quarantined(self):
+        now = time.monotonic()
+        for serial, since in list(self._quarantined.items()):
+            if now - since >= self.recheck_interval:
+                del self._quarantined[serial]
+                self._free.append(serial)
+
+    def acquire(self, timeout=DEVICE_LEASE_TIMEOUT):
+        """Block until a healthy device is free (FIFO) and return its serial."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        ticket = object()
+        with self._cond:
+            self._waiters.append(ticket)
+            try:
+                while True:
+                    self._requeue_quarantined()
+                    if self._waiters[0] is ticket and self._free:
+                        serial = self._free.popleft()
+                        self._cond.release()
+                        try:
+                            healthy = self._healthy(serial)
+                        finally:
+                            self._cond.acquire()
+                        if healthy:
+                            self._leased[serial] = time.time()
+                            return serial
+                        print(f"⚠️ Device {serial} failed health check — quarantined.")
+                        self._quarantined[serial] = time.monotonic()
+                        continue
+
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise DeviceUnavailable(f"No healthy emulator available within {timeout:g}s")
+                    wait = self.recheck_interval if self._quarantined else remaining
+                    if remaining is not None and wait is not None:
+                        wait = min(wait, remaining)
+                    self._cond.wait(wait)
+            finally:
+                self._waiters.remove(ticket)
+                self._cond.notify_all()
+
+    def release(self, serial, healthy=True):
+        with self._cond:
+            self._leased.pop(serial, None)
+            if healthy:
+                self._free.append(serial)
+            else:
+                self._quarantined[serial] = time.monotonic()
+            self._cond.notify_all()
+
+    @contextmanager
+    def lease(self, timeout=DEVICE_LEASE_TIMEOUT):
+        serial = self.acquire(timeout)
+        healthy = True
+        try:
+            yield serial
+        except Exception:
+            healthy = self._healthy(serial)
+            raise
+        finally:
+            self.release(serial, healthy)
+
+    def status(self):
+        with self._cond:
+            return {
+                "devices": self.serials,
+                "free": list(self._free),
+                "leased": dict(self._leased),
+                "quarantined": list(self._quarantined),
+                "waiting": len(self._waiters),
+            }
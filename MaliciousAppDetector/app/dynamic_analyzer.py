@@ -1,17 +1,32 @@
+import copy
 import subprocess
 import time
 import os
+from datetime import datetime
 from dotenv import load_dotenv
 
+from app.apk_manifest import read_manifest
+from app.behavior import count_behavior
+from app.device_pool import DevicePool, DeviceUnavailable, DEVICE_LEASE_TIMEOUT, adb_device_healthy
+from app.logcat import LogcatStream, LOGCAT_SPOOL_DIR
+
 load_dotenv()
 
 
 class DynamicAnalyzer:
-    def __init__(self):
-        # Lock to emulator-5554 to avoid multiple device conflicts
-        self.device_id = "emulator-5554"
+    def __init__(self, pool=None, device_id=None):
+        # Each run leases its own emulator from the pool so concurrent runs never share a device
+        self.pool = pool or DevicePool(health_check=self.ensure_device)
+        self.device_id = device_id
         self.emulator_name = os.getenv("EMULATOR_NAME", "MalwareTest_Safe")
         self.analysis_duration = int(os.getenv("DYNAMIC_DURATION", "60"))
+        self.lease_timeout = float(os.getenv("DEVICE_LEASE_TIMEOUT", str(DEVICE_LEASE_TIMEOUT)))
+
+    def for_device(self, device_id):
+        """Return a copy of this analyzer bound to one leased emulator serial."""
+        bound = copy.copy(self)
+        bound.device_id = device_id
+        return bound
 
     # -----------------------------
     # ✅ Universal ADB Runner
@@ -31,13 +46,21 @@ class DynamicAnalyzer:
         except Exception:
             return False
 
-    def check_emulator_running(self):
+    def check_emulator_running(self, device_id=None):
+        device_id = device_id or self.device_id
         try:
             result = subprocess.run(["adb", "devices"], capture_output=True, text=True, timeout=5)
-            return self.device_id in result.stdout
+            return any(line.split("\t")[0] == device_id for line in result.stdout.splitlines())
         except Exception:
             return False
 
+    def ensure_device(self, device_id):
+        """Pool health check: boot the emulator behind `device_id` if needed, then verify it."""
+        if not self.check_emulator_running(device_id):
+            print(f"⚠️ Emulator {device_id} not detected — starting now...")
+            self.for_device(device_id).start_emulator()
+        return adb_device_healthy(device_id)
+
     # -----------------------------
     # ✅ Start Emulator (if not running)
     # -----------------------------
@@ -46,16 +69,19 @@ class DynamicAnalyzer:
             print(f"🟢 Emulator {self.device_id} already running.")
             return True
 
-        print(f"🚀 Starting emulator: {self.emulator_name}")
-        subprocess.Popen(
-            ["emulator", "-avd", self.emulator_name, "-no-snapshot-load"],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL
-        )
+        print(f"🚀 Starting emulator: {self.emulator_name} on {self.device_id}")
+        cmd = ["emulator", "-avd", self.emulator_name, "-no-snapshot-load"]
+        port = self.device_id.rsplit("-", 1)[-1]
+        if port.isdigit():
+            cmd += ["-port", port]
+        if len(self.pool.serials) > 1:
+            # Several instances of the same AVD can only run read-only
+            cmd.append("-read-only")
+        subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
 
         # Give emulator enough time to boot
         print("⌛ Waiting for emulator to boot...")
-        subprocess.run(["adb", "wait-for-device"], timeout=120)
+        subprocess.run(["adb", "-s", self.device_id, "wait-for-device"], timeout=120)
         time.sleep(20)
         print("✅ Emulator ready.")
         return True
@@ -77,6 +103,19 @@ class DynamicAnalyzer:
     # ✅ Extract Package Name
     # -----------------------------
     def get_package_name(self, apk_path):
+        """Package name from the APK's binary manifest, decoded in-process.
+
+        Falls back to `aapt dump badging` only if the manifest cannot be decoded.
+        """
+        try:
+            package = read_manifest(apk_path)["package"]
+            print(f"📦 Detected package name: {package}")
+            return package
+        except Exception as e:
+            print(f"⚠️ Manifest decode failed ({e}); trying aapt")
+        return self._aapt_package_name(apk_path)
+
+    def _aapt_package_name(self, apk_path):
         try:
             result = subprocess.run(
                 ["aapt", "dump", "badging", apk_path],
@@ -101,13 +140,17 @@ class DynamicAnalyzer:
     # -----------------------------
     # ✅ Launch & Fuzz App
     # -----------------------------
-    def launch_and_fuzz_app(self, package_name, event_count=300):
-        print(f"🐒 Launching Monkey fuzz test for {package_name} ({event_count} events)")
+    def clear_logcat(self):
         try:
             self.adb_run(["logcat", "-c"], timeout=15)  # Increased timeout
         except subprocess.TimeoutExpired:
             print("⚠️ logcat clear timeout ignored — continuing anyway.")
 
+    def launch_and_fuzz_app(self, package_name, event_count=300, clear_logs=True):
+        print(f"🐒 Launching Monkey fuzz test for {package_name} ({event_count} events)")
+        if clear_logs:
+            self.clear_logcat()
+
         result = self.adb_run([
             "shell", "monkey",
             "-p", package_name,
@@ -122,7 +165,27 @@ class DynamicAnalyzer:
     # -----------------------------
     # ✅ Monitor Logs
     # -----------------------------
+    def start_log_stream(self, package_name):
+        """Clear the device log and start streaming it before the app is launched."""
+        self.clear_logcat()
+        spool_path = None
+        if LOGCAT_SPOOL_DIR:
+            stamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+            spool_path = os.path.join(LOGCAT_SPOOL_DIR, f"{stamp}_{self.device_id}_{package_name}.log.gz")
+        return LogcatStream(self.device_id, spool_path=spool_path).start()
+
+    def monitor_stream(self, stream, duration=None):
+        """Let the app run for `duration` seconds while `stream` counts behavior, then stop it."""
+        duration = duration or self.analysis_duration
+        print(f"⏱️ Monitoring app for {duration} seconds (streaming)...")
+        time.sleep(duration)
+        stream.stop()
+        behavior = stream.behavior()
+        print(f"✓ Behavior summary: {behavior}")
+        return behavior
+
     def monitor_behavior(self, duration=None):
+        """Legacy sleep-then-dump collection; returns the full log text."""
         duration = duration or self.analysis_duration
         print(f"⏱️ Monitoring app for {duration} seconds...")
         time.sleep(duration)
@@ -149,22 +212,7 @@ class DynamicAnalyzer:
             print("⚠️ No logs captured.")
             return {}
 
-        behavior = {
-            "network_calls": logs.count("http://") + logs.count("https://"),
-            "file_operations": logs.count("FileOutputStream") + logs.count("FileInputStream"),
-            "sms_activity": logs.count("SMS") + logs.count("sendTextMessage"),
-            "location_access": logs.count("LocationManager") + logs.count("getLastKnownLocation"),
-            "camera_usage": logs.count("Camera") + logs.count("takePicture"),
-            "contacts_access": logs.count("ContactsContract"),
-            "phone_calls": logs.count("ACTION_CALL") + logs.count("TelephonyManager"),
-            "permission_requests": logs.count("permission"),
-            "crashes": logs.count("FATAL EXCEPTION"),
-            "native_code": logs.count("JNI") + logs.count("native"),
-            "crypto_operations": logs.count("Cipher") + logs.count("encrypt"),
-            "database_operations": logs.count("SQLite") + logs.count("database"),
-        }
-
-        active = {k: v for k, v in behavior.items() if v > 0}
+        active = count_behavior(logs)
         print(f"✓ Behavior summary: {active}")
         return active
 
@@ -187,14 +235,16 @@ class DynamicAnalyzer:
         if not os.path.exists(apk_path):
             return {"status": "failed", "error": f"APK not found: {apk_path}"}
 
-        # Ensure emulator is running
-        if not self.check_emulator_running():
-            print("⚠️ No emulator detected — starting now...")
-            self.start_emulator()
-            time.sleep(15)
-        else:
-            print(f"🟢 Using emulator: {self.device_id}")
+        # Lease a dedicated emulator (FIFO wait; health-checked / booted by the pool)
+        try:
+            with self.pool.lease(self.lease_timeout) as device_id:
+                print(f"🟢 Using emulator: {device_id}")
+                return self.for_device(device_id).run_on_device(apk_path)
+        except DeviceUnavailable as e:
+            return {"status": "failed", "error": str(e)}
 
+    def run_on_device(self, apk_path):
+        """Install, fuzz, monitor and uninstall on the already-leased `self.device_id`."""
         # Install APK
         if not self.install_apk(apk_path):
             return {"status": "failed", "error": "APK installation failed."}
@@ -204,19 +254,29 @@ class DynamicAnalyzer:
         if not package_name:
             return {"status": "failed", "error": "Could not extract package name."}
 
-        # Run fuzz + monitor
-        self.launch_and_fuzz_app(package_name, event_count=300)
-        logs = self.monitor_behavior()
-        behavior = self.analyze_logs(logs)
-        self.uninstall_app(package_name)
+        # Stream logcat from before launch, then fuzz + monitor
+        stream = self.start_log_stream(package_name)
+        try:
+            self.launch_and_fuzz_app(package_name, event_count=300, clear_logs=False)
+            behavior = self.monitor_stream(stream)
+        finally:
+            stream.stop()
+            # The emulator goes back to the pool for the next sample, so never leave this one installed
+            try:
+                self.uninstall_app(package_name)
+            except Exception as e:
+                print(f"⚠️ Could not uninstall {package_name} from {self.device_id}: {e}")
 
         print(f"✓ Dynamic analysis complete for {package_name}.")
         return {
             "status": "success",
+            "device_id": self.device_id,
             "package_name": package_name,
             "apk_file": os.path.basename(apk_path),
             "duration": self.analysis_duration,
-            "behavior": behavior
+            "behavior": behavior,
+            "log_lines": stream.counter.lines,
+            "log_spool": stream.spool_path,
         }
 
 
@@ -228,4 +288,4 @@ if __name__ == "__main__":
         print("\n=== FINAL RESULT ===")
         print(result)
     else:
-        print("Usage: python dynamic_analyzer.py <apk_path>")
+        print("Usage: python -m app.dynamic_analyzer <apk_path>")
@@ -0,0 +1,221 @@
+# app/feature_store.py
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+from app.ml_model import FEATURE_NAMES, FEATURE_EXTRACTOR_VERSION
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are only serialised within one process
+    fcntl = None
+
+FEATURE_STORE_DIR = os.getenv(
+    "FEATURE_STORE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "feature_store"),
+)
+
+UNLABELED = -1
+
+# Fixed-width metadata columns, one raw binary file each
+META_COLUMNS = {
+    "sha256": np.dtype("S64"),
+    "md5": np.dtype("S32"),
+    "extractor_version": np.dtype("<i2"),
+    "label": np.dtype("<i1"),
+    "created_at": np.dtype("<f8"),
+}
+FEATURE_DTYPE = np.dtype("<f4")
+
+
+class FeatureStore:
+    """Append-only columnar store of one fixed-schema feature row per analyzed APK.
+
+    Every metadata column is a raw little-endian file and the feature vectors
+    form one (rows x features) float32 block, so appending is a handful of
+    small writes and a whole training set loads with one read per file. Rows
+    are keyed by SHA-256; a later row for the same APK (e.g. once a label is
+    known) supersedes earlier ones when loading with `dedupe=True`.
+    """
+
+    def __init__(self, root=FEATURE_STORE_DIR, feature_names=FEATURE_NAMES,
+                 extractor_version=FEATURE_EXTRACTOR_VERSION):
+        self.root = root
+        self.feature_names = list(feature_names)
+        self.extractor_version = extractor_version
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self._check_schema()
+
+    def _path(self, name):
+        return os.path.join(self.root, f"{name}.bin")
+
+    def _check_schema(self):
+        schema_path = os.path.join(self.root, "schema.json")
+        schema = {
+            "feature_names": self.feature_names,
+            "feature_dtype": FEATURE_DTYPE.str,
+            "columns": {k: v.str for k, v in META_COLUMNS.items()},
+        }
+        if os.path.exists(schema_path):
+            with open(schema_path) as f:
+                existing = json.load(f)
+            if existing != schema:
+                raise ValueError(
+                    f"Feature store {self.root} has schema {existing['feature_names']}, "
+                    f"expected {self.feature_names}; use a new FEATURE_STORE_DIR after schema changes"
+                )
+        else:
+            with open(schema_path, "w") as f:
+                json.dump(schema, f, indent=2)
+
+    @contextmanager
+    def _locked(self):
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(os.path.join(self.root, ".lock"), "w") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _complete_rows(self):
+        sizes = [os.path.getsize(self._path(name)) // dt.itemsize if os.path.exists(self._path(name)) else 0
+                 for name, dt in META_COLUMNS.items()]
+        path = self._path("features")
+        width = len(self.feature_names) * FEATURE_DTYPE.itemsize
+        sizes.append(os.path.getsize(path) // width if os.path.exists(path) else 0)
+        return min(sizes)
+
+    def _truncate_partial_rows(self):
+        """Cut every column back to the rows all columns have (call with the lock held).
+
+        A crash or failed write mid-append leaves some columns one row ahead;
+        appending after that would pair metadata of one row with features of another.
+        """
+        n = self._complete_rows()
+        widths = {name: dt.itemsize for name, dt in META_COLUMNS.items()}
+        widths["features"] = len(self.feature_names) * FEATURE_DTYPE.itemsize
+        for name, width in widths.items():
+            path = self._path(name)
+            if os.path.exists(path) and os.path.getsize(path) != n * width:
+                print(f"⚠️ Dropping a partially written row from {path}")
+                os.truncate(path, n * width)
+
+    def append(self, sha256, features, md5=None, label=None):
+        self.append_many([{"sha256": sha256, "md5": md5, "features": features, "label": label}])
+
+    def append_many(self, rows):
+        """Append rows of {"sha256", "md5", "features" (dict), "label"}.
+
+        Rows without a label inherit the latest confirmed label of their APK, so
+        a rescan does not supersede it when loading with `dedupe=True`.
+        """
+        if not rows:
+            return
+        with self._locked():
+            known = self._latest_labels({r["sha256"] for r in rows if r.get("label") is None})
+            rows = [{**r, "label": known[r["sha256"]]} if r.get("label") is None and r["sha256"] in known else r
+                    for r in rows]
+            self._append_unlocked(rows)
+
+    def _latest_labels(self, sha256s):
+        """{sha256: latest label} for those of `sha256s` that have a labeled row (call with the lock held)."""
+        if not sha256s or not os.path.exists(self._path("sha256")):
+            return {}
+        shas = np.fromfile(self._path("sha256"), dtype=META_COLUMNS["sha256"])
+        labels = np.fromfile(self._path("label"), dtype=META_COLUMNS["label"])
+        n = min(len(shas), len(labels))
+        shas, labels = shas[:n], labels[:n]
+        rows = np.flatnonzero(np.isin(shas, [s.encode() for s in sha256s]) & (labels != UNLABELED))
+        return {shas[i].decode(): int(labels[i]) for i in rows}  # later rows overwrite earlier ones
+
+    def _append_unlocked(self, rows):
+        now = time.time()
+        meta = {
+            "sha256": np.array([r["sha256"].encode() for r in rows], dtype=META_COLUMNS["sha256"]),
+            "md5": np.array([(r.get("md5") or "").encode() for r in rows], dtype=META_COLUMNS["md5"]),
+            "extractor_version": np.full(len(rows), self.extractor_version, dtype=META_COLUMNS["extractor_version"]),
+            "label": np.array([UNLABELED if r.get("label") is None else int(r["label"]) for r in rows],
+                              dtype=META_COLUMNS["label"]),
+            "created_at": np.full(len(rows), now, dtype=META_COLUMNS["created_at"]),
+        }
+        X = np.array([[r["features"].get(k) or 0 for k in self.feature_names] for r in rows], dtype=FEATURE_DTYPE)
+        self._truncate_partial_rows()
+        for name, arr in meta.items():
+            with open(self._path(name), "ab") as f:
+                f.write(arr.tobytes())
+        with open(self._path("features"), "ab") as f:
+            f.write(X.tobytes())
+
+    def load(self, dedupe=True, labeled_only=False):
+        """Load every row as numpy arrays: sha256, md5, extractor_version, label, created_at, X."""
+        with self._locked():
+            return self._load_unlocked(dedupe, labeled_only)
+
+    def _load_unlocked(self, dedupe=True, labeled_only=False):
+        cols = {name: np.fromfile(self._path(name), dtype=dt) if os.path.exists(self._path(name))
+                else np.empty(0, dtype=dt) for name, dt in META_COLUMNS.items()}
+        X = (np.fromfile(self._path("features"), dtype=FEATURE_DTYPE) if os.path.exists(self._path("features"))
+             else np.empty(0, dtype=FEATURE_DTYPE))
+        width = len(self.feature_names)
+        # A crash mid-append can leave columns of unequal length until the next append truncates them
+        n = min([len(c) for c in cols.values()] + [len(X) // width])
+        data = {name: c[:n] for name, c in cols.items()}
+        data["X"] = X[:n * width].reshape(n, width)
+
+        keep = np.ones(n, dtype=bool)
+        if dedupe and n:
+            # Last occurrence of each sha256 wins
+            _, last_rev = np.unique(data["sha256"][::-1], return_index=True)
+            keep[:] = False
+            keep[n - 1 - last_rev] = True
+        if labeled_only:
+            keep &= data["label"] != UNLABELED
+        if not keep.all():
+            data = {k: v[keep] for k, v in data.items()}
+        data["sha256"] = data["sha256"].astype(str)
+        data["md5"] = data["md5"].astype(str)
+        return data
+
+    def get(self, sha256):
+        with self._locked():
+            return self._get_unlocked(sha256)
+
+    def _get_unlocked(self, sha256):
+        data = self._load_unlocked()
+        idx = np.flatnonzero(data["sha256"] == sha256)
+        if not len(idx):
+            return None
+        i = idx[0]
+        return {
+            "sha256": sha256,
+            "md5": data["md5"][i],
+            "extractor_version": int(data["extractor_version"][i]),
+            "label": None if data["label"][i] == UNLABELED else int(data["label"][i]),
+            "features": dict(zip(self.feature_names, data["X"][i].tolist())),
+        }
+
+    def set_label(self, sha256, label):
+        """Record a confirmed label by appending a labeled copy of the APK's latest row.
+
+        Returns the labeled row, or None if the APK was never analyzed.
+        """
+        with self._locked():  # read and append under one lock so concurrent labels cannot interleave
+            row = self._get_unlocked(sha256)
+            if row is None:
+                return None
+            self._append_unlocked([{"sha256": sha256, "md5": row["md5"], "features": row["features"],
+                                    "label": label}])
+        return {**row, "label": int(label)}
+
+    def __len__(self):
+        path = self._path("sha256")
+        return os.path.getsize(path) // META_COLUMNS["sha256"].itemsize if os.path.exists(path) else 0
@@ -0,0 +1,227 @@
+# app/flat_reports.py
+"""Sparse, column-indexed storage for flattened report dumps (model/malware_features.csv).
+
+Each CSV record is one whole report flattened to dotted column names, so most
+cells are empty and a few hold megabytes of text. `convert_flat_csv` turns it
+into a CSC matrix on disk plus a persisted column dictionary:
+
+    numeric / boolean cells   -> column `<name>` with the value
+    short string cells        -> indicator column `<name>=<value>` (1.0)
+    long text, empty cells    -> dropped
+
+    python -m app.flat_reports convert model/malware_features.csv data/flat_features
+    python -m app.flat_reports select data/flat_features "permissions.*"
+
+Columns are stored sorted by name and column-major, so `FlatReportMatrix.select`
+memory-maps the arrays and only touches the slices of the selected columns.
+"""
+import csv
+import fnmatch
+import json
+import os
+import re
+import sys
+
+import numpy as np
+from scipy import sparse
+
+FLAT_ID_COLUMNS = ("filename", "timestamp")
+FLAT_MAX_CATEGORY_LENGTH = 64
+_BOOLEANS = {"True": 1.0, "False": 0.0, "true": 1.0, "false": 0.0}
+_ARRAYS = ("indptr", "indices", "data")
+
+
+def _raise_field_limit():
+    # Whole report sections land in single cells; the default limit is 128 KiB
+    csv.field_size_limit(min(sys.maxsize, 2 ** 31 - 1))
+
+
+def compile_patterns(patterns):
+    """Build one matcher for column globs. A pattern also matches at any dotted
+    segment boundary, so `permissions.*` selects
+    `static_analysis.full_report.permissions.android.permission.INTERNET.status`.
+    """
+    if isinstance(patterns, str):
+        patterns = [patterns]
+    parts = [fnmatch.translate(p)[:-2] for p in patterns]  # drop the trailing \Z
+    return re.compile(r"(?s:(?:.*\.)?(?:%s))\Z" % "|".join(f"(?:{p})" for p in parts))
+
+
+def encode_cell(name, value, max_category_length=FLAT_MAX_CATEGORY_LENGTH):
+    """Map one cell to (column name, value), or None when it carries no feature."""
+    if not value:
+        return None
+    if value in _BOOLEANS:
+        return name, _BOOLEANS[value]
+    try:
+        number = float(value)
+    except ValueError:
+        if len(value) > max_category_length:
+            return None
+        return f"{name}={value}", 1.0
+    if number != number:  # NaN written by pandas for missing values
+        return None
+    return name, number
+
+
+def convert_flat_csv(csv_path, out_dir, include=None, columns=None,
+                     id_columns=FLAT_ID_COLUMNS, max_category_length=FLAT_MAX_CATEGORY_LENGTH):
+    """Convert a flattened report CSV into a FlatReportMatrix directory.
+
+    `include` limits conversion to columns matching those globs; cells of
+    other columns are never decoded. `columns` reuses an existing column
+    dictionary (e.g. the training one) so unseen columns are dropped and the
+    output lines up with it.
+    """
+    _raise_field_limit()
+    select = compile_patterns(include).match if include else None
+    frozen = columns is not None
+    index = {name: i for i, name in enumerate(columns or [])}
+    row_ids, cols, rows, vals = [], [], [], []
+    skipped = 0
+    with open(csv_path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        id_pos = [header.index(c) for c in id_columns if c in header]
+        wanted = [(j, name) for j, name in enumerate(header)
+                  if j not in id_pos and (select is None or select(name))]
+        for r, record in enumerate(reader):
+            row_ids.append("|".join(record[j] for j in id_pos if j < len(record)))
+            width = len(record)
+            for j, name in wanted:
+                if j >= width:
+                    break
+                cell = encode_cell(name, record[j], max_category_length)
+                if cell is None:
+                    skipped += bool(record[j])
+                    continue
+                col = index.get(cell[0])
+                if col is None:
+                    if frozen:
+                        continue
+                    col = index[cell[0]] = len(index)
+                cols.append(col)
+                rows.append(r)
+                vals.append(cell[1])
+
+    names = sorted(index) if not frozen else list(columns)
+    if not frozen:
+        # Renumber so columns are in name order: prefixes become contiguous runs
+        remap = np.empty(len(index), dtype=np.int64)
+        for new, name in enumerate(names):
+            remap[index[name]] = new
+        cols = remap[np.asarray(cols, dtype=np.int64)] if cols else np.empty(0, dtype=np.int64)
+    matrix = sparse.csc_matrix(
+        (np.asarray(vals, dtype=np.float32), (np.asarray(rows, dtype=np.int32), np.asarray(cols, dtype=np.int32))),
+        shape=(len(row_ids), len(names)),
+    )
+    matrix.sum_duplicates()
+    matrix.sort_indices()
+
+    os.makedirs(out_dir, exist_ok=True)
+    np.save(os.path.join(out_dir, "indptr.npy"), matrix.indptr.astype(np.int64))
+    np.save(os.path.join(out_dir, "indices.npy"), matrix.indices.astype(np.int32))
+    np.save(os.path.join(out_dir, "data.npy"), matrix.data.astype(np.float32))
+    meta = {
+        "source": os.path.basename(csv_path),
+        "shape": list(matrix.shape),
+        "nnz": int(matrix.nnz),
+        "skipped_cells": skipped,
+        "max_category_length": max_category_length,
+        "id_columns": [c for c in id_columns if c in header],
+        "rows": row_ids,
+        "columns": names,
+    }
+    tmp = os.path.join(out_dir, "columns.json.tmp")
+    with open(tmp, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp, os.path.join(out_dir, "columns.json"))
+    return FlatReportMatrix(out_dir)
+
+
+def load_column_dictionary(directory):
+    with open(os.path.join(directory, "columns.json")) as f:
+        return json.load(f)["columns"]
+
+
+class FlatReportMatrix:
+    """Read side of a converted flat-report directory (CSC arrays + columns.json)."""
+
+    def __init__(self, directory, mmap=True):
+        self.directory = directory
+        with open(os.path.join(directory, "columns.json")) as f:
+            self.meta = json.load(f)
+        self.columns = self.meta["columns"]
+        self.rows = self.meta["rows"]
+        self.shape = tuple(self.meta["shape"])
+        mode = "r" if mmap else None
+        self._arrays = {n: np.load(os.path.join(directory, f"{n}.npy"), mmap_mode=mode) for n in _ARRAYS}
+        self._index = None
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = {name: i for i, name in enumerate(self.columns)}
+        return self._index
+
+    def match(self, patterns):
+        """Names of the columns matching the globs, in stored order."""
+        match = compile_patterns(patterns).match
+        return [name for name in self.columns if match(name)]
+
+    def select(self, patterns=None, columns=None):
+        """Return (csr_matrix, column names) for the matching columns only.
+
+        Only the index/data slices of those columns are read from the memory maps.
+        """
+        names = list(columns) if columns is not None else self.match(patterns) if patterns else self.columns
+        idx = [self.index[n] for n in names if n in self.index]
+        names = [self.columns[i] for i in idx]
+        a = self._arrays
+        indptr = np.zeros(len(idx) + 1, dtype=np.int64)
+        indices, data = [], []
+        for k, j in enumerate(idx):
+            lo, hi = int(a["indptr"][j]), int(a["indptr"][j + 1])
+            indices.append(a["indices"][lo:hi])
+            data.append(a["data"][lo:hi])
+            indptr[k + 1] = indptr[k] + hi - lo
+        matrix = sparse.csc_matrix(
+            (np.concatenate(data) if data else np.empty(0, np.float32),
+             np.concatenate(indices) if indices else np.empty(0, np.int32),
+             indptr),
+            shape=(self.shape[0], len(idx)),
+        )
+        return matrix.tocsr(), names
+
+    def to_csr(self):
+        return self.select()[0]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    conv = sub.add_parser("convert", help="CSV -> sparse matrix directory")
+    conv.add_argument("csv_path")
+    conv.add_argument("out_dir")
+    conv.add_argument("--include", nargs="*", default=None, help="only convert columns matching these globs")
+    conv.add_argument("--columns-from", default=None, help="reuse the column dictionary of this directory")
+    conv.add_argument("--max-category-length", type=int, default=FLAT_MAX_CATEGORY_LENGTH)
+    sel = sub.add_parser("select", help="print the columns matching globs")
+    sel.add_argument("directory")
+    sel.add_argument("patterns", nargs="+")
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        columns = load_column_dictionary(args.columns_from) if args.columns_from else None
+        m = convert_flat_csv(args.csv_path, args.out_dir, include=args.include, columns=columns,
+                             max_category_length=args.max_category_length)
+        print(f"✓ {m.shape[0]} rows x {m.shape[1]} columns, {m.meta['nnz']} stored values "
+              f"({m.meta['skipped_cells']} long text cells dropped) -> {args.out_dir}")
+    else:
+        m = FlatReportMatrix(args.directory)
+        X, names = m.select(args.patterns)
+        print(f"{X.shape[0]} rows x {X.shape[1]} columns, {X.nnz} stored values")
+        for name in names:
+            print(f"  {name}")
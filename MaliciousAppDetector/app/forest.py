@@ -0,0 +1,291 @@
+# app/forest.py
+import os
+
+import numpy as np
+
+# Packed forest layout: all trees' nodes concatenated into flat arrays, with
+# child indices already offset into the global node numbering (-1 = leaf).
+FOREST_ARRAYS = ["roots", "feature", "threshold", "left", "right", "value"]
+
+
+def forest_to_arrays(estimator):
+    """Flatten a fitted sklearn forest (or single tree) into the packed array layout.
+
+    Only reads fitted attributes, so sklearn itself is not imported here.
+    `value` holds each leaf's class distribution normalised per node.
+    """
+    trees = [e.tree_ for e in getattr(estimator, "estimators_", [estimator])]
+    roots, feature, threshold, left, right, value = [], [], [], [], [], []
+    offset = 0
+    for t in trees:
+        roots.append(offset)
+        feature.append(t.feature)
+        threshold.append(t.threshold)
+        left.append(np.where(t.children_left >= 0, t.children_left + offset, -1))
+        right.append(np.where(t.children_right >= 0, t.children_right + offset, -1))
+        v = t.value[:, 0, :].astype(np.float64)
+        totals = v.sum(axis=1, keepdims=True)
+        value.append(np.divide(v, totals, out=np.zeros_like(v), where=totals > 0))
+        offset += t.node_count
+    return {
+        "roots": np.asarray(roots, dtype=np.int64),
+        "feature": np.concatenate(feature).astype(np.int64),
+        "threshold": np.concatenate(threshold).astype(np.float64),
+        "left": np.concatenate(left).astype(np.int64),
+        "right": np.concatenate(right).astype(np.int64),
+        "value": np.concatenate(value),
+    }
+
+
+def _int_dtype(max_value):
+    for dt in (np.int8, np.int16, np.int32):
+        if max_value <= np.iinfo(dt).max:
+            return dt
+    return np.int64
+
+
+def compact_arrays(arrays):
+    """Downcast packed arrays to the smallest dtypes that score identically.
+
+    Indices use the narrowest signed int that holds them. Thresholds become
+    float32 rounded *down*: inputs are compared as float32, and for any float32
+    x, ``x <= t`` exactly when ``x <= largest_float32_not_above(t)``, so every
+    sample still reaches the same leaf. Leaf distributions become float32
+    (probabilities shift by at most ~1e-7).
+    """
+    n_nodes = len(arrays["feature"])
+    node_dt = _int_dtype(n_nodes)
+    t64 = np.asarray(arrays["threshold"], dtype=np.float64)
+    t32 = t64.astype(np.float32)
+    over = t32.astype(np.float64) > t64
+    t32[over] = np.nextafter(t32[over], np.float32(-np.inf))
+    return {
+        "roots": np.asarray(arrays["roots"]).astype(node_dt),
+        "feature": np.asarray(arrays["feature"]).astype(_int_dtype(max(int(np.max(arrays["feature"], initial=0)), 2))),
+        "threshold": t32,
+        "left": np.asarray(arrays["left"]).astype(node_dt),
+        "right": np.asarray(arrays["right"]).astype(node_dt),
+        "value": np.asarray(arrays["value"]).astype(np.float32),
+    }
+
+
+def arrays_nbytes(arrays):
+    return int(sum(np.asarray(arrays[name]).nbytes for name in FOREST_ARRAYS))
+
+
+def subset_arrays(arrays, trees=None, max_depth=None):
+    """Keep only the `trees` (indices into roots, in that order), cut at `max_depth`.
+
+    Nodes at `max_depth` become leaves scored with their stored class
+    distribution; unreachable nodes are dropped and the rest renumbered.
+    """
+    roots = np.asarray(arrays["roots"])
+    left, right = np.asarray(arrays["left"]), np.asarray(arrays["right"])
+    trees = range(len(roots)) if trees is None else trees
+    keep, new_left, new_right, new_roots = [], [], [], []
+    for t in trees:
+        new_roots.append(len(keep))
+        # Depth-first with explicit stack; parents are emitted before their children
+        stack = [(int(roots[t]), 0, None, None)]
+        while stack:
+            node, depth, parent, side = stack.pop()
+            idx = len(keep)
+            keep.append(node)
+            new_left.append(-1)
+            new_right.append(-1)
+            if parent is not None:
+                (new_left if side == "l" else new_right)[parent] = idx
+            if left[node] >= 0 and (max_depth is None or depth < max_depth):
+                stack.append((int(right[node]), depth + 1, idx, "r"))
+                stack.append((int(left[node]), depth + 1, idx, "l"))
+    keep = np.asarray(keep, dtype=np.int64)
+    is_leaf = np.asarray(new_left) < 0
+    feature = np.asarray(arrays["feature"])[keep].copy()
+    threshold = np.asarray(arrays["threshold"])[keep].copy()
+    feature[is_leaf] = -2  # sklearn's TREE_UNDEFINED marker
+    threshold[is_leaf] = -2
+    return {
+        "roots": np.asarray(new_roots, dtype=np.int64),
+        "feature": feature,
+        "threshold": threshold,
+        "left": np.asarray(new_left, dtype=np.int64),
+        "right": np.asarray(new_right, dtype=np.int64),
+        "value": np.asarray(arrays["value"])[keep],
+    }
+
+
+def _per_tree_proba(model, X):
+    """(n_trees, n_samples, n_classes) leaf distributions."""
+    leaves = model.apply(X)
+    return np.asarray(model.arrays["value"][leaves], dtype=np.float64).transpose(1, 0, 2)
+
+
+def _select_trees(per_tree, y_idx, target_accuracy):
+    """Greedy forward selection: repeatedly add the tree that most lowers the ensemble's
+    Brier score; stop at the first prefix whose accuracy reaches the target."""
+    n_trees, n, n_classes = per_tree.shape
+    onehot = np.eye(n_classes)[y_idx]
+    total = np.zeros((n, n_classes))
+    chosen, remaining = [], list(range(n_trees))
+    while remaining:
+        k = len(chosen) + 1
+        cand = (total[None] + per_tree[remaining]) / k
+        brier = ((cand - onehot[None]) ** 2).sum(axis=2).mean(axis=1)
+        best = remaining.pop(int(brier.argmin()))
+        chosen.append(best)
+        total += per_tree[best]
+        if (total.argmax(axis=1) == y_idx).mean() >= target_accuracy:
+            break
+    return chosen
+
+
+def prune_forest(arrays, classes, X, y, accuracy_budget=0.01, max_trees=None, depths=None):
+    """Find the smallest forest (fewest nodes) whose accuracy on (X, y) stays within
+    `accuracy_budget` of the full forest.
+
+    Tries each candidate depth cut (default: the full depth and 12, 10, 8, 6, 4),
+    picks trees greedily for each, and keeps the configuration with the fewest
+    nodes. `max_trees` additionally caps the tree count. Returns (arrays, report).
+    """
+    classes = np.asarray(classes)
+    y_idx = np.searchsorted(classes, np.asarray(y))
+    full = ForestModel(arrays, classes)
+    baseline = float((full.predict(X) == np.asarray(y)).mean())
+    target = baseline - accuracy_budget
+    candidates = []
+    for depth in depths or (None, 12, 10, 8, 6, 4):
+        cut = subset_arrays(arrays, max_depth=depth)
+        per_tree = _per_tree_proba(ForestModel(cut, classes), X)
+        trees = _select_trees(per_tree, y_idx, target)[:max_trees]
+        candidate = subset_arrays(cut, trees)
+        accuracy = float((ForestModel(candidate, classes).predict(X) == np.asarray(y)).mean())
+        candidates.append((candidate, {"max_depth": depth, "trees": len(trees), "accuracy": accuracy,
+                                       "kept_trees": [int(t) for t in trees]}))
+    within = [c for c in candidates if c[1]["accuracy"] >= target]
+    if within:
+        pruned, info = min(within, key=lambda c: len(c[0]["feature"]))
+    else:  # only possible when max_trees is too tight: keep the most accurate cut
+        pruned, info = max(candidates, key=lambda c: c[1]["accuracy"])
+    report = {
+        "baseline_accuracy": baseline,
+        "accuracy_budget": accuracy_budget,
+        "within_budget": bool(within),
+        "original_trees": int(len(arrays["roots"])),
+        "original_nodes": int(len(arrays["feature"])),
+        "nodes": int(len(pruned["feature"])),
+        **info,
+    }
+    return pruned, report
+
+
+def apply_pruning(estimator, kept_trees=None, max_depth=None):
+    """Make a fitted sklearn forest match a pruned export, in place.
+
+    Dropped trees are removed from `estimator.estimators_`; a depth cut cannot be
+    applied to sklearn trees, so it is kept as `max_depth` for trees grown later
+    and re-applied with `subset_arrays` whenever the forest is exported.
+    """
+    if kept_trees is not None:
+        estimator.estimators_ = [estimator.estimators_[i] for i in kept_trees]
+        estimator.n_estimators = len(estimator.estimators_)
+    if max_depth is not None and (estimator.max_depth is None or estimator.max_depth > max_depth):
+        estimator.set_params(max_depth=max_depth)
+    return estimator
+
+
+def save_arrays(arrays, directory):
+    """Write each array as its own .npy file so it can be memory-mapped on load."""
+    os.makedirs(directory, exist_ok=True)
+    for name in FOREST_ARRAYS:
+        np.save(os.path.join(directory, f"{name}.npy"), np.ascontiguousarray(arrays[name]))
+
+
+def load_arrays(directory, mmap=True):
+    mode = "r" if mmap else None
+    return {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mode) for name in FOREST_ARRAYS}
+
+
+class ForestModel:
+    """Scores samples directly from packed forest arrays.
+
+    Exposes the `predict_proba` / `predict` / `classes_` surface used by
+    ml_model, so it is a drop-in replacement for the sklearn estimator. Arrays
+    may be read-only memory maps shared between processes.
+    """
+
+    def __init__(self, arrays, classes):
+        self.arrays = arrays
+        self.classes_ = np.asarray(classes)
+        self.n_estimators = len(arrays["roots"])
+
+    def apply(self, X):
+        """Return the leaf index reached in every tree, shape (n_samples, n_trees)."""
+        a = self.arrays
+        # sklearn compares float32-cast inputs against float64 thresholds
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        rows = np.arange(X.shape[0])[:, None]
+        node = np.broadcast_to(a["roots"], (X.shape[0], self.n_estimators)).copy()
+        while True:
+            feat = a["feature"][node]
+            active = a["left"][node] >= 0
+            if not active.any():
+                return node
+            go_left = X[rows, np.where(active, feat, 0)] <= a["threshold"][node]
+            nxt = np.where(go_left, a["left"][node], a["right"][node])
+            node = np.where(active, nxt, node)
+
+    def predict_proba(self, X):
+        leaves = self.apply(X)
+        return np.asarray(self.arrays["value"][leaves], dtype=np.float64).mean(axis=1)
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    # Offline tooling only; scoring above needs nothing but numpy
+    from app.ml_model import FEATURE_NAMES, features_matrix, synthetic_rows
+    from app.model_registry import ModelRegistry
+
+    parser = argparse.ArgumentParser(description="Prune a registry model into a smaller forest and publish it.")
+    parser.add_argument("--registry", default=None, help="registry directory (default: MODEL_REGISTRY_DIR)")
+    parser.add_argument("--version", default=None, help="version to prune (default: LATEST)")
+    parser.add_argument("--accuracy-budget", type=float, default=0.01, help="allowed validation accuracy drop")
+    parser.add_argument("--max-trees", type=int, default=None)
+    parser.add_argument("--max-depth", type=int, nargs="*", default=None, help="depth cuts to try")
+    parser.add_argument("--feature-store", default=None, help="validate on its labeled rows")
+    parser.add_argument("--validation-samples", type=int, default=2000,
+                        help="synthetic validation rows when no feature store is given")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--dry-run", action="store_true", help="report only, do not publish")
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.registry) if args.registry else ModelRegistry()
+    version = args.version or registry.latest()
+    meta = registry.load_meta(version)
+    source = load_arrays(os.path.join(registry.root, version, "arrays"), mmap=False)
+    if args.feature_store:
+        from app.feature_store import FeatureStore
+
+        data = FeatureStore(args.feature_store).load(labeled_only=True)
+        X_val, y_val = data["X"].astype(np.float64), data["label"].astype(np.int64)
+    else:
+        rows = synthetic_rows(samples=args.validation_samples, random_state=args.seed)
+        X_val, y_val = features_matrix(rows), np.array([r["label"] for r in rows])
+
+    pruned, report = prune_forest(source, meta["classes"], X_val, y_val, args.accuracy_budget,
+                                  args.max_trees, args.max_depth)
+    pruned = compact_arrays(pruned)
+    report["bytes"] = {"original": arrays_nbytes(source), "pruned": arrays_nbytes(pruned)}
+    # Pruning an already pruned version: its depth cut still applies on top of this one
+    depths = [d for d in (report["max_depth"], meta["metadata"].get("pruning", {}).get("max_depth")) if d is not None]
+    report["max_depth"] = min(depths) if depths else None
+    print(json.dumps(report, indent=2))
+    if not args.dry_run:
+        # The stored estimator must match the arrays, or warm-started updates would regrow the pruned trees
+        estimator = apply_pruning(registry.load_estimator(version), report["kept_trees"], report["max_depth"])
+        registry.publish(estimator, FEATURE_NAMES, arrays=pruned,
+                         metadata={**meta["metadata"], "parent": version, "pruning": report})
@@ -0,0 +1,105 @@
+# app/hashed_features.py
+"""Hashed sparse features: the second feature family next to extract_features.
+
+Permission names, Android API groups, APKiD tags, tracker names, domains and
+code strings (whole strings plus their identifier tokens) become namespaced
+tokens such as ``perm:android.permission.READ_SMS`` or ``apkid:packer:Jiagu``,
+which the hashing trick maps into one fixed-width sparse row. No vocabulary is
+kept, so width and memory stay fixed however many distinct tokens the corpus
+has; each report's tokens are deduplicated (presence, not counts) before
+hashing, which bounds the work by its unique tokens.
+"""
+import os
+import re
+
+from sklearn.feature_extraction import FeatureHasher
+
+from app.report_stream import load_feature_sections, static_report
+
+HASHED_FEATURE_BITS = int(os.getenv("HASHED_FEATURE_BITS", "18"))
+# Bump whenever the tokenisation changes, so stored hashed rows can be told apart
+HASHED_FEATURE_VERSION = 1
+HASHED_MAX_STRING_LENGTH = 120  # longer code strings only contribute their tokens
+
+_CODE_TOKEN = re.compile(r"[A-Za-z_$][A-Za-z0-9_$]{2,63}")
+
+# The only report sections the hashed family reads (see app.report_stream)
+_STATIC_SECTIONS = {
+    "permissions": True,
+    "android_api": True,
+    "apkid": True,
+    "trackers": True,
+    "domains": True,
+    "strings": {"strings_code": True},
+}
+HASHED_SECTIONS = {
+    "static_analysis": {"full_report": _STATIC_SECTIONS},
+    "full_report": _STATIC_SECTIONS,
+    **_STATIC_SECTIONS,
+}
+
+
+def hashed_tokens(report):
+    """Return the set of namespaced tokens describing one report."""
+    rep = static_report(report)
+    tokens = set()
+
+    for name, info in (rep.get("permissions") or {}).items():
+        tokens.add(f"perm:{name}")
+        if isinstance(info, dict) and info.get("status") == "dangerous":
+            tokens.add(f"dperm:{name}")
+
+    for api in rep.get("android_api") or {}:
+        tokens.add(f"api:{api}")
+
+    # {"classes.dex": {"compiler": ["dx"], "anti_vm": [...]}}
+    for findings in (rep.get("apkid") or {}).values():
+        if isinstance(findings, dict):
+            for category, tags in findings.items():
+                for tag in tags if isinstance(tags, list) else [tags]:
+                    tokens.add(f"apkid:{category}:{tag}")
+
+    trackers = rep.get("trackers") or {}
+    for t in trackers.get("trackers", []) if isinstance(trackers, dict) else []:
+        name = t.get("name") if isinstance(t, dict) else t
+        if name:
+            tokens.add(f"tracker:{name}")
+
+    for domain in rep.get("domains") or {}:
+        domain = domain.lower()
+        tokens.add(f"domain:{domain}")
+        # Registrable suffix as well, so sub-domains of the same service collide on purpose
+        parts = domain.rsplit(".", 2)
+        if len(parts) == 3:
+            tokens.add(f"domain:{parts[1]}.{parts[2]}")
+
+    strings = rep.get("strings") or {}
+    code = strings.get("strings_code") or [] if isinstance(strings, dict) else []
+    tokens.update(f"str:{s}" for s in code if len(s) <= HASHED_MAX_STRING_LENGTH)
+    # One regex pass over all code strings; the set keeps only distinct identifiers
+    tokens.update(f"tok:{t}" for t in set(_CODE_TOKEN.findall("\n".join(code))))
+    return tokens
+
+
+class ReportHasher:
+    """Turn reports into rows of a fixed-width (2**bits) sparse CSR matrix."""
+
+    def __init__(self, bits=HASHED_FEATURE_BITS):
+        self.n_features = 2 ** bits
+        # Signed hashing keeps collisions unbiased (colliding tokens tend to cancel rather than add up)
+        self._hasher = FeatureHasher(n_features=self.n_features, input_type="string", alternate_sign=True)
+
+    def transform(self, reports):
+        return self._hasher.transform(hashed_tokens(r) for r in reports)
+
+    def transform_files(self, paths):
+        """Hash stored reports, decoding only the sections the tokens come from."""
+        return self._hasher.transform(hashed_tokens(load_feature_sections(p, HASHED_SECTIONS)) for p in paths)
+
+
+DEFAULT_HASHER = ReportHasher()
+
+
+def hash_report(report, hasher=DEFAULT_HASHER):
+    """One report as a 1 x n_features CSR row."""
+    return hasher.transform([report])
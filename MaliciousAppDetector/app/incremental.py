@@ -0,0 +1,256 @@
+# app/incremental.py
+"""Incremental model updates from newly labeled feature rows.
+
+Next to the batch trainer (app.train), this keeps the deployed forest current
+without refitting from scratch: every update warm-starts the registry's LATEST
+estimator, grows a few new trees on the rows labeled since that model was
+trained (plus a replay sample of older labeled rows so the new trees still see
+both classes), retires the oldest trees beyond a cap, and publishes the result
+as a new registry version.
+
+    python -m app.incremental          # one update, e.g. from cron
+"""
+import asyncio
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import numpy as np
+
+from app.feature_store import FeatureStore
+from app.forest import apply_pruning, compact_arrays, forest_to_arrays, subset_arrays
+from app.ml_model import FEATURE_NAMES, FEATURE_EXTRACTOR_VERSION, MODEL_PATH, load_model
+from app.model_registry import ModelRegistry, MODEL_REGISTRY_VERSION
+
+try:
+    import fcntl
+except ImportError:  # Windows: updates are only serialised within one process
+    fcntl = None
+
+INCREMENTAL_INTERVAL = float(os.getenv("INCREMENTAL_INTERVAL", "300"))   # seconds between update attempts; 0 = off
+INCREMENTAL_MIN_ROWS = int(os.getenv("INCREMENTAL_MIN_ROWS", "20"))      # new labeled rows needed for an update
+INCREMENTAL_TREES = int(os.getenv("INCREMENTAL_TREES", "20"))            # trees grown per update
+INCREMENTAL_MAX_TREES = int(os.getenv("INCREMENTAL_MAX_TREES", "300"))   # oldest trees retired beyond this
+INCREMENTAL_REPLAY = int(os.getenv("INCREMENTAL_REPLAY", "2000"))        # older labeled rows mixed into each update
+MODEL_RELOAD_INTERVAL = float(os.getenv("MODEL_RELOAD_INTERVAL", "30"))  # seconds between LATEST checks; 0 = off
+
+
+def _timestamp(iso):
+    return datetime.fromisoformat(iso).replace(tzinfo=timezone.utc).timestamp()
+
+
+class IncrementalTrainer:
+    """Warm-start the LATEST registry estimator on rows labeled since it was trained."""
+
+    def __init__(self, registry=None, store=None, min_rows=INCREMENTAL_MIN_ROWS, trees=INCREMENTAL_TREES,
+                 max_trees=INCREMENTAL_MAX_TREES, replay=INCREMENTAL_REPLAY, random_state=None):
+        self.registry = registry or ModelRegistry()
+        self.store = store or FeatureStore()
+        self.min_rows = min_rows
+        self.trees = trees
+        self.max_trees = max_trees
+        self.replay = replay
+        self.rng = np.random.RandomState(random_state)
+
+    @contextmanager
+    def _exclusive(self):
+        """Yield True if this process may update; other API workers skip while one is running."""
+        if fcntl is None:
+            yield True
+            return
+        os.makedirs(self.registry.root, exist_ok=True)
+        with open(os.path.join(self.registry.root, ".incremental.lock"), "w") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def watermark(self, meta):
+        """created_at of the newest row the model has seen (its training time for batch models)."""
+        incremental = meta["metadata"].get("incremental") or {}
+        return incremental.get("watermark", _timestamp(meta["trained_at"]))
+
+    def update(self):
+        """Publish one incremental version if enough new labels exist. Returns the new version or None."""
+        with self._exclusive() as allowed:
+            if not allowed:
+                return None
+            return self._update()
+
+    def _update(self):
+        parent = self.registry.latest()
+        if not parent:
+            return None
+        meta = self.registry.load_meta(parent)
+        if meta["feature_names"] != FEATURE_NAMES:
+            print(f"⚠️ Skipping incremental update: {parent} uses a different feature schema")
+            return None
+
+        data = self.store.load(labeled_only=True)
+        current = data["extractor_version"] == FEATURE_EXTRACTOR_VERSION
+        X, y, created = data["X"][current], data["label"][current].astype(np.int64), data["created_at"][current]
+        watermark = self.watermark(meta)
+        new = created > watermark
+        n_new = int(new.sum())
+        if n_new < self.min_rows:
+            return None
+
+        # New rows plus a replay sample of older ones, so new trees are not fitted on a sliver of the data
+        old_idx = np.flatnonzero(~new)
+        if len(old_idx) > self.replay:
+            old_idx = self.rng.choice(old_idx, self.replay, replace=False)
+        idx = np.concatenate([np.flatnonzero(new), old_idx])
+        X_win, y_win = X[idx], y[idx]
+
+        estimator = self.registry.load_estimator(parent)
+        if not hasattr(estimator, "warm_start"):
+            raise TypeError(f"{type(estimator).__name__} cannot be warm-started")
+        pruning = meta["metadata"].get("pruning")
+        if pruning and len(estimator.estimators_) != pruning["trees"]:
+            if pruning.get("kept_trees") is None or len(estimator.estimators_) != pruning["original_trees"]:
+                # Versions pruned before the kept trees were recorded store the unpruned estimator
+                print(f"⚠️ Skipping incremental update: {parent} is pruned but does not record which trees "
+                      f"it kept; re-run `python -m app.forest` on its parent")
+                return None
+            apply_pruning(estimator, pruning["kept_trees"], pruning.get("max_depth"))
+        if set(y_win.tolist()) != set(estimator.classes_.tolist()):
+            print(f"⚠️ Waiting for more labels: update window only has classes {sorted(set(y_win.tolist()))}")
+            return None
+
+        t0 = time.perf_counter()
+        before = len(estimator.estimators_)
+        # Fresh seed per update: after trees are retired the count repeats, and so would the bootstrap draws
+        estimator.set_params(warm_start=True, n_estimators=before + self.trees,
+                             random_state=int(self.rng.randint(2 ** 31 - 1)))
+        estimator.fit(X_win, y_win)
+        retired = max(0, len(estimator.estimators_) - self.max_trees)
+        if retired:
+            estimator.estimators_ = estimator.estimators_[retired:]
+            estimator.n_estimators = len(estimator.estimators_)
+        estimator.set_params(warm_start=False)
+        fit_seconds = time.perf_counter() - t0
+        arrays = None
+        if pruning:
+            # New trees were grown to the pruned depth; older ones are cut at export
+            arrays = compact_arrays(subset_arrays(forest_to_arrays(estimator), max_depth=pruning.get("max_depth")))
+            pruning = {**{k: v for k, v in pruning.items() if k != "kept_trees"},
+                       "trees": len(estimator.estimators_)}
+
+        metadata = {
+            **{k: v for k, v in meta["metadata"].items() if k not in ("incremental", "pruning")},
+            **({"pruning": pruning} if pruning else {}),
+            "parent": parent,
+            "incremental": {
+                "watermark": float(created[new].max()),
+                "new_rows": n_new,
+                "replay_rows": int(len(old_idx)),
+                "trees_added": self.trees,
+                "trees_retired": retired,
+                "fit_seconds": round(fit_seconds, 3),
+            },
+        }
+        version = self.registry.publish(estimator, FEATURE_NAMES, metadata=metadata, arrays=arrays)
+        print(f"🌱 Incremental update {parent} -> {version}: {n_new} new rows, "
+              f"{self.trees} trees added, {retired} retired")
+        return version
+
+
+class ModelUpdater:
+    """Background task keeping the served model current without restarting the API.
+
+    Periodically runs IncrementalTrainer in a worker thread and polls the
+    registry's LATEST (which other processes, or app.train, may move). A new
+    version is loaded off the event loop and then swapped in with a single
+    reference assignment via `on_reload`; requests already scoring keep the
+    artifact they started with.
+    """
+
+    def __init__(self, on_reload, current_version, trainer=None, registry=None,
+                 interval=INCREMENTAL_INTERVAL, reload_interval=MODEL_RELOAD_INTERVAL):
+        self.on_reload = on_reload
+        self.version = current_version
+        self.registry = registry or ModelRegistry()
+        self.trainer = trainer
+        self.interval = interval
+        self.reload_interval = reload_interval
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    @property
+    def enabled(self):
+        # A single-file MODEL_PATH or a pinned version is never swapped out from under the operator
+        return not MODEL_PATH and not MODEL_REGISTRY_VERSION and (self.interval > 0 or self.reload_interval > 0)
+
+    async def start(self):
+        if self.enabled:
+            if self.interval > 0 and self.trainer is None:
+                self.trainer = IncrementalTrainer(registry=self.registry)
+            self._task = asyncio.create_task(self._run())
+            print(f"🌱 Model updater started (update every {self.interval:g}s, reload check every "
+                  f"{self.reload_interval:g}s).")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def trigger(self):
+        """Ask for an update attempt now (e.g. after new labels arrive)."""
+        self._wakeup.set()
+
+    async def _run(self):
+        tick = min(t for t in (self.interval, self.reload_interval) if t > 0)
+        last_update = time.monotonic()
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=tick)
+            except asyncio.TimeoutError:
+                pass
+            triggered = self._wakeup.is_set()
+            self._wakeup.clear()
+            try:
+                if self.trainer and (triggered or time.monotonic() - last_update >= self.interval):
+                    last_update = time.monotonic()
+                    await asyncio.to_thread(self.trainer.update)
+                await self.reload_if_changed()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"✗ Model update failed: {e}")
+
+    async def reload_if_changed(self):
+        latest = self.registry.latest()
+        if not latest or latest == self.version:
+            return False
+        artifact = await asyncio.to_thread(load_model, "", self.registry, latest)
+        self.version = artifact["version"]
+        self.on_reload(artifact)
+        print(f"🤖 Switched to model {self.version}")
+        return True
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run one incremental model update.")
+    parser.add_argument("--registry", default=None, help="registry directory (default: MODEL_REGISTRY_DIR)")
+    parser.add_argument("--feature-store", default=None, help="feature store directory (default: FEATURE_STORE_DIR)")
+    parser.add_argument("--min-rows", type=int, default=INCREMENTAL_MIN_ROWS)
+    parser.add_argument("--trees", type=int, default=INCREMENTAL_TREES)
+    parser.add_argument("--max-trees", type=int, default=INCREMENTAL_MAX_TREES)
+    args = parser.parse_args()
+
+    trainer = IncrementalTrainer(
+        registry=ModelRegistry(args.registry) if args.registry else None,
+        store=FeatureStore(args.feature_store) if args.feature_store else None,
+        min_rows=args.min_rows, trees=args.trees, max_trees=args.max_trees,
+    )
+    version = trainer.update()
+    print(f"✓ Published {version}" if version else "Nothing to update")
@@ -0,0 +1,124 @@
+# app/jobs.py
+import asyncio
+import os
+import time
+import uuid
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "100"))
+JOB_RETENTION = int(os.getenv("JOB_RETENTION", "3600"))
+
+
+class Job:
+    def __init__(self, payload):
+        self.id = uuid.uuid4().hex
+        self.filename = payload.get("filename")
+        self.payload = payload
+        self.status = "queued"
+        self.stages = {}
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def set_stage(self, name, status, **info):
+        """Record the status of one pipeline stage (pending/running/done/failed/skipped)."""
+        stage = self.stages.setdefault(name, {})
+        stage["status"] = status
+        now = time.time()
+        if status == "running":
+            stage["started_at"] = now
+        elif "started_at" in stage:
+            stage["duration"] = round(now - stage["started_at"], 3)
+        stage.update(info)
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "filename": self.filename,
+            "status": self.status,
+            "stages": self.stages,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    """Bounded in-process worker pool for long-running analysis jobs.
+
+    `handler` is an async callable invoked as ``await handler(job, **job.payload)``;
+    its return value becomes the job result. `on_discard`, if given, is called as
+    ``on_discard(job)`` for every job still queued at `stop()`, so its resources
+    (e.g. the uploaded APK) can be released.
+    """
+
+    def __init__(self, handler, workers=JOB_WORKERS, queue_size=JOB_QUEUE_SIZE, retention=JOB_RETENTION,
+                 on_discard=None):
+        self.handler = handler
+        self.on_discard = on_discard
+        self.workers = workers
+        self.retention = retention
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.jobs = {}
+        self._tasks = []
+
+    async def start(self):
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        print(f"🧵 Job pool started with {self.workers} workers.")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # Jobs that never reached a worker would otherwise leak whatever their payload holds
+        while not self.queue.empty():
+            job = self.queue.get_nowait()
+            job.status = "cancelled"
+            job.finished_at = time.time()
+            self.queue.task_done()
+            if self.on_discard is not None:
+                try:
+                    self.on_discard(job)
+                except Exception as e:
+                    print(f"✗ Cleanup of job {job.id} failed: {e}")
+
+    def submit(self, **payload):
+        """Queue a job. Raises asyncio.QueueFull when the backlog is at capacity."""
+        self._prune()
+        job = Job(payload)
+        self.queue.put_nowait(job)
+        self.jobs[job.id] = job
+        return job
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def _prune(self):
+        cutoff = time.time() - self.retention
+        expired = [jid for jid, j in self.jobs.items() if j.finished_at and j.finished_at < cutoff]
+        for jid in expired:
+            del self.jobs[jid]
+
+    async def _worker(self, index):
+        while True:
+            job = await self.queue.get()
+            job.status = "running"
+            job.started_at = time.time()
+            try:
+                job.result = await self.handler(job, **job.payload)
+                job.status = "completed"
+            except asyncio.CancelledError:
+                job.status = "cancelled"
+                raise
+            except Exception as e:
+                print(f"✗ Job {job.id} failed: {e}")
+                job.error = str(e)
+                job.status = "failed"
+            finally:
+                job.finished_at = time.time()
+                self.queue.task_done()
@@ -0,0 +1,77 @@
+# app/logcat.py
+import gzip
+import os
+import subprocess
+import threading
+from collections import deque
+
+from app.behavior import BehaviorCounter
+
+LOGCAT_SPOOL_DIR = os.getenv("LOGCAT_SPOOL_DIR", "")
+LOGCAT_TAIL_LINES = int(os.getenv("LOGCAT_TAIL_LINES", "200"))
+
+
+class LogcatStream:
+    """Streams `adb logcat` from one device on a background thread.
+
+    Every line is fed into a BehaviorCounter as it arrives, so memory stays
+    bounded (counters plus the last `tail_lines` lines) however long the run
+    is. Raw output can optionally be spooled to a gzip file.
+    """
+
+    def __init__(self, device_id, spool_path=None, tail_lines=LOGCAT_TAIL_LINES, counter=None):
+        self.device_id = device_id
+        self.spool_path = spool_path
+        self.counter = counter or BehaviorCounter()
+        self.tail = deque(maxlen=tail_lines)
+        self._proc = None
+        self._thread = None
+        self._spool = None
+
+    def start(self):
+        if self.spool_path:
+            os.makedirs(os.path.dirname(self.spool_path) or ".", exist_ok=True)
+            self._spool = gzip.open(self.spool_path, "wt", encoding="utf-8")
+        self._proc = subprocess.Popen(
+            ["adb", "-s", self.device_id, "logcat", "-v", "threadtime"],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            text=True, encoding="utf-8", errors="replace", bufsize=1,
+        )
+        self._thread = threading.Thread(target=self._read, name=f"logcat-{self.device_id}", daemon=True)
+        self._thread.start()
+        print(f"📜 Streaming logcat from {self.device_id}")
+        return self
+
+    def _read(self):
+        for line in self._proc.stdout:
+            self.counter.feed(line)
+            self.tail.append(line)
+            if self._spool is not None:
+                self._spool.write(line)
+
+    def stop(self, timeout=10):
+        if self._proc is None:
+            return self
+        if self._proc.poll() is None:
+            self._proc.terminate()
+            try:
+                self._proc.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                self._proc.kill()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+        if self._spool is not None:
+            self._spool.close()
+            self._spool = None
+        self._proc = None
+        print(f"✓ Streamed {self.counter.lines} log lines ({self.counter.chars} characters).")
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def behavior(self):
+        return self.counter.summary()
@@ -1,22 +1,31 @@
-from fastapi import FastAPI, UploadFile, File
-import tempfile
+from fastapi import FastAPI, UploadFile, File, HTTPException
+from pydantic import BaseModel
+from contextlib import asynccontextmanager
 import asyncio
+import time
 import json
 import os
 from datetime import datetime
 import uuid
-from app.ml_model import extract_features, train_dummy_model, classify_report
+from app.ml_model import classify_report, classify_batch, load_model
+from app.jobs import JobManager
+from app.verdict_cache import VerdictCache, VERDICT_CACHE_PURGE_INTERVAL
+from app.feature_store import FeatureStore
+from app.incremental import ModelUpdater
+from app.triage import triage_apk
+from app.apk_index import evict_apk_index
+from app.cert_reputation import CertReputation, mobsf_certificates
+from app.similarity import SimilarityIndex, SIMILARITY_SKIP_THRESHOLD, apk_sets, report_sets
+from app.uploads import save_upload, UploadTooLarge
 
 from supabase import create_client
 from dotenv import load_dotenv
-import httpx
 
 from app.dynamic_analyzer import DynamicAnalyzer
+from app.mobsf_client import MobSFClient, default_client as mobsf_default_client
 
 load_dotenv()
 
-app = FastAPI(title="Malicious App Detector")
-
 MOBSF_URL = os.getenv("MOBSF_URL")
 API_KEY = os.getenv("MOBSF_API_KEY")
 SUPABASE_URL = os.getenv("SUPABASE_URL")
@@ -25,133 +34,410 @@ SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 assert MOBSF_URL and API_KEY and SUPABASE_URL and SUPABASE_KEY, "Set all env vars"
 
 supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+mobsf = MobSFClient(MOBSF_URL, API_KEY)
 dynamic_analyzer = DynamicAnalyzer()
+verdict_cache = VerdictCache()
+feature_store = FeatureStore()
+similarity_index = SimilarityIndex()
+cert_reputation = CertReputation()
+ml_model = None  # loaded once in lifespan and shared read-only by all requests
+
+
+def _swap_model(artifact):
+    # One reference assignment: in-flight requests keep scoring with the artifact they already hold
+    global ml_model
+    ml_model = artifact
+
+
+model_updater = None
+
+
+async def _run_job(job, apk_path, filename, sha256=None, force_rescan=False, triage=None):
+    try:
+        return await run_full_analysis(apk_path, filename, job, sha256=sha256, force_rescan=force_rescan,
+                                       triage=triage)
+    finally:
+        _remove_file(apk_path)
+
+
+async def _purge_verdicts():
+    while True:
+        try:
+            removed = await asyncio.to_thread(verdict_cache.purge_expired)
+            if removed:
+                print(f"🧹 Purged {removed} expired verdicts")
+        except Exception as e:
+            print(f"✗ Verdict cache purge failed: {e}")
+        await asyncio.sleep(VERDICT_CACHE_PURGE_INTERVAL)
+
+
+job_manager = JobManager(_run_job, on_discard=lambda job: _remove_file(job.payload["apk_path"]))
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global ml_model, model_updater
+    ml_model = load_model()
+    print(f"🤖 Loaded model {ml_model['version']} (trained {ml_model['trained_at']})")
+    model_updater = ModelUpdater(_swap_model, ml_model["version"])
+    await mobsf.start()
+    await job_manager.start()
+    await model_updater.start()
+    purge_task = asyncio.create_task(_purge_verdicts())
+    yield
+    purge_task.cancel()
+    await asyncio.gather(purge_task, return_exceptions=True)
+    await model_updater.stop()
+    await job_manager.stop()
+    await mobsf.close()
+    await mobsf_default_client.close()  # pooled client behind upload_apk_and_get_report, if it was used
+    verdict_cache.close()
+    similarity_index.close()
+    cert_reputation.close()
+
+
+app = FastAPI(title="Malicious App Detector", lifespan=lifespan)
+
+
+class BatchClassifyRequest(BaseModel):
+    reports: list[dict] = []   # combined reports (as stored in scan-reports)
+    features: list[dict] = []  # pre-extracted feature rows
+
+
+class LabelRequest(BaseModel):
+    sha256: str
+    label: int  # 1 = malicious, 0 = benign
+
+
+def _remove_file(path):
+    try:
+        evict_apk_index(path)
+        os.remove(path)
+    except Exception:
+        pass
+
+
+async def _save_upload(file):
+    try:
+        upload = await save_upload(file)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    print(f"📥 Received {file.filename}: {upload.size} bytes (sha256 {upload.sha256[:12]})")
+    return upload.path, upload.sha256
+
+
+async def _triage(apk_path):
+    try:
+        return await asyncio.to_thread(triage_apk, apk_path, ml_model, cert_reputation)
+    except Exception as e:
+        print(f"✗ Triage crashed: {e}")
+        return {"status": "failed", "provisional": True, "error": str(e)}
+
+
+def _similar_before_scan(apk_path, sha256, triage):
+    """Neighbours from code hashes + manifest permissions, and a reusable dynamic result (worker thread)."""
+    sets = apk_sets(apk_path, triage)
+    signature = similarity_index.signature(sets)
+    t0 = time.perf_counter()
+    neighbours = similarity_index.query(signature, exclude=sha256)
+    lookup_ms = round((time.perf_counter() - t0) * 1e3, 3)
+    reused = None
+    if SIMILARITY_SKIP_THRESHOLD > 0:
+        for n in neighbours:
+            if n["similarity"] < SIMILARITY_SKIP_THRESHOLD:
+                break
+            dynamic = ((verdict_cache.get_report(n["sha256"]) or {}).get("dynamic_analysis")) or {}
+            if dynamic.get("status") == "success":
+                reused = {**dynamic, "reused_from": n["sha256"], "similarity": n["similarity"]}
+                break
+    return sets, neighbours, lookup_ms, reused
+
+
+def _similar_after_scan(sha256, sets, ml_result, filename, index_it):
+    """Neighbours on all families, then (for complete scans) index this APK with its verdict."""
+    signature = similarity_index.signature(sets)
+    neighbours = similarity_index.query(signature, exclude=sha256)
+    if index_it:
+        similarity_index.add(sha256, signature, label=ml_result.get("label"),
+                             probability=ml_result.get("probability"), filename=filename)
+    return neighbours
+
+
+def _upload_report(bucket_path, report):
+    supabase.storage.from_("scan-reports").upload(
+        bucket_path,
+        json.dumps(report, indent=2).encode(),
+        file_options={"content-type": "application/json"}
+    )
+
+
+def _provisional(triage):
+    """The part of a triage result clients see as the provisional verdict."""
+    keys = ("status", "label", "probability", "model_version", "package", "features", "signer_reputation",
+            "elapsed_ms", "error")
+    return {k: triage[k] for k in keys if k in triage}
+
 
-async def upload_and_get_report_from_file(apk_path, filename):
-    headers = {"Authorization": API_KEY}
-    async with httpx.AsyncClient(timeout=300.0) as client:
-        with open(apk_path, "rb") as f:
-            files = {"file": (filename, f, "application/octet-stream")}
-            upload_resp = await client.post(f"{MOBSF_URL}/api/v1/upload", files=files, headers=headers)
+async def run_full_analysis(apk_path, filename, job=None, sha256=None, force_rescan=False, triage=None):
+    """Run static + dynamic analysis and ML classification, returning the summary response.
 
-        if upload_resp.status_code != 200:
-            return {"filename": filename, "error": f"Upload failed: {upload_resp.text}", "status": "failed", "stage_log": [f"Upload failed: {upload_resp.text}"]}
+    When `job` is given, per-stage progress is recorded on it. A prior verdict for
+    the same `sha256` is returned straight from the cache unless `force_rescan` is set.
+    A provisional verdict from in-process manifest/certificate triage is recorded
+    first (or reused when `triage` was already computed) and refined by the full pipeline.
+    """
+    started = time.perf_counter()
+    timings = {}
 
-        upload_data = upload_resp.json()
-        md5_hash = upload_data.get("hash")
+    def stage(name, status, **info):
+        if job is not None:
+            job.set_stage(name, status, **info)
 
-        if not md5_hash:
-            return {"filename": filename, "error": "No hash received from MobSF", "status": "failed", "stage_log": ["No hash received from MobSF"]}
+    # --- Verdict Cache ---
+    if sha256 and not force_rescan:
+        # Verdicts from an older model (e.g. before an incremental update) are misses
+        cached = await asyncio.to_thread(verdict_cache.get, sha256, ml_model["version"])
+        if cached is not None:
+            print(f"⚡ Cache hit for {filename} ({sha256[:12]})")
+            stage("cache", "done", hit=True)
+            return {
+                **cached["response"],
+                "filename": filename,
+                "cached": True,
+                "cached_at": cached["created_at"],
+                "timings": {"total": round(time.perf_counter() - started, 3)},
+            }
 
-        # Trigger scan explicitly after upload
-        scan_resp = await client.post(
-            f"{MOBSF_URL}/api/v1/scan",
-            headers=headers,
-            data={"hash": md5_hash}
+    # --- Instant Triage (manifest + signing block, milliseconds) ---
+    if triage is None:
+        t0 = time.perf_counter()
+        triage = await _triage(apk_path)
+        timings["triage"] = round(time.perf_counter() - t0, 3)
+    stage("triage", "done" if triage.get("status") == "success" else "failed", provisional=_provisional(triage))
+
+    # --- Near-Duplicate Lookup (code hashes + permissions, before the expensive stages) ---
+    t0 = time.perf_counter()
+    try:
+        apk_family_sets, pre_scan, lookup_ms, reused_dynamic = await asyncio.to_thread(
+            _similar_before_scan, apk_path, sha256, triage)
+        stage("similarity", "done", neighbours=pre_scan, lookup_ms=lookup_ms)
+    except Exception as e:
+        print(f"✗ Similarity lookup failed: {e}")
+        apk_family_sets, pre_scan, reused_dynamic = {}, [], None
+        stage("similarity", "failed", error=str(e))
+    timings["similarity"] = round(time.perf_counter() - t0, 3)
+
+    async def timed_stage(name, coro):
+        stage(name, "running")
+        t0 = time.perf_counter()
+        try:
+            result = await coro
+        except Exception as e:
+            print(f"✗ {name} crashed: {e}")
+            result = {"status": "failed", "error": str(e), "stage_log": [f"{name} crashed: {e}"]}
+        timings[name] = round(time.perf_counter() - t0, 3)
+        stage(name, "done" if result.get("status") == "success" else "failed")
+        return result
+
+    # --- Run Static and Dynamic Analysis concurrently (they only share the APK file) ---
+    if reused_dynamic is not None:
+        # A near-identical APK already went through the emulator: reuse its behaviour instead
+        print(f"♻️ Reusing dynamic analysis of {reused_dynamic['reused_from'][:12]} "
+              f"(similarity {reused_dynamic['similarity']:.2f})")
+        stage("dynamic_analysis", "skipped", reused_from=reused_dynamic["reused_from"])
+        static_result = await timed_stage("static_analysis", mobsf.upload_and_get_report(apk_path, filename))
+        dynamic_result = reused_dynamic
+    else:
+        static_result, dynamic_result = await asyncio.gather(
+            timed_stage("static_analysis", mobsf.upload_and_get_report(apk_path, filename)),
+            timed_stage("dynamic_analysis", asyncio.to_thread(dynamic_analyzer.analyze_apk, apk_path)),
         )
 
-        if scan_resp.status_code != 200:
-            return {"filename": filename, "error": f"Scan trigger failed: {scan_resp.text}", "status": "failed", "stage_log": [f"Scan trigger failed: {scan_resp.text}"]}
-
-        max_attempts = 60
-        poll_interval = 10
-        stage_log = ["Upload successful, scanning started."]
-
-        for attempt in range(max_attempts):
-            await asyncio.sleep(poll_interval)
-            try:
-                report_resp = await client.post(
-                    f"{MOBSF_URL}/api/v1/report_json",
-                    headers=headers,
-                    data={"hash": md5_hash}
-                )
-                if report_resp.status_code == 200:
-                    report = report_resp.json()
-                    elapsed_time = (attempt + 1) * poll_interval
-                    stage_log.append(f"✓ Report ready for {filename} in {elapsed_time}s")
-                    return {
-                        "filename": filename,
-                        "hash": md5_hash,
-                        "full_report": report,
-                        "status": "success",
-                        "scan_duration": elapsed_time,
-                        "stage_log": stage_log
-                    }
-            except Exception as e:
-                stage_log.append(f"Poll attempt {attempt + 1} failed: {e}")
-                continue
-
-        stage_log.append("Report not ready after 600 seconds of polling.")
-        return {
-            "filename": filename,
-            "error": "Report not ready after 600 seconds of polling",
-            "status": "timeout",
-            "stage_log": stage_log
-        }
+    timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
+    unique_id = str(uuid.uuid4())[:8]
+    base_filename = filename.replace('.apk', '').replace('.APK', '')
+    bucket_path = f"combined-analysis/{base_filename}/{timestamp}_{unique_id}.json"
 
+    # --- Combine Results ---
+    combined_report = {
+        "filename": filename,
+        "timestamp": datetime.utcnow().isoformat(),
+        "static_analysis": static_result,
+        "dynamic_analysis": dynamic_result,
+        "triage": triage,
+    }
 
-@app.post("/analyze_full/")
-async def analyze_full(file: UploadFile = File(...)):
-    filename = file.filename
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".apk") as tmp:
-        content = await file.read()
-        tmp.write(content)
-        apk_path = tmp.name
+    # --- Run ML Classification ---
+    stage("ml_classification", "running")
+    t0 = time.perf_counter()
+    try:
+        ml_result = classify_report(combined_report, ml_model)
+        combined_report["ml_result"] = ml_result
+        print(f"🤖 ML Prediction: {ml_result['label']} ({ml_result['probability']:.2f})")
+        stage("ml_classification", "done")
+    except Exception as e:
+        print(f"✗ ML classification failed: {e}")
+        ml_result = {"error": str(e), "label": "unknown", "probability": 0.0}
+        stage("ml_classification", "failed", error=str(e))
+    timings["ml_classification"] = round(time.perf_counter() - t0, 3)
+    complete = bool(sha256) and static_result.get("status") == "success" and "error" not in ml_result
 
+    # --- Near-Duplicates on all families, then index this APK ---
+    # Manifest permissions win over MobSF's so the indexed set matches what pre-scan lookups will use
+    sets = {**report_sets(combined_report), **apk_family_sets}
     try:
-        # --- Run Static and Dynamic Analysis ---
-        static_result = await upload_and_get_report_from_file(apk_path, filename)
-        dynamic_result = await asyncio.to_thread(dynamic_analyzer.analyze_apk, apk_path)
-
-        timestamp = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-        unique_id = str(uuid.uuid4())[:8]
-        base_filename = filename.replace('.apk', '').replace('.APK', '')
-        bucket_path = f"combined-analysis/{base_filename}/{timestamp}_{unique_id}.json"
-
-        # --- Combine Results ---
-        combined_report = {
-            "filename": filename,
-            "timestamp": datetime.utcnow().isoformat(),
-            "static_analysis": static_result,
-            "dynamic_analysis": dynamic_result,
-        }
-
-        # --- Run ML Classification ---
+        similar = await asyncio.to_thread(_similar_after_scan, sha256, sets, ml_result, filename, complete)
+    except Exception as e:
+        print(f"✗ Similarity indexing failed: {e}")
+        similar = []
+    combined_report["similarity"] = {
+        "pre_scan": pre_scan,
+        "neighbours": similar,
+        "dynamic_reused_from": reused_dynamic["reused_from"] if reused_dynamic else None,
+    }
+
+    # --- Upload Report to Supabase ---
+    stage("storage", "running")
+    try:
+        # Serialising a large report and the storage round-trip would stall every other request
+        await asyncio.to_thread(_upload_report, bucket_path, combined_report)
+        print(f"✓ Combined report saved: {bucket_path}")
+        stage("storage", "done")
+    except Exception as e:
+        print(f"✗ Failed to save combined report: {e}")
+        stage("storage", "failed", error=str(e))
+
+    # --- Record Feature Row (label unknown until confirmed) ---
+    if sha256 and static_result.get("status") == "success" and "features" in ml_result:
         try:
-            base_features = extract_features(combined_report)
-            model = train_dummy_model(base_features)  # Temporary inline training (replace with pre-trained)
-            ml_result = classify_report(combined_report, model)
-            combined_report["ml_result"] = ml_result
-            print(f"🤖 ML Prediction: {ml_result['label']} ({ml_result['probability']:.2f})")
+            await asyncio.to_thread(feature_store.append, sha256, ml_result["features"],
+                                    md5=static_result.get("hash"))
         except Exception as e:
-            print(f"✗ ML classification failed: {e}")
-            ml_result = {"error": str(e), "label": "unknown", "probability": 0.0}
+            print(f"✗ Failed to store feature row: {e}")
 
-        # --- Upload Report to Supabase ---
+    timings["total"] = round(time.perf_counter() - started, 3)
+
+    # --- Return Final Response (summary only, including stage logs)---
+    response = {
+        "filename": filename,
+        "sha256": sha256,
+        "static_status": static_result.get("status") if static_result else "unknown",
+        "static_stage_log": static_result.get("stage_log", []),
+        "dynamic_status": dynamic_result.get("status") if dynamic_result else "unknown",
+        "dynamic_stage_log": dynamic_result.get("stage_log", []),
+        "bucket_path": bucket_path,
+        "classification": ml_result.get("label", "unknown"),
+        "malicious_probability": ml_result.get("probability", 0.0),
+        "provisional": _provisional(triage),
+        "similar": similar,
+    }
+
+    # --- Update Signer Reputation (complete verdicts only, like the cache) ---
+    if complete:
+        certificates = triage.get("certificates") or mobsf_certificates(combined_report)
         try:
-            supabase.storage.from_("scan-reports").upload(
-                bucket_path,
-                json.dumps(combined_report, indent=2).encode(),
-                file_options={"content-type": "application/json"}
-            )
-            print(f"✓ Combined report saved: {bucket_path}")
+            await asyncio.to_thread(cert_reputation.record, sha256, certificates,
+                                    ml_result.get("label") == "malicious")
         except Exception as e:
-            print(f"✗ Failed to save combined report: {e}")
-
-        # --- Return Final Response (summary only, including stage logs)---
-        return {
-            "filename": filename,
-            "static_status": static_result.get("status") if static_result else "unknown",
-            "static_stage_log": static_result.get("stage_log", []),
-            "dynamic_status": dynamic_result.get("status") if dynamic_result else "unknown",
-            "dynamic_stage_log": dynamic_result.get("stage_log", []),
-            "bucket_path": bucket_path,
-            "classification": ml_result.get("label", "unknown"),
-            "malicious_probability": ml_result.get("probability", 0.0)
-        }
+            print(f"✗ Failed to update signer reputation: {e}")
 
-    finally:
+    # Only cache complete verdicts so failed scans are retried next time
+    if complete:
         try:
-            os.remove(apk_path)
-        except Exception:
-            pass
+            # json.dumps of the full report plus the SQLite commit would stall the event loop
+            await asyncio.to_thread(verdict_cache.put, sha256, response, ml_result, combined_report,
+                                    ml_result.get("model_version"))
+        except Exception as e:
+            print(f"✗ Failed to cache verdict: {e}")
+
+    return {**response, "cached": False, "timings": timings}
+
+
+@app.post("/analyze_full/")
+async def analyze_full(file: UploadFile = File(...), force_rescan: bool = False):
+    apk_path, sha256 = await _save_upload(file)
+    try:
+        return await run_full_analysis(apk_path, file.filename, sha256=sha256, force_rescan=force_rescan)
+    finally:
+        _remove_file(apk_path)
+
+
+@app.post("/jobs/", status_code=202)
+async def submit_job(file: UploadFile = File(...), force_rescan: bool = False):
+    apk_path, sha256 = await _save_upload(file)
+    triage = await _triage(apk_path)
+    try:
+        job = job_manager.submit(apk_path=apk_path, filename=file.filename, sha256=sha256,
+                                 force_rescan=force_rescan, triage=triage)
+    except asyncio.QueueFull:
+        _remove_file(apk_path)
+        raise HTTPException(status_code=503, detail="Analysis queue is full, retry later")
+    job.set_stage("triage", "done" if triage.get("status") == "success" else "failed",
+                  provisional=_provisional(triage))
+    return {"job_id": job.id, "status": job.status, "status_url": f"/jobs/{job.id}",
+            "provisional": _provisional(triage)}
+
+
+@app.post("/triage")
+async def triage_endpoint(file: UploadFile = File(...)):
+    """Provisional verdict from the manifest and signer certificates only (no MobSF, no emulator)."""
+    apk_path, sha256 = await _save_upload(file)
+    try:
+        triage = await _triage(apk_path)
+    finally:
+        _remove_file(apk_path)
+    return {"filename": file.filename, "sha256": sha256, **triage}
+
+
+@app.post("/classify_batch")
+async def classify_batch_endpoint(body: BatchClassifyRequest):
+    try:
+        results = await asyncio.to_thread(classify_batch, ml_model, body.reports, body.features)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {"model_version": ml_model["version"], "count": len(results), "results": results}
+
+
+@app.post("/labels")
+async def submit_label(body: LabelRequest):
+    if body.label not in (0, 1):
+        raise HTTPException(status_code=422, detail="label must be 0 (benign) or 1 (malicious)")
+    row = await asyncio.to_thread(feature_store.set_label, body.sha256.lower(), body.label)
+    if row is None:
+        raise HTTPException(status_code=404, detail="No analyzed APK with that sha256")
+    await asyncio.to_thread(cert_reputation.set_label, row["sha256"], body.label)
+    await asyncio.to_thread(similarity_index.set_label, row["sha256"], "malicious" if body.label else "benign")
+    await asyncio.to_thread(verdict_cache.delete, row["sha256"])  # the cached verdict predates the label
+    model_updater.trigger()
+    return {"sha256": row["sha256"], "label": row["label"], "model_version": ml_model["version"]}
+
+
+@app.get("/model")
+async def get_model():
+    return {
+        "version": ml_model["version"],
+        "trained_at": ml_model["trained_at"],
+        "metadata": ml_model.get("metadata", {}),
+    }
+
+
+@app.get("/certificates/{fingerprint}")
+async def get_certificate(fingerprint: str):
+    """Scan history of a signer certificate (SHA-256 fingerprint of its DER encoding)."""
+    stats = await asyncio.to_thread(cert_reputation.get, fingerprint.replace(":", ""))
+    if stats is None:
+        raise HTTPException(status_code=404, detail="No analyzed APK was signed with that certificate")
+    return stats
+
+
+@app.get("/devices")
+async def get_devices():
+    return dynamic_analyzer.pool.status()
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
@@ -1,8 +1,25 @@
 # app/ml_model.py
 import json
+import os
+from datetime import datetime
+import joblib
 import numpy as np
-import pandas as pd
-from sklearn.ensemble import RandomForestClassifier
+
+from app.model_registry import ModelRegistry
+
+# Column order the classifier is trained on; artifacts record it and are checked against it
+FEATURE_NAMES = [
+    "is_debuggable", "allow_backup", "manifest_high", "manifest_warning",
+    "is_signed_with_debug_cert", "num_certificate_findings_high",
+    "has_nx", "has_pie", "has_stack_canary", "has_relro_full", "has_fortify",
+    "num_dangerous_permissions", "code_high", "code_warning",
+    "dynamic_permission_requests", "dynamic_native_code_calls",
+]
+# Bump whenever extract_features changes meaning, so stored feature rows can be told apart
+FEATURE_EXTRACTOR_VERSION = 1
+MODEL_VERSION = "dummy-rf-1"
+# Single-file joblib artifact; when unset, models come from the versioned registry
+MODEL_PATH = os.getenv("MODEL_PATH", "")
 
 # --- FEATURE EXTRACTION ---
 def extract_features(report):
@@ -59,46 +76,161 @@ def extract_features(report):
 
 
 # --- TRAINING FUNCTION (for dev/test use only) ---
-def train_dummy_model(base_features, samples=200):
+def heuristic_label(row):
+    """Rule-of-thumb label used wherever no analyst label exists yet."""
+    return int(
+        bool(row["is_signed_with_debug_cert"]) or
+        bool(row["is_debuggable"]) or
+        row["num_dangerous_permissions"] > 6 or
+        row["code_high"] > 1
+    )
+
+
+def synthetic_rows(base_features=None, samples=200, random_state=None):
+    """Randomised variations of `base_features`, each labelled with heuristic_label."""
+    rng = random_state if isinstance(random_state, np.random.RandomState) else np.random.RandomState(random_state)
+    base_features = base_features or dict.fromkeys(FEATURE_NAMES, 0)
     rows = []
     for i in range(samples):
         r = base_features.copy()
         for k in ["is_debuggable","allow_backup","is_signed_with_debug_cert",
                   "has_nx","has_pie","has_stack_canary","has_relro_full","has_fortify"]:
-            r[k] = np.random.choice([0,1], p=[0.7,0.3])
-        r["num_dangerous_permissions"] = np.random.randint(0, 12)
-        r["manifest_high"] = np.random.randint(0, 5)
-        r["manifest_warning"] = np.random.randint(0, 10)
-        r["code_high"] = np.random.randint(0, 4)
-        r["code_warning"] = np.random.randint(0, 5)
-        r["dynamic_permission_requests"] = np.random.randint(0, 30)
-        r["dynamic_native_code_calls"] = np.random.randint(0, 100)
-        r["num_certificate_findings_high"] = np.random.randint(0, 3)
-        r["label"] = int(
-            r["is_signed_with_debug_cert"] or
-            r["is_debuggable"] or
-            r["num_dangerous_permissions"] > 6 or
-            r["code_high"] > 1
-        )
+            r[k] = rng.choice([0,1], p=[0.7,0.3])
+        r["num_dangerous_permissions"] = rng.randint(0, 12)
+        r["manifest_high"] = rng.randint(0, 5)
+        r["manifest_warning"] = rng.randint(0, 10)
+        r["code_high"] = rng.randint(0, 4)
+        r["code_warning"] = rng.randint(0, 5)
+        r["dynamic_permission_requests"] = rng.randint(0, 30)
+        r["dynamic_native_code_calls"] = rng.randint(0, 100)
+        r["num_certificate_findings_high"] = rng.randint(0, 3)
+        r["label"] = heuristic_label(r)
         rows.append(r)
-    df = pd.DataFrame(rows)
-    X = df.drop(columns=["label"])
-    y = df["label"]
+    return rows
+
+
+def train_dummy_model(base_features=None, samples=200, random_state=None):
+    # Imported here so serving (registry model -> ForestModel) never loads sklearn
+    from sklearn.ensemble import RandomForestClassifier
+
+    rows = synthetic_rows(base_features, samples, random_state)
+    X = features_matrix(rows)
+    y = np.array([r["label"] for r in rows])
 
     model = RandomForestClassifier(n_estimators=120, random_state=42)
     model.fit(X, y)
     return model
 
 
-# --- PREDICT FUNCTION ---
-def classify_report(report, model):
-    features = extract_features(report)
-    df = pd.DataFrame([features])
-    pred = model.predict(df)[0]
-    prob = model.predict_proba(df)[0][1]
-    return {
-        "prediction": int(pred),
-        "probability": float(prob),
-        "label": "malicious" if pred == 1 else "benign",
-        "features": features
+# --- MODEL ARTIFACT ---
+def save_model(model, path, version=MODEL_VERSION, metadata=None):
+    """Persist a fitted estimator together with its feature schema and version."""
+    artifact = {
+        "model": model,
+        "feature_names": list(FEATURE_NAMES),
+        "version": version,
+        "trained_at": datetime.utcnow().isoformat(),
+        "metadata": metadata or {},
     }
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    joblib.dump(artifact, path)
+    return artifact
+
+
+def load_model(path=MODEL_PATH, registry=None, version=None):
+    """Load the deployed model artifact. Call once per process and share it read-only.
+
+    With a `path` (or MODEL_PATH) this reads a single save_model file; otherwise
+    the version is loaded memory-mapped from the model registry.
+    """
+    if path:
+        if not os.path.exists(path):
+            raise FileNotFoundError(
+                f"Model artifact not found at {path}. Build one with `python -m app.ml_model --output {path}` "
+                "or point MODEL_PATH at an existing artifact."
+            )
+        artifact = joblib.load(path)
+        if not isinstance(artifact, dict) or "model" not in artifact:
+            raise ValueError(f"{path} is not a model artifact (missing 'model')")
+        source = path
+    else:
+        registry = registry or ModelRegistry()
+        artifact = registry.load(version)
+        source = f"{registry.root}/{artifact['version']}"
+    if artifact.get("feature_names") != FEATURE_NAMES:
+        raise ValueError(
+            f"Model artifact {source} was trained on features {artifact.get('feature_names')}, "
+            f"expected {FEATURE_NAMES}"
+        )
+    return artifact
+
+
+def _unpack(model):
+    if isinstance(model, dict):
+        return model["model"], model.get("version")
+    return model, None
+
+
+# --- PREDICT FUNCTIONS ---
+def features_matrix(rows):
+    """Stack feature dicts into one C-contiguous float64 matrix in FEATURE_NAMES column order."""
+    X = np.empty((len(rows), len(FEATURE_NAMES)), dtype=np.float64)
+    for i, row in enumerate(rows):
+        missing = [k for k in FEATURE_NAMES if k not in row]
+        if missing:
+            raise ValueError(f"Feature row {i} is missing {missing}")
+        X[i] = [row[k] or 0 for k in FEATURE_NAMES]
+    return X
+
+
+def classify_batch(model, reports=(), feature_rows=()):
+    """Classify many combined reports and/or pre-extracted feature rows at once.
+
+    Everything is stacked into one matrix and scored with a single
+    predict_proba call; labels are the argmax of those same probabilities.
+    Results come back in input order, reports first.
+    """
+    estimator, version = _unpack(model)
+    rows = [extract_features(r) for r in reports] + [dict(r) for r in feature_rows]
+    if not rows:
+        return []
+    proba = estimator.predict_proba(features_matrix(rows))
+    classes = list(estimator.classes_)
+    preds = np.asarray(estimator.classes_)[proba.argmax(axis=1)]
+    malicious = proba[:, classes.index(1)] if 1 in classes else np.zeros(len(rows))
+    return [
+        {
+            "prediction": int(pred),
+            "probability": float(prob),
+            "label": "malicious" if pred == 1 else "benign",
+            "model_version": version,
+            "features": row,
+        }
+        for pred, prob, row in zip(preds, malicious, rows)
+    ]
+
+
+def classify_report(report, model):
+    """Classify one combined report. `model` is a loaded artifact or a bare fitted estimator."""
+    return classify_batch(model, reports=[report])[0]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build the bootstrap classifier and publish it to the registry.")
+    parser.add_argument("--registry", default=None, help="registry directory (default: MODEL_REGISTRY_DIR)")
+    parser.add_argument("--output", default=MODEL_PATH, help="write a single joblib artifact here instead")
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    model = train_dummy_model(samples=args.samples, random_state=args.seed)
+    metadata = {"samples": args.samples, "seed": args.seed, "source": "synthetic", "estimator": "RandomForestClassifier"}
+    if args.output:
+        save_model(model, args.output, metadata=metadata)
+        print(f"✓ Model artifact written to {args.output}")
+    else:
+        registry = ModelRegistry(args.registry) if args.registry else ModelRegistry()
+        registry.publish(model, FEATURE_NAMES, metadata=metadata)
@@ -1,5 +1,8 @@
-import requests
+import asyncio
 import os
+import random
+import time
+import httpx
 from dotenv import load_dotenv
 
 # Load environment variables from .env file in the project root folder
@@ -9,12 +12,214 @@ load_dotenv(dotenv_path)
 MOBSF_URL = os.getenv("MOBSF_URL", "http://127.0.0.1:8000")
 API_KEY = os.getenv("MOBSF_API_KEY", "f1e2a9b4cf5d3e895437f8eda524b2733474fd7dcc0d0dab06637bb64c83e9ef")
 
-def upload_apk_and_get_report(filename: str, file_content: bytes):
-    headers = {"Authorization": API_KEY}
-    files = {"file": (filename, file_content)}
+MOBSF_MAX_CONNECTIONS = int(os.getenv("MOBSF_MAX_CONNECTIONS", "20"))
+MOBSF_MAX_KEEPALIVE = int(os.getenv("MOBSF_MAX_KEEPALIVE", "10"))
+MOBSF_KEEPALIVE_EXPIRY = float(os.getenv("MOBSF_KEEPALIVE_EXPIRY", "30"))
+MOBSF_CONNECT_TIMEOUT = float(os.getenv("MOBSF_CONNECT_TIMEOUT", "10"))
+MOBSF_UPLOAD_TIMEOUT = float(os.getenv("MOBSF_UPLOAD_TIMEOUT", "300"))
+MOBSF_SCAN_TIMEOUT = float(os.getenv("MOBSF_SCAN_TIMEOUT", "600"))
+MOBSF_REPORT_TIMEOUT = float(os.getenv("MOBSF_REPORT_TIMEOUT", "60"))
+
+# Report polling: short first wait, then exponential backoff with jitter up to a cap
+MOBSF_POLL_INITIAL_DELAY = float(os.getenv("MOBSF_POLL_INITIAL_DELAY", "0.5"))
+MOBSF_POLL_MAX_DELAY = float(os.getenv("MOBSF_POLL_MAX_DELAY", "15"))
+MOBSF_POLL_BACKOFF = float(os.getenv("MOBSF_POLL_BACKOFF", "1.6"))
+MOBSF_POLL_JITTER = float(os.getenv("MOBSF_POLL_JITTER", "0.2"))
+MOBSF_POLL_TIMEOUT = float(os.getenv("MOBSF_POLL_TIMEOUT", "600"))
+MOBSF_USE_SCAN_LOGS = os.getenv("MOBSF_USE_SCAN_LOGS", "1") == "1"
+
+
+def poll_delays(initial=MOBSF_POLL_INITIAL_DELAY, maximum=MOBSF_POLL_MAX_DELAY,
+                factor=MOBSF_POLL_BACKOFF, jitter=MOBSF_POLL_JITTER):
+    """Yield an endless sequence of backoff delays with +/- `jitter` (fractional) noise."""
+    delay = initial
+    while True:
+        yield max(0.0, delay * random.uniform(1 - jitter, 1 + jitter))
+        delay = min(maximum, delay * factor)
+
+
+class MobSFClient:
+    """Application-scoped MobSF REST client.
+
+    Wraps one pooled `httpx.AsyncClient` so the upload, scan trigger and report
+    polls of every scan reuse keep-alive connections. Call `start()` at startup
+    and `close()` on shutdown; the pool is also created lazily on first use.
+    """
+
+    def __init__(self, base_url=MOBSF_URL, api_key=API_KEY,
+                 max_connections=MOBSF_MAX_CONNECTIONS, max_keepalive=MOBSF_MAX_KEEPALIVE,
+                 keepalive_expiry=MOBSF_KEEPALIVE_EXPIRY, connect_timeout=MOBSF_CONNECT_TIMEOUT,
+                 upload_timeout=MOBSF_UPLOAD_TIMEOUT, scan_timeout=MOBSF_SCAN_TIMEOUT,
+                 report_timeout=MOBSF_REPORT_TIMEOUT, poll_initial_delay=MOBSF_POLL_INITIAL_DELAY,
+                 poll_max_delay=MOBSF_POLL_MAX_DELAY, poll_backoff=MOBSF_POLL_BACKOFF,
+                 poll_jitter=MOBSF_POLL_JITTER, poll_timeout=MOBSF_POLL_TIMEOUT,
+                 use_scan_logs=MOBSF_USE_SCAN_LOGS):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.connect_timeout = connect_timeout
+        self.upload_timeout = upload_timeout
+        self.scan_timeout = scan_timeout
+        self.report_timeout = report_timeout
+        self.poll_initial_delay = poll_initial_delay
+        self.poll_max_delay = poll_max_delay
+        self.poll_backoff = poll_backoff
+        self.poll_jitter = poll_jitter
+        self.poll_timeout = poll_timeout
+        # Flipped off the first time the server does not expose /scan_logs
+        self.use_scan_logs = use_scan_logs
+        self._client = None
+
+    # -----------------------------
+    # Lifecycle
+    # -----------------------------
+    async def start(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"Authorization": self.api_key},
+                limits=self.limits,
+                timeout=httpx.Timeout(self.report_timeout, connect=self.connect_timeout),
+            )
+        return self
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _post(self, path, timeout, **kwargs):
+        await self.start()
+        return await self._client.post(
+            path, timeout=httpx.Timeout(timeout, connect=self.connect_timeout), **kwargs
+        )
+
+    # -----------------------------
+    # REST operations
+    # -----------------------------
+    async def upload(self, filename, content):
+        """Upload an APK given as bytes or an open binary file (streamed from disk)."""
+        files = {"file": (filename, content, "application/octet-stream")}
+        return await self._post("/api/v1/upload", self.upload_timeout, files=files)
+
+    async def upload_file(self, apk_path, filename):
+        with open(apk_path, "rb") as f:
+            return await self.upload(filename, f)
+
+    async def scan(self, md5_hash):
+        return await self._post("/api/v1/scan", self.scan_timeout, data={"hash": md5_hash})
+
+    async def report_json(self, md5_hash):
+        return await self._post("/api/v1/report_json", self.report_timeout, data={"hash": md5_hash})
+
+    async def scan_logs(self, md5_hash):
+        """Return MobSF's scan log entries for `md5_hash`, or None if the server lacks the endpoint."""
+        if not self.use_scan_logs:
+            return None
+        resp = await self._post("/api/v1/scan_logs", self.report_timeout, data={"hash": md5_hash})
+        if resp.status_code in (404, 405):
+            self.use_scan_logs = False
+            return None
+        if resp.status_code != 200:
+            return None
+        return resp.json().get("logs") or []
+
+    # -----------------------------
+    # Full static scan
+    # -----------------------------
+    async def upload_and_get_report(self, apk_path, filename):
+        upload_resp = await self.upload_file(apk_path, filename)
+
+        if upload_resp.status_code != 200:
+            return {"filename": filename, "error": f"Upload failed: {upload_resp.text}", "status": "failed", "stage_log": [f"Upload failed: {upload_resp.text}"]}
+
+        upload_data = upload_resp.json()
+        md5_hash = upload_data.get("hash")
+
+        if not md5_hash:
+            return {"filename": filename, "error": "No hash received from MobSF", "status": "failed", "stage_log": ["No hash received from MobSF"]}
+
+        # Trigger scan explicitly after upload
+        scan_started = time.monotonic()
+        scan_resp = await self.scan(md5_hash)
+
+        if scan_resp.status_code != 200:
+            return {"filename": filename, "error": f"Scan trigger failed: {scan_resp.text}", "status": "failed", "stage_log": [f"Scan trigger failed: {scan_resp.text}"]}
+
+        stage_log = ["Upload successful, scanning started."]
+        result = await self.wait_for_report(md5_hash, filename, stage_log, scan_started)
+        result["stage_log"] = stage_log
+        return result
+
+    async def wait_for_report(self, md5_hash, filename, stage_log, started=None):
+        """Poll report_json with jittered exponential backoff until ready, failed or timed out.
+
+        Between report polls the scan_logs endpoint (when available) is used to
+        fail fast on scanner exceptions and to surface scan progress. Progress
+        does not reset the backoff: MobSF logs steps throughout a scan, so a
+        reset would keep long scans polled at the initial rate.
+        """
+        started = started or time.monotonic()
+        deadline = time.monotonic() + self.poll_timeout
+        delays = poll_delays(self.poll_initial_delay, self.poll_max_delay, self.poll_backoff, self.poll_jitter)
+        attempt = 0
+        seen_logs = 0
+
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            await asyncio.sleep(min(next(delays), remaining))
+            attempt += 1
+            try:
+                report_resp = await self.report_json(md5_hash)
+                if report_resp.status_code == 200:
+                    report = report_resp.json()
+                    elapsed_time = round(time.monotonic() - started, 2)
+                    stage_log.append(f"✓ Report ready for {filename} in {elapsed_time}s ({attempt} polls)")
+                    return {
+                        "filename": filename,
+                        "hash": md5_hash,
+                        "full_report": report,
+                        "status": "success",
+                        "scan_duration": elapsed_time,
+                    }
+
+                logs = await self.scan_logs(md5_hash)
+                if logs:
+                    failed = [entry for entry in logs if entry.get("exception")]
+                    if failed:
+                        error = f"MobSF scan failed: {failed[-1].get('status')} - {failed[-1].get('exception')}"
+                        stage_log.append(error)
+                        return {"filename": filename, "hash": md5_hash, "error": error, "status": "failed"}
+                    if len(logs) > seen_logs:
+                        # Scan is progressing: report the newest step (the backoff keeps its position)
+                        seen_logs = len(logs)
+                        stage_log.append(f"MobSF: {logs[-1].get('status')}")
+            except Exception as e:
+                stage_log.append(f"Poll attempt {attempt} failed: {e}")
+                continue
+
+        stage_log.append(f"Report not ready after {self.poll_timeout:.0f} seconds of polling.")
+        return {
+            "filename": filename,
+            "error": f"Report not ready after {self.poll_timeout:.0f} seconds of polling",
+            "status": "timeout",
+        }
+
+
+default_client = MobSFClient()
+
+
+async def upload_apk_and_get_report(filename: str, file_content: bytes, client: MobSFClient = None):
+    client = client or default_client
 
     # Upload APK to MobSF
-    upload_response = requests.post(f"{MOBSF_URL}/api/v1/upload", files=files, headers=headers)
+    upload_response = await client.upload(filename, file_content)
     if upload_response.status_code != 200:
         return {"file_name": filename, "error": "Failed to upload to MobSF"}
 
@@ -22,7 +227,7 @@ def upload_apk_and_get_report(filename: str, file_content: bytes):
     md5_hash = upload_data.get("hash")
 
     # Retrieve detailed report using hash
-    report_response = requests.post(f"{MOBSF_URL}/api/v1/report_json", data={"hash": md5_hash}, headers=headers)
+    report_response = await client.report_json(md5_hash)
     if report_response.status_code != 200:
         return {"file_name": filename, "error": "Failed to retrieve report"}
 
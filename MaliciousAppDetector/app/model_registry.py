@@ -0,0 +1,144 @@
+# app/model_registry.py
+import hashlib
+import json
+import os
+import shutil
+import uuid
+from datetime import datetime
+
+import joblib
+
+from app.forest import ForestModel, compact_arrays, forest_to_arrays, save_arrays, load_arrays
+
+MODEL_REGISTRY_DIR = os.getenv(
+    "MODEL_REGISTRY_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "model", "registry"),
+)
+MODEL_REGISTRY_VERSION = os.getenv("MODEL_REGISTRY_VERSION", "")  # pin a version; default LATEST
+
+
+def _sha256_file(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class ModelRegistry:
+    """Local directory of versioned model artifacts.
+
+    Layout::
+
+        <root>/LATEST                  name of the current version
+        <root>/<version>/meta.json     feature list, training metadata, per-file sha256
+        <root>/<version>/arrays/*.npy  packed forest arrays, smallest dtypes (memory-mapped on load)
+        <root>/<version>/estimator.joblib  original (unpruned) estimator, kept for retraining
+        <root>/<version>/<extra>.json  optional reports written alongside (e.g. metrics.json)
+
+    Versions are written to a temp directory and renamed into place, and
+    LATEST is swapped with os.replace, so readers never see a partial artifact.
+    """
+
+    def __init__(self, root=MODEL_REGISTRY_DIR):
+        self.root = root
+
+    def versions(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(d for d in os.listdir(self.root)
+                      if os.path.isfile(os.path.join(self.root, d, "meta.json")))
+
+    def latest(self):
+        try:
+            with open(os.path.join(self.root, "LATEST")) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def publish(self, estimator, feature_names, version=None, metadata=None, make_latest=True, extra_files=None,
+                arrays=None):
+        """Write a new version; `extra_files` maps file names to JSON-serialisable documents.
+
+        `arrays` replaces the packed export of `estimator` (e.g. a pruned forest).
+        """
+        version = version or f"{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+        final_dir = os.path.join(self.root, version)
+        if os.path.exists(final_dir):
+            raise FileExistsError(f"Model version {version} already exists in {self.root}")
+        tmp_dir = os.path.join(self.root, f".tmp-{version}")
+        os.makedirs(tmp_dir)
+        try:
+            arrays = arrays if arrays is not None else compact_arrays(forest_to_arrays(estimator))
+            save_arrays(arrays, os.path.join(tmp_dir, "arrays"))
+            joblib.dump(estimator, os.path.join(tmp_dir, "estimator.joblib"))
+            for name, doc in (extra_files or {}).items():
+                with open(os.path.join(tmp_dir, name), "w") as f:
+                    json.dump(doc, f, indent=2)
+            files = {}
+            for dirpath, _, filenames in os.walk(tmp_dir):
+                for name in filenames:
+                    path = os.path.join(dirpath, name)
+                    files[os.path.relpath(path, tmp_dir).replace(os.sep, "/")] = _sha256_file(path)
+            meta = {
+                "version": version,
+                "feature_names": list(feature_names),
+                "classes": [int(c) for c in estimator.classes_],
+                "trained_at": datetime.utcnow().isoformat(),
+                "metadata": metadata or {},
+                "files": files,
+            }
+            with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+                json.dump(meta, f, indent=2)
+            os.rename(tmp_dir, final_dir)
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        if make_latest:
+            self.set_latest(version)
+        print(f"✓ Published model {version} to {self.root}")
+        return version
+
+    def set_latest(self, version):
+        tmp = os.path.join(self.root, f".LATEST-{uuid.uuid4().hex}")
+        with open(tmp, "w") as f:
+            f.write(version)
+        os.replace(tmp, os.path.join(self.root, "LATEST"))
+
+    def load_meta(self, version):
+        with open(os.path.join(self.root, version, "meta.json")) as f:
+            return json.load(f)
+
+    def verify(self, version):
+        meta = self.load_meta(version)
+        for rel, expected in meta["files"].items():
+            actual = _sha256_file(os.path.join(self.root, version, rel))
+            if actual != expected:
+                raise ValueError(f"Checksum mismatch for {version}/{rel}")
+        return meta
+
+    def load(self, version=None, mmap=True, verify=True):
+        """Load a version (default: pinned MODEL_REGISTRY_VERSION, else LATEST) as a model artifact dict.
+
+        The forest arrays are memory-mapped read-only, so every worker process
+        shares the same physical pages through the OS page cache.
+        """
+        version = version or MODEL_REGISTRY_VERSION or self.latest()
+        if not version:
+            raise FileNotFoundError(
+                f"No model published in registry {self.root}. "
+                "Build one with `python -m app.ml_model` or set MODEL_REGISTRY_DIR."
+            )
+        meta = self.verify(version) if verify else self.load_meta(version)
+        arrays = load_arrays(os.path.join(self.root, version, "arrays"), mmap=mmap)
+        return {
+            "model": ForestModel(arrays, meta["classes"]),
+            "feature_names": meta["feature_names"],
+            "version": meta["version"],
+            "trained_at": meta["trained_at"],
+            "metadata": meta["metadata"],
+        }
+
+    def load_estimator(self, version=None):
+        version = version or self.latest()
+        return joblib.load(os.path.join(self.root, version, "estimator.joblib"))
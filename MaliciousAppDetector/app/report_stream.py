@@ -0,0 +1,159 @@
+# app/report_stream.py
+import json
+import mmap
+import re
+
+from app.ml_model import extract_features
+
+# Sections extract_features reads. True = decode the whole value, dict = descend into that object.
+_STATIC_SECTIONS = {
+    "manifest_analysis": True,
+    "certificate_analysis": True,
+    "binary_analysis": True,
+    "permissions": True,
+    "code_analysis": True,
+}
+FEATURE_SECTIONS = {
+    "static_analysis": {"full_report": _STATIC_SECTIONS},
+    "full_report": _STATIC_SECTIONS,
+    "dynamic_analysis": True,
+    **_STATIC_SECTIONS,  # bare MobSF report_json output
+}
+
+_WS = re.compile(rb"\s*")
+_INDENT = re.compile(rb"[ \t]*")
+_STRING = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"')
+_SCALAR = re.compile(rb"[^,}\]\s]+")
+# Everything up to the next structural bracket, consuming whole strings (which may contain brackets).
+# Possessive quantifiers (Python 3.11+) skip the backtracking bookkeeping and run ~2x faster.
+try:
+    _NON_BRACKET = re.compile(rb'[^"\[\]{}]*+(?:"[^"\\]*+(?:\\.[^"\\]*+)*+"[^"\[\]{}]*+)*+')
+except re.error:
+    _NON_BRACKET = re.compile(rb'[^"\[\]{}]*(?:"[^"\\]*(?:\\.[^"\\]*)*"[^"\[\]{}]*)*')
+
+
+class ReportParseError(ValueError):
+    pass
+
+
+def _ws(buf, pos):
+    return _WS.match(buf, pos).end()
+
+
+def _skip_pretty_container(buf, pos):
+    """Fast path for indented JSON (as written by json.dumps(indent=...)).
+
+    Literal newlines only appear as layout there, and a container opened on a
+    line indented by `lead` closes on a line that is `lead` followed directly
+    by the bracket; nested lines are indented further. One find() jumps there.
+    """
+    close = b"}" if buf[pos:pos + 1] == b"{" else b"]"
+    line_start = buf.rfind(b"\n", 0, pos) + 1
+    lead = buf[line_start:_INDENT.match(buf, line_start).end()]
+    end = buf.find(b"\n" + lead + close, pos)
+    if end < 0:
+        return None
+    return end + 1 + len(lead) + 1
+
+
+def _skip_value(buf, pos):
+    """Return the offset just past the JSON value starting at `pos`, without decoding it."""
+    ch = buf[pos:pos + 1]
+    if ch == b'"':
+        m = _STRING.match(buf, pos)
+        if not m:
+            raise ReportParseError(f"Unterminated string at {pos}")
+        return m.end()
+    if ch not in (b"{", b"["):
+        m = _SCALAR.match(buf, pos)
+        if not m:
+            raise ReportParseError(f"Expected a value at {pos}")
+        return m.end()
+    if buf[pos + 1:pos + 2] == b"\n":
+        end = _skip_pretty_container(buf, pos)
+        if end is not None:
+            return end
+    depth = 0
+    n = len(buf)
+    while pos < n:
+        pos = _NON_BRACKET.match(buf, pos).end()
+        if pos >= n:
+            break
+        if buf[pos] in b"{[":
+            depth += 1
+        else:
+            depth -= 1
+        pos += 1
+        if depth == 0:
+            return pos
+    raise ReportParseError("Unexpected end of document while skipping a value")
+
+
+def _read_object(buf, pos, spec):
+    """Walk the object at `pos`, decoding only keys named in `spec`. Returns (dict, end offset)."""
+    if buf[pos:pos + 1] != b"{":
+        # Not an object: decode it as-is so callers see the same type json.load would give
+        end = _skip_value(buf, pos)
+        return json.loads(bytes(buf[pos:end])), end
+    out = {}
+    pos = _ws(buf, pos + 1)
+    if buf[pos:pos + 1] == b"}":
+        return out, pos + 1
+    while True:
+        m = _STRING.match(buf, pos)
+        if not m:
+            raise ReportParseError(f"Expected an object key at {pos}")
+        key = json.loads(m.group())
+        pos = _ws(buf, m.end())
+        if buf[pos:pos + 1] != b":":
+            raise ReportParseError(f"Expected ':' at {pos}")
+        pos = _ws(buf, pos + 1)
+
+        wanted = spec.get(key)
+        if isinstance(wanted, dict):
+            out[key], pos = _read_object(buf, pos, wanted)
+        else:
+            end = _skip_value(buf, pos)
+            if wanted:
+                out[key] = json.loads(bytes(buf[pos:end]))
+            pos = end
+
+        pos = _ws(buf, pos)
+        ch = buf[pos:pos + 1]
+        if ch == b"}":
+            return out, pos + 1
+        if ch != b",":
+            raise ReportParseError(f"Expected ',' or '}}' at {pos}")
+        pos = _ws(buf, pos + 1)
+
+
+def parse_feature_sections(data, spec=FEATURE_SECTIONS):
+    """Decode only the `spec` sections of a report given as bytes (or an mmap).
+
+    Skipped sections are never turned into Python objects: in indented reports
+    they are jumped over with a single find(), otherwise scanned with regexes
+    over the raw bytes. The multi-MB `strings` block therefore costs a few
+    C-level scans rather than tens of thousands of allocations.
+    """
+    pos = _ws(data, 0)
+    report, _ = _read_object(data, pos, spec)
+    return report
+
+
+def static_report(report):
+    """The MobSF full report inside a combined report, a bare {"full_report": ...} or a report_json."""
+    try:
+        return report["static_analysis"]["full_report"] or {}
+    except (KeyError, TypeError):
+        return report.get("full_report", report) or {}
+
+
+def load_feature_sections(path, spec=FEATURE_SECTIONS):
+    """Memory-map a stored report and decode only the sections extract_features needs."""
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return parse_feature_sections(mm, spec)
+
+
+def extract_features_from_file(path):
+    return extract_features(load_feature_sections(path))
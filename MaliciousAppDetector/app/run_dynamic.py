@@ -1,6 +1,6 @@
-# app/run_dynamic.py
+# app/run_dynamic.py  (run as: python -m app.run_dynamic <apk_path>)
 
-from dynamic_analyzer import DynamicAnalyzer
+from app.dynamic_analyzer import DynamicAnalyzer
 import sys
 
 if __name__ == "__main__":
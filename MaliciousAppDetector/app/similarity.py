@@ -0,0 +1,254 @@
+# app/similarity.py
+"""Near-duplicate lookup of previously analyzed APKs (MinHash + LSH banding).
+
+Each APK is described by three token sets ("families"):
+
+- code:        SHA-256s of its DEX files and native libraries (from the APK index)
+- permissions: requested permissions (manifest at triage time, MobSF afterwards)
+- strings:     MobSF `strings_code`
+
+Every family gets its own MinHash signature, so an APK can be looked up with
+whatever families are known at that point (code + permissions right after
+triage, all three once MobSF is done) and similarity is the mean estimated
+Jaccard over the families both sides have. Code and strings signatures are
+banded into an in-memory LSH table, so a lookup only scores the few APKs
+sharing a bucket; permissions only refine the score, since identical permission
+sets are far too common to find candidates with. SQLite keeps the signatures
+and verdicts across restarts.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from app.apk_index import open_apk_index
+from app.report_stream import static_report
+
+SIMILARITY_INDEX_PATH = os.getenv(
+    "SIMILARITY_INDEX_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "similarity.db"),
+)
+MINHASH_PERMUTATIONS = int(os.getenv("MINHASH_PERMUTATIONS", "64"))  # per family
+LSH_BANDS = int(os.getenv("LSH_BANDS", "16"))  # 16 bands x 4 rows: ~50% of pairs at Jaccard 0.5 become candidates
+SIMILARITY_TOP_K = int(os.getenv("SIMILARITY_TOP_K", "5"))
+SIMILARITY_MIN = float(os.getenv("SIMILARITY_MIN", "0.5"))
+# Reuse a neighbour's dynamic analysis instead of running the emulator at or above this similarity (0 = never)
+SIMILARITY_SKIP_THRESHOLD = float(os.getenv("SIMILARITY_SKIP_THRESHOLD", "0"))
+MINHASH_SEED = 1
+
+FAMILIES = ("code", "permissions", "strings")
+_BANDED = np.array([family != "permissions" for family in FAMILIES])
+_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+_TOKEN_BLOCK = 4096  # tokens hashed per numpy pass, bounds the (tokens x permutations) temporary
+
+
+def apk_sets(apk_path, triage=None):
+    """Families known before MobSF runs: code hashes from the APK and the manifest's permissions."""
+    sets = {"code": {f"{name.rsplit('.', 1)[-1]}:{digest}"
+                     for name, digest in open_apk_index(apk_path).code_hashes().items()}}
+    if triage and triage.get("permissions"):
+        sets["permissions"] = set(triage["permissions"])
+    return sets
+
+
+def report_sets(report):
+    """Families from a combined (or bare MobSF) report."""
+    rep = static_report(report)
+    sets = {"permissions": set(rep.get("permissions") or {})}
+    strings = rep.get("strings") or {}
+    sets["strings"] = set(strings.get("strings_code") or []) if isinstance(strings, dict) else set()
+    return sets
+
+
+class SimilarityIndex:
+    """MinHash/LSH index of analyzed APKs keyed by SHA-256, with their verdicts."""
+
+    def __init__(self, path=SIMILARITY_INDEX_PATH, permutations=MINHASH_PERMUTATIONS, bands=LSH_BANDS,
+                 seed=MINHASH_SEED):
+        if permutations % bands:
+            raise ValueError(f"{permutations} permutations cannot be split into {bands} equal bands")
+        self.permutations = permutations
+        self.bands = bands
+        self.rows = permutations // bands
+        rng = np.random.RandomState(seed)
+        # a < 2**32 keeps a * hash (hash < 2**32) inside uint64 without wrapping
+        self._a = rng.randint(1, 1 << 32, size=permutations, dtype=np.uint64)
+        self._b = rng.randint(0, (1 << 61) - 1, size=permutations, dtype=np.uint64)
+
+        self._lock = threading.Lock()
+        self._ids = []                 # row -> sha256
+        self._rows = {}                # sha256 -> row
+        self._meta = []                # row -> {"label", "probability", "confirmed", "filename", "created_at"}
+        self._sigs = np.empty((0, len(FAMILIES), permutations), dtype=np.uint32)
+        self._present = np.empty((0, len(FAMILIES)), dtype=bool)
+        self._buckets = {}             # band key -> [rows]
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS signatures ("
+            " sha256 TEXT PRIMARY KEY,"
+            " created_at REAL NOT NULL,"
+            " filename TEXT,"
+            " label TEXT,"
+            " probability REAL,"
+            " confirmed INTEGER NOT NULL DEFAULT 0,"
+            " present INTEGER NOT NULL,"
+            " signature BLOB NOT NULL)"
+        )
+        self._check_settings(seed)
+        self._load()
+
+    # --- persistence ---
+    def _check_settings(self, seed):
+        settings = json.dumps({"permutations": self.permutations, "seed": seed, "families": FAMILIES})
+        row = self._db.execute("SELECT value FROM settings WHERE key = 'minhash'").fetchone()
+        if row is not None and row[0] != settings:
+            # Signatures from other hash functions are not comparable; they are rebuilt as APKs are rescanned
+            print(f"⚠️ MinHash settings changed ({row[0]} -> {settings}), clearing the similarity index")
+            self._db.execute("DELETE FROM signatures")
+        self._db.execute("INSERT OR REPLACE INTO settings (key, value) VALUES ('minhash', ?)", (settings,))
+        self._db.commit()
+
+    def _load(self):
+        rows = self._db.execute(
+            "SELECT sha256, created_at, filename, label, probability, confirmed, present, signature FROM signatures"
+        ).fetchall()
+        if not rows:
+            return
+        shape = (len(FAMILIES), self.permutations)
+        self._sigs = np.stack([np.frombuffer(r[7], dtype=np.uint32).reshape(shape) for r in rows])
+        self._present = np.array([[bool(r[6] >> f & 1) for f in range(len(FAMILIES))] for r in rows])
+        for row, (sha256, created_at, filename, label, probability, confirmed, _, _) in enumerate(rows):
+            self._ids.append(sha256)
+            self._rows[sha256] = row
+            self._meta.append({"label": label, "probability": probability, "confirmed": bool(confirmed),
+                               "filename": filename, "created_at": created_at})
+            for key in self._band_keys(self._sigs[row], self._present[row]):
+                self._buckets.setdefault(key, []).append(row)
+        print(f"✓ Similarity index loaded: {len(rows)} APKs, {len(self._buckets)} LSH buckets")
+
+    # --- MinHash ---
+    def signature(self, sets):
+        """Return (uint32 [families x permutations] signature, bool [families] presence) for token sets."""
+        sig = np.full((len(FAMILIES), self.permutations), 0xFFFFFFFF, dtype=np.uint32)
+        present = np.zeros(len(FAMILIES), dtype=bool)
+        for f, family in enumerate(FAMILIES):
+            tokens = sets.get(family)
+            if not tokens:
+                continue
+            hashes = np.fromiter((zlib.crc32(t.encode("utf-8", "replace")) for t in tokens),
+                                 dtype=np.uint64, count=len(tokens))
+            mins = np.full(self.permutations, _MAX_HASH, dtype=np.uint64)
+            for start in range(0, len(hashes), _TOKEN_BLOCK):
+                block = hashes[start:start + _TOKEN_BLOCK, None]
+                permuted = ((block * self._a + self._b) % _PRIME) & _MAX_HASH
+                np.minimum(mins, permuted.min(axis=0), out=mins)
+            sig[f] = mins.astype(np.uint32)
+            present[f] = True
+        return sig, present
+
+    def _band_keys(self, sig, present):
+        for f in np.flatnonzero(present & _BANDED):
+            for band in range(self.bands):
+                yield bytes((f, band)) + sig[f, band * self.rows:(band + 1) * self.rows].tobytes()
+
+    # --- lookup ---
+    def query(self, sets, top_k=SIMILARITY_TOP_K, min_similarity=SIMILARITY_MIN, exclude=None):
+        """Nearest indexed APKs to `sets`: [{"sha256", "similarity", "families", "label", ...}], best first."""
+        sig, present = sets if isinstance(sets, tuple) else self.signature(sets)
+        with self._lock:
+            candidates = set()
+            for key in self._band_keys(sig, present):
+                candidates.update(self._buckets.get(key, ()))
+            if exclude is not None and exclude in self._rows:
+                candidates.discard(self._rows[exclude])
+            if not candidates:
+                return []
+            rows = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+            per_family = (self._sigs[rows] == sig).mean(axis=2)        # estimated Jaccard, [candidates x families]
+            shared = self._present[rows] & present
+            counts = shared.sum(axis=1)
+            scores = np.where(counts > 0, (per_family * shared).sum(axis=1) / np.maximum(counts, 1), 0.0)
+            order = np.argsort(-scores, kind="stable")[:top_k]
+            results = []
+            for i in order:
+                if scores[i] < min_similarity:
+                    break
+                row = int(rows[i])
+                results.append({
+                    "sha256": self._ids[row],
+                    "similarity": round(float(scores[i]), 3),
+                    "families": {FAMILIES[f]: round(float(per_family[i, f]), 3) for f in np.flatnonzero(shared[i])},
+                    **self._meta[row],
+                })
+            return results
+
+    def _grow(self, capacity):
+        # Rows past len(self._ids) are spare capacity; lookups only ever index rows from the buckets
+        sigs = np.empty((capacity,) + self._sigs.shape[1:], dtype=np.uint32)
+        present = np.zeros((capacity, len(FAMILIES)), dtype=bool)
+        sigs[:len(self._sigs)] = self._sigs
+        present[:len(self._present)] = self._present
+        self._sigs, self._present = sigs, present
+
+    def __len__(self):
+        return len(self._ids)
+
+    # --- updates ---
+    def add(self, sha256, sets, label=None, probability=None, filename=None):
+        """Index (or re-index) one APK with its verdict. Families with no tokens are left out of matching."""
+        sig, present = sets if isinstance(sets, tuple) else self.signature(sets)
+        meta = {"label": label, "probability": probability, "confirmed": False,
+                "filename": filename, "created_at": time.time()}
+        mask = sum(1 << f for f in np.flatnonzero(present))
+        with self._lock:
+            row = self._rows.get(sha256)
+            if row is None:
+                row = len(self._ids)
+                if row == len(self._sigs):
+                    self._grow(max(64, 2 * row))
+                self._ids.append(sha256)
+                self._rows[sha256] = row
+                self._meta.append(meta)
+            else:
+                for key in self._band_keys(self._sigs[row], self._present[row]):
+                    self._buckets[key].remove(row)
+                meta["confirmed"] = self._meta[row]["confirmed"]
+                if meta["confirmed"]:  # an analyst's label outranks a new model verdict
+                    meta["label"] = self._meta[row]["label"]
+                self._meta[row] = meta
+            self._sigs[row] = sig
+            self._present[row] = present
+            for key in self._band_keys(sig, present):
+                self._buckets.setdefault(key, []).append(row)
+            self._db.execute(
+                "INSERT OR REPLACE INTO signatures"
+                " (sha256, created_at, filename, label, probability, confirmed, present, signature)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (sha256, meta["created_at"], filename, meta["label"], probability, int(meta["confirmed"]),
+                 int(mask), sig.tobytes()),
+            )
+            self._db.commit()
+
+    def set_label(self, sha256, label):
+        """Record an analyst-confirmed label ("malicious"/"benign"); returns False if the APK is not indexed."""
+        with self._lock:
+            row = self._rows.get(sha256)
+            if row is None:
+                return False
+            self._meta[row].update(label=label, confirmed=True)
+            self._db.execute("UPDATE signatures SET label = ?, confirmed = 1 WHERE sha256 = ?", (label, sha256))
+            self._db.commit()
+            return True
+
+    def close(self):
+        with self._lock:
+            self._db.close()
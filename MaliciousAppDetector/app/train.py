@@ -0,0 +1,289 @@
+# app/train.py
+"""Offline training CLI.
+
+    python -m app.train --reports model/reports --labels labels.csv
+    python -m app.train --feature-store data/feature_store --estimator extra_trees --n-estimators 500
+
+Report features are extracted in a process pool (one report per task, only the
+sections extract_features needs are decoded), the forest is fitted with every
+core, and the result is published to the model registry together with a
+metrics.json evaluation report.
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+from sklearn.metrics import accuracy_score, classification_report, confusion_matrix, roc_auc_score
+from sklearn.model_selection import train_test_split
+
+from app.ml_model import FEATURE_NAMES, FEATURE_EXTRACTOR_VERSION, features_matrix, heuristic_label, synthetic_rows
+from app.model_registry import ModelRegistry
+from app.report_stream import extract_features_from_file
+
+TRAIN_WORKERS = int(os.getenv("TRAIN_WORKERS", "0"))  # 0 = one per CPU
+
+ESTIMATORS = {
+    "random_forest": RandomForestClassifier,
+    "extra_trees": ExtraTreesClassifier,
+}
+
+
+# --- DATA ---
+def find_reports(paths):
+    """Expand files and directories (searched recursively) into a sorted list of report paths."""
+    found = set()
+    for p in paths:
+        if os.path.isdir(p):
+            found.update(glob.glob(os.path.join(p, "**", "*.json"), recursive=True))
+        else:
+            found.add(p)
+    return sorted(found)
+
+
+def _report_id(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def _extract(path):
+    try:
+        return path, extract_features_from_file(path), None
+    except Exception as e:  # a malformed report must not abort the whole run
+        return path, None, f"{type(e).__name__}: {e}"
+
+
+def extract_reports(paths, workers=TRAIN_WORKERS):
+    """Extract feature rows from report files in parallel. Returns (ids, rows, errors)."""
+    workers = workers or os.cpu_count() or 1
+    workers = min(workers, len(paths)) or 1
+    if workers == 1:
+        results = map(_extract, paths)
+    else:
+        # A few chunks per worker keeps the pipe traffic low while still balancing uneven report sizes
+        chunksize = max(1, len(paths) // (workers * 4))
+        pool = ProcessPoolExecutor(max_workers=workers)
+        results = pool.map(_extract, paths, chunksize=chunksize)
+    ids, rows, errors = [], [], {}
+    try:
+        for path, features, error in results:
+            if error:
+                errors[path] = error
+                continue
+            ids.append(_report_id(path))
+            rows.append(features)
+    finally:
+        if workers > 1:
+            pool.shutdown()
+    return ids, rows, errors
+
+
+def load_labels(path):
+    """Read a CSV with `id,label` columns; ids are report file names (without .json) or SHA-256s."""
+    with open(path, newline="") as f:
+        reader = csv.DictReader(f)
+        if not reader.fieldnames or "id" not in reader.fieldnames or "label" not in reader.fieldnames:
+            raise ValueError(f"{path} must have 'id' and 'label' columns")
+        return {row["id"].strip(): int(row["label"]) for row in reader if row["label"].strip()}
+
+
+def load_feature_store(root):
+    """Read every stored row. Returns (ids, rows, labels); unlabeled rows have label None."""
+    from app.feature_store import FeatureStore, UNLABELED
+
+    data = FeatureStore(root).load()
+    stale = data["extractor_version"] != FEATURE_EXTRACTOR_VERSION
+    if stale.any():
+        print(f"⚠️ Skipping {int(stale.sum())} rows from an older feature extractor")
+    ids, rows, labels = [], [], []
+    for sha, x, label in zip(data["sha256"][~stale], data["X"][~stale], data["label"][~stale]):
+        ids.append(sha)
+        rows.append(dict(zip(FEATURE_NAMES, x.tolist())))
+        labels.append(None if label == UNLABELED else int(label))
+    return ids, rows, labels
+
+
+def assign_labels(ids, rows, labels, known, fallback="heuristic"):
+    """Resolve each row's label from `known` (the --labels file), then `labels`, then the fallback rule.
+
+    Returns (kept rows, y, counts per label source).
+    """
+    kept, y = [], []
+    sources = {"given": 0, "heuristic": 0, "dropped": 0}
+    for rid, row, label in zip(ids, rows, labels):
+        label = known.get(rid, label)
+        if label is not None:
+            sources["given"] += 1
+        elif fallback == "heuristic":
+            label = heuristic_label(row)
+            sources["heuristic"] += 1
+        else:
+            sources["dropped"] += 1
+            continue
+        kept.append(row)
+        y.append(int(label))
+    return kept, y, sources
+
+
+# --- TRAINING ---
+def build_estimator(name, n_estimators, max_depth=None, min_samples_leaf=1, n_jobs=-1, random_state=None):
+    return ESTIMATORS[name](
+        n_estimators=n_estimators,
+        max_depth=max_depth,
+        min_samples_leaf=min_samples_leaf,
+        n_jobs=n_jobs,
+        random_state=random_state,
+    )
+
+
+def evaluate(model, X, y):
+    if not len(y):
+        return {}
+    pred = model.predict(X)
+    metrics = {
+        "samples": int(len(y)),
+        "accuracy": float(accuracy_score(y, pred)),
+        "confusion_matrix": confusion_matrix(y, pred, labels=[0, 1]).tolist(),
+        "report": classification_report(y, pred, labels=[0, 1], target_names=["benign", "malicious"],
+                                        output_dict=True, zero_division=0),
+    }
+    if len(set(y)) == 2 and 1 in model.classes_:
+        proba = model.predict_proba(X)[:, list(model.classes_).index(1)]
+        metrics["roc_auc"] = float(roc_auc_score(y, proba))
+    return metrics
+
+
+def split(X, y, test_size, random_state):
+    if test_size <= 0 or len(y) < 4:
+        return X, X[:0], y, y[:0]
+    # Stratify whenever both classes can appear on both sides
+    stratify = y if np.bincount(y, minlength=2).min() >= 2 else None
+    return train_test_split(X, y, test_size=test_size, random_state=random_state, stratify=stratify)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_argument_group("data")
+    source.add_argument("--reports", nargs="*", default=[], help="report files or directories")
+    source.add_argument("--feature-store", default=None, help="feature store directory")
+    source.add_argument("--labels", default=None, help="CSV of id,label overriding stored labels")
+    source.add_argument("--unlabeled", choices=["heuristic", "drop"], default="heuristic",
+                        help="what to do with rows that have no label (default: heuristic rule)")
+    source.add_argument("--synthetic", type=int, default=0,
+                        help="add this many synthetic training rows (bootstrapping a tiny corpus)")
+    model = parser.add_argument_group("model")
+    model.add_argument("--estimator", choices=sorted(ESTIMATORS), default="random_forest")
+    model.add_argument("--n-estimators", type=int, default=120)
+    model.add_argument("--max-depth", type=int, default=None)
+    model.add_argument("--min-samples-leaf", type=int, default=1)
+    model.add_argument("--test-size", type=float, default=0.3)
+    model.add_argument("--seed", type=int, default=42)
+    run = parser.add_argument_group("execution")
+    run.add_argument("--workers", type=int, default=TRAIN_WORKERS,
+                     help="feature extraction processes (default: one per CPU)")
+    run.add_argument("--n-jobs", type=int, default=-1, help="training threads (default: all cores)")
+    run.add_argument("--registry", default=None, help="registry directory (default: MODEL_REGISTRY_DIR)")
+    run.add_argument("--version", default=None, help="version name (default: timestamp)")
+    run.add_argument("--no-latest", action="store_true", help="publish without switching LATEST")
+    run.add_argument("--metrics", default=None, help="also write the metrics report here")
+    args = parser.parse_args(argv)
+
+    if not args.reports and not args.feature_store and not args.synthetic:
+        parser.error("give --reports, --feature-store and/or --synthetic")
+    known = load_labels(args.labels) if args.labels else {}
+
+    ids, rows, labels = [], [], []
+    n_report_rows = n_store_rows = 0
+    t0 = time.perf_counter()
+    errors = {}
+    if args.reports:
+        paths = find_reports(args.reports)
+        r_ids, r_rows, errors = extract_reports(paths, args.workers)
+        ids += r_ids
+        rows += r_rows
+        labels += [None] * len(r_rows)
+        n_report_rows = len(r_rows)
+        print(f"✓ Extracted {len(r_rows)}/{len(paths)} reports in {time.perf_counter() - t0:.2f}s")
+        for path, error in errors.items():
+            print(f"⚠️ {path}: {error}")
+    if args.feature_store:
+        s_ids, s_rows, s_labels = load_feature_store(args.feature_store)
+        ids += s_ids
+        rows += s_rows
+        labels += s_labels
+        n_store_rows = len(s_rows)
+        print(f"✓ Loaded {len(s_rows)} rows from {args.feature_store}")
+    extract_seconds = time.perf_counter() - t0
+
+    rows, y, label_sources = assign_labels(ids, rows, labels, known, args.unlabeled)
+    X = features_matrix(rows)
+    y = np.asarray(y, dtype=np.int64)
+    X_train, X_test, y_train, y_test = split(X, y, args.test_size, args.seed)
+    if args.synthetic:
+        # Synthetic rows only ever go into the training split so the metrics stay about real data
+        synth = synthetic_rows(rows[0] if rows else None, args.synthetic, args.seed)
+        X_train = np.vstack([X_train, features_matrix(synth)])
+        y_train = np.concatenate([y_train, [r["label"] for r in synth]]).astype(np.int64)
+    if len(set(y_train.tolist())) < 2:
+        parser.error("training data contains a single class; add labels or --synthetic rows")
+
+    estimator = build_estimator(args.estimator, args.n_estimators, args.max_depth,
+                                args.min_samples_leaf, args.n_jobs, args.seed)
+    t0 = time.perf_counter()
+    estimator.fit(X_train, y_train)
+    train_seconds = time.perf_counter() - t0
+    print(f"✓ Trained {args.estimator} ({args.n_estimators} trees) on {len(y_train)} rows in {train_seconds:.2f}s")
+
+    metrics = {
+        "estimator": args.estimator,
+        "params": {k: v for k, v in estimator.get_params().items() if k in (
+            "n_estimators", "max_depth", "min_samples_leaf", "random_state")},
+        "data": {
+            "report_rows": n_report_rows,
+            "store_rows": n_store_rows,
+            "rows": len(rows),
+            "train_rows": int(len(y_train)),
+            "test_rows": int(len(y_test)),
+            "synthetic_rows": args.synthetic,
+            "label_sources": label_sources,
+            "class_balance": np.bincount(y, minlength=2).tolist() if len(y) else [0, 0],
+            "extract_errors": len(errors),
+        },
+        "timings": {
+            "extract_seconds": round(extract_seconds, 3),
+            "train_seconds": round(train_seconds, 3),
+            "workers": args.workers or os.cpu_count(),
+            "n_jobs": args.n_jobs,
+        },
+        "train": evaluate(estimator, X_train, y_train),
+        "test": evaluate(estimator, X_test, y_test),
+        "feature_importances": dict(zip(FEATURE_NAMES, estimator.feature_importances_.round(6).tolist())),
+    }
+    if metrics["test"]:
+        print(f"✓ Held-out accuracy {metrics['test']['accuracy']:.3f} on {metrics['test']['samples']} rows")
+    else:
+        print("⚠️ No held-out rows; metrics.json only has training-set figures")
+
+    registry = ModelRegistry(args.registry) if args.registry else ModelRegistry()
+    metadata = {
+        "source": "reports" if args.reports else "feature_store" if args.feature_store else "synthetic",
+        "estimator": type(estimator).__name__,
+        "samples": int(len(y_train)),
+        "seed": args.seed,
+        "test_accuracy": metrics["test"].get("accuracy"),
+    }
+    metrics["version"] = registry.publish(estimator, FEATURE_NAMES, version=args.version, metadata=metadata,
+                                          make_latest=not args.no_latest, extra_files={"metrics.json": metrics})
+    if args.metrics:
+        with open(args.metrics, "w") as f:
+            json.dump(metrics, f, indent=2)
+        print(f"✓ Metrics written to {args.metrics}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,72 @@
+# app/triage.py
+"""Instant provisional verdict from the APK itself, before MobSF has run.
+
+The manifest and signer certificates give the strongest model inputs
+(debuggable flag, debug certificate, dangerous permissions, allowBackup) in a
+few milliseconds. Every other feature is left at 0 until the full pipeline
+fills it in, so the score is explicitly provisional.
+"""
+import time
+
+from app.apk_index import open_apk_index
+from app.apk_manifest import read_manifest
+from app.apk_signing import read_signing_info
+from app.ml_model import FEATURE_NAMES, classify_batch, heuristic_label
+
+# Features triage can observe directly; the rest need MobSF or the emulator
+TRIAGE_FEATURES = ["is_debuggable", "allow_backup", "is_signed_with_debug_cert", "num_dangerous_permissions"]
+
+
+def triage_features(manifest, signing):
+    row = dict.fromkeys(FEATURE_NAMES, 0)
+    row["is_debuggable"] = int(manifest["debuggable"])
+    row["allow_backup"] = int(manifest["allow_backup"] is True)  # MobSF only flags an explicit allowBackup=true
+    row["is_signed_with_debug_cert"] = int(any(c["is_debug"] for c in signing["certificates"]))
+    row["num_dangerous_permissions"] = len(manifest["dangerous_permissions"])
+    return row
+
+
+def triage_apk(apk_path, model=None, reputation=None):
+    """Parse manifest + signing block and score them. Never raises; failures land in "error".
+
+    With a `reputation` index (app.cert_reputation), the history of each known
+    signer certificate is attached as "signer_reputation".
+    """
+    started = time.perf_counter()
+    result = {"status": "success", "provisional": True}
+    try:
+        manifest = read_manifest(apk_path)
+        signing = read_signing_info(apk_path)
+        apk = open_apk_index(apk_path).summary()
+    except Exception as e:  # malformed or deliberately corrupted APKs must not break the pipeline
+        return {**result, "status": "failed", "error": str(e),
+                "elapsed_ms": round((time.perf_counter() - started) * 1e3, 2)}
+
+    features = triage_features(manifest, signing)
+    if reputation is not None:
+        try:
+            known = reputation.lookup(c["sha256"] for c in signing["certificates"])
+            result["signer_reputation"] = [stats for stats in known.values() if stats is not None]
+        except Exception as e:
+            print(f"✗ Signer reputation lookup failed: {e}")
+    result.update({
+        "package": manifest["package"],
+        "permissions": manifest["permissions"],
+        "dangerous_permissions": manifest["dangerous_permissions"],
+        "signature_schemes": signing["schemes"],
+        "certificates": signing["certificates"],
+        "apk": apk,
+        "features": {k: features[k] for k in TRIAGE_FEATURES},
+        "heuristic_label": heuristic_label(features),
+    })
+    if model is not None:
+        verdict = classify_batch(model, feature_rows=[features])[0]
+        result.update({
+            "label": verdict["label"],
+            "probability": verdict["probability"],
+            "model_version": verdict["model_version"],
+        })
+    else:
+        result["label"] = "malicious" if result["heuristic_label"] else "benign"
+    result["elapsed_ms"] = round((time.perf_counter() - started) * 1e3, 2)
+    return result
@@ -0,0 +1,46 @@
+# app/uploads.py
+import hashlib
+import os
+import tempfile
+from collections import namedtuple
+
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+MAX_UPLOAD_SIZE = int(os.getenv("MAX_UPLOAD_SIZE", str(300 * 1024 * 1024)))
+
+SavedUpload = namedtuple("SavedUpload", ["path", "sha256", "md5", "size"])
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+async def save_upload(file, max_size=MAX_UPLOAD_SIZE, chunk_size=UPLOAD_CHUNK_SIZE, suffix=".apk"):
+    """Stream an UploadFile to a temp file in fixed-size chunks.
+
+    SHA-256 and MD5 are computed on the fly, so peak memory is one chunk no
+    matter how large the APK is. Raises UploadTooLarge (and removes the partial
+    file) once more than `max_size` bytes have been received.
+    """
+    sha256 = hashlib.sha256()
+    md5 = hashlib.md5()
+    size = 0
+    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
+    try:
+        with tmp:
+            while True:
+                chunk = await file.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_size and size > max_size:
+                    raise UploadTooLarge(f"Upload exceeds {max_size} bytes")
+                sha256.update(chunk)
+                md5.update(chunk)
+                tmp.write(chunk)
+    except BaseException:
+        try:
+            os.remove(tmp.name)
+        except OSError:
+            pass
+        raise
+    return SavedUpload(tmp.name, sha256.hexdigest(), md5.hexdigest(), size)
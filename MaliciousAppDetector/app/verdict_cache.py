@@ -0,0 +1,125 @@
+# app/verdict_cache.py
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+VERDICT_CACHE_PATH = os.getenv(
+    "VERDICT_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "verdict_cache.db"),
+)
+VERDICT_CACHE_TTL = int(os.getenv("VERDICT_CACHE_TTL", str(7 * 24 * 3600)))
+VERDICT_CACHE_SIZE = int(os.getenv("VERDICT_CACHE_SIZE", "1024"))
+VERDICT_CACHE_PURGE_INTERVAL = int(os.getenv("VERDICT_CACHE_PURGE_INTERVAL", "3600"))
+
+
+class VerdictCache:
+    """Two-tier cache of prior scan verdicts keyed by APK SHA-256.
+
+    The in-memory tier is an LRU of the small per-APK entries (summary response
+    and `ml_result`); the SQLite tier additionally keeps the full combined report
+    and survives restarts. Entries older than `ttl` seconds, or produced by a
+    different model version than the one asked for, are treated as misses.
+    """
+
+    def __init__(self, path=VERDICT_CACHE_PATH, ttl=VERDICT_CACHE_TTL, max_entries=VERDICT_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS verdicts ("
+            " sha256 TEXT PRIMARY KEY,"
+            " created_at REAL NOT NULL,"
+            " response TEXT NOT NULL,"
+            " ml_result TEXT NOT NULL,"
+            " report TEXT NOT NULL,"
+            " model_version TEXT)"
+        )
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(verdicts)")}
+        if "model_version" not in columns:  # caches created before verdicts were tied to a model
+            self._db.execute("ALTER TABLE verdicts ADD COLUMN model_version TEXT")
+        self._db.commit()
+
+    def _expired(self, created_at):
+        return self.ttl > 0 and time.time() - created_at > self.ttl
+
+    def _stale(self, entry, model_version):
+        return self._expired(entry["created_at"]) or (
+            model_version is not None and entry["model_version"] != model_version)
+
+    def _remember(self, sha256, entry):
+        self._memory[sha256] = entry
+        self._memory.move_to_end(sha256)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, sha256, model_version=None):
+        """Return {"response", "ml_result", "created_at", "model_version"} for a fresh entry, else None.
+
+        With `model_version`, entries scored by any other model version are misses.
+        """
+        with self._lock:
+            entry = self._memory.get(sha256)
+            if entry is not None:
+                if self._stale(entry, model_version):
+                    del self._memory[sha256]
+                    return None
+                self._memory.move_to_end(sha256)
+                return entry
+
+            row = self._db.execute(
+                "SELECT created_at, response, ml_result, model_version FROM verdicts WHERE sha256 = ?", (sha256,)
+            ).fetchone()
+            if row is None:
+                return None
+            entry = {"created_at": row[0], "response": json.loads(row[1]), "ml_result": json.loads(row[2]),
+                     "model_version": row[3]}
+            if self._stale(entry, model_version):
+                return None
+            self._remember(sha256, entry)
+            return entry
+
+    def get_report(self, sha256):
+        """Load the full combined report stored for `sha256` (disk tier only)."""
+        with self._lock:
+            row = self._db.execute("SELECT report FROM verdicts WHERE sha256 = ?", (sha256,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, sha256, response, ml_result, report, model_version=None):
+        entry = {"created_at": time.time(), "response": response, "ml_result": ml_result,
+                 "model_version": model_version}
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO verdicts (sha256, created_at, response, ml_result, report, model_version)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (sha256, entry["created_at"], json.dumps(response), json.dumps(ml_result), json.dumps(report),
+                 model_version),
+            )
+            self._db.commit()
+            self._remember(sha256, entry)
+
+    def delete(self, sha256):
+        """Drop the verdict for `sha256` (e.g. once an analyst has labeled it); returns whether one existed."""
+        with self._lock:
+            self._memory.pop(sha256, None)
+            cur = self._db.execute("DELETE FROM verdicts WHERE sha256 = ?", (sha256,))
+            self._db.commit()
+            return cur.rowcount > 0
+
+    def purge_expired(self):
+        if self.ttl <= 0:
+            return 0
+        with self._lock:
+            cur = self._db.execute("DELETE FROM verdicts WHERE created_at < ?", (time.time() - self.ttl,))
+            self._db.commit()
+            return cur.rowcount
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,269 @@
+"""Synthetic APKs for exercising the in-process APK parsers without the Android SDK.
+
+    python -m benchmarks.apk_fixtures out_dir
+
+Everything is built byte by byte and deterministically: a binary (AXML)
+manifest with a UTF-8 or UTF-16 string pool, DER certificates (signatures are
+filler; the parsers never verify them), v1 PKCS#7 blocks, an APK Signing Block
+with v2/v3 signers, and a small zip writer that can emit ZIP64 records.
+"""
+import os
+import struct
+import sys
+import zlib
+
+from app.apk_manifest import ANDROID_ATTRS, ANDROID_NS
+from app.apk_signing import APK_SIG_BLOCK_MAGIC, SIGNATURE_SCHEMES
+
+ATTR_IDS = {name: rid for rid, name in ANDROID_ATTRS.items()}
+SCHEME_IDS = {name: sid for sid, name in SIGNATURE_SCHEMES.items()}
+
+
+# --- AXML ---
+def axml(tree, utf8=True):
+    """Encode (tag, [(android_ns, name, value)], [children]) as binary XML."""
+    strings = []
+
+    def ref(s):
+        if s not in strings:
+            strings.append(s)
+        return strings.index(s)
+
+    attr_names = []
+
+    def collect(node):
+        for android, name, _ in node[1]:
+            if android and name not in attr_names:
+                attr_names.append(name)
+        for child in node[2]:
+            collect(child)
+
+    collect(tree)
+    for name in attr_names:  # resource-map entries line up with the first strings of the pool
+        ref(name)
+    ns, prefix = ref(ANDROID_NS), ref("android")
+
+    body = []
+
+    def element(node):
+        tag, attrs, children = node
+        packed = b""
+        for android, name, value in attrs:
+            if isinstance(value, bool):
+                raw, dtype, data = 0xFFFFFFFF, 0x12, 0xFFFFFFFF if value else 0
+            elif isinstance(value, int):
+                raw, dtype, data = 0xFFFFFFFF, 0x10, value
+            else:
+                raw = ref(value)
+                dtype, data = 0x03, raw
+            packed += struct.pack("<IIIHBBI", ns if android else 0xFFFFFFFF, ref(name), raw, 8, 0, dtype, data)
+        start = struct.pack("<IIHHHHHH", 0xFFFFFFFF, ref(tag), 20, 20, len(attrs), 0, 0, 0) + packed
+        body.append(struct.pack("<HHIII", 0x0102, 16, 16 + len(start), 1, 0xFFFFFFFF) + start)
+        for child in children:
+            element(child)
+        end = struct.pack("<II", 0xFFFFFFFF, ref(tag))
+        body.append(struct.pack("<HHIII", 0x0103, 16, 16 + len(end), 1, 0xFFFFFFFF) + end)
+
+    element(tree)
+    ns_pair = struct.pack("<II", prefix, ns)
+    start_ns = struct.pack("<HHIII", 0x0100, 16, 24, 1, 0xFFFFFFFF) + ns_pair
+    end_ns = struct.pack("<HHIII", 0x0101, 16, 24, 1, 0xFFFFFFFF) + ns_pair
+
+    data, offsets = b"", []
+    for s in strings:
+        offsets.append(len(data))
+        if utf8:
+            encoded = s.encode()
+            assert len(s) < 128 and len(encoded) < 128, "fixture strings use 1-byte lengths"
+            data += bytes([len(s), len(encoded)]) + encoded + b"\0"
+        else:
+            data += struct.pack("<H", len(s)) + s.encode("utf-16-le") + b"\0\0"
+    data += b"\0" * (-len(data) % 4)
+    strings_start = 28 + 4 * len(strings)
+    pool = (struct.pack("<HHIIIIII", 0x0001, 28, strings_start + len(data), len(strings), 0,
+                        0x100 if utf8 else 0, strings_start, 0)
+            + struct.pack(f"<{len(offsets)}I", *offsets) + data)
+    res_map = struct.pack("<HHI", 0x0180, 8, 8 + 4 * len(attr_names)) + b"".join(
+        struct.pack("<I", ATTR_IDS[n]) for n in attr_names)
+    doc = pool + res_map + start_ns + b"".join(body) + end_ns
+    return struct.pack("<HHI", 0x0003, 8, 8 + len(doc)) + doc
+
+
+def manifest_tree(package, debuggable=False, permissions=(), allow_backup=None, components=2):
+    app_attrs = [(True, "debuggable", debuggable)]
+    if allow_backup is not None:
+        app_attrs.append((True, "allowBackup", allow_backup))
+    children = [("activity", [(True, "name", f".Activity{i}"), (True, "exported", i == 0)], [])
+                for i in range(components)]
+    children.append(("receiver", [(True, "name", f"{package}.Receiver"), (True, "exported", True),
+                                  (True, "permission", "android.permission.BROADCAST_SMS")], []))
+    children.append(("service", [(True, "name", f"{package}.Service")], []))
+    return ("manifest", [(True, "versionCode", 42), (True, "versionName", "1.2.3"), (False, "package", package)],
+            [("uses-sdk", [(True, "minSdkVersion", 21), (True, "targetSdkVersion", 33)], [])]
+            + [("uses-permission", [(True, "name", p)], []) for p in permissions]
+            + [("application", app_attrs, children)])
+
+
+# --- DER ---
+def _tlv(tag, content):
+    n = len(content)
+    if n < 0x80:
+        length = bytes([n])
+    else:
+        raw = n.to_bytes((n.bit_length() + 7) // 8, "big")
+        length = bytes([0x80 | len(raw)]) + raw
+    return bytes([tag]) + length + content
+
+
+def _seq(*items):
+    return _tlv(0x30, b"".join(items))
+
+
+def _int(n):
+    raw = n.to_bytes(max(1, (n.bit_length() + 8) // 8), "big")  # keeps a leading 0 for the sign bit
+    return _tlv(0x02, raw)
+
+
+_OID_CN, _OID_O, _OID_C = bytes.fromhex("550403"), bytes.fromhex("55040a"), bytes.fromhex("550406")
+_SHA256_RSA = _seq(_tlv(0x06, bytes.fromhex("2a864886f70d01010b")), _tlv(0x05, b""))
+_RSA = _seq(_tlv(0x06, bytes.fromhex("2a864886f70d010101")), _tlv(0x05, b""))
+
+
+def _name(cn, org="Android", country="US"):
+    rdn = lambda oid, tag, value: _tlv(0x31, _seq(_tlv(0x06, oid), _tlv(tag, value.encode())))
+    return _seq(rdn(_OID_C, 0x13, country), rdn(_OID_O, 0x0C, org), rdn(_OID_CN, 0x0C, cn))
+
+
+def certificate(subject_cn, issuer_cn=None, serial=1, not_before="200101000000Z", not_after="450101000000Z"):
+    """DER X.509 v3 certificate; self-signed unless `issuer_cn` is given."""
+    tbs = _seq(
+        _tlv(0xA0, _int(2)),
+        _int(serial),
+        _SHA256_RSA,
+        _name(issuer_cn or subject_cn),
+        _seq(_tlv(0x17, not_before.encode()), _tlv(0x17, not_after.encode())),
+        _name(subject_cn),
+        _seq(_RSA, _tlv(0x03, b"\0" + subject_cn.encode().ljust(64, b"k"))),
+    )
+    return _seq(tbs, _SHA256_RSA, _tlv(0x03, b"\0" + b"s" * 64))
+
+
+def pkcs7(certs):
+    """ContentInfo(SignedData) carrying `certs`, as found in META-INF/*.RSA."""
+    signed_data = _seq(
+        _int(1),
+        _tlv(0x31, _seq(_tlv(0x06, bytes.fromhex("608648016503040201")))),
+        _seq(_tlv(0x06, bytes.fromhex("2a864886f70d010701"))),
+        _tlv(0xA0, b"".join(certs)),
+        _tlv(0x31, b""),
+    )
+    return _seq(_tlv(0x06, bytes.fromhex("2a864886f70d010702")), _tlv(0xA0, signed_data))
+
+
+# --- APK Signing Block ---
+def _lp(data):
+    return struct.pack("<I", len(data)) + data
+
+
+def signing_block(schemes):
+    """APK Signing Block; `schemes` maps "v2"/"v3" to a list of signers, each a certificate chain."""
+    pairs = b""
+    for scheme, signers in schemes.items():
+        encoded = []
+        for chain in signers:
+            signed_data = _lp(b"") + _lp(b"".join(_lp(c) for c in chain)) + _lp(b"")
+            encoded.append(_lp(_lp(signed_data) + _lp(b"") + _lp(b"")))
+        value = _lp(b"".join(encoded))
+        pairs += struct.pack("<QI", 4 + len(value), SCHEME_IDS[scheme]) + value
+    size = len(pairs) + 8 + 16
+    return struct.pack("<Q", size) + pairs + struct.pack("<Q", size) + APK_SIG_BLOCK_MAGIC
+
+
+# --- zip ---
+def write_zip(path, entries, before_central_directory=b"", zip64=False):
+    """Write `entries` [(name, data, deflate)] as a zip file.
+
+    With `zip64`, every size and offset is moved into ZIP64 extra fields and the
+    archive ends with ZIP64 end-of-central-directory records, as large APKs do.
+    """
+    out, central = bytearray(), bytearray()
+    for name, data, deflate in entries:
+        encoded_name = name.encode()
+        if deflate:
+            packer = zlib.compressobj(6, zlib.DEFLATED, -15)
+            stored = packer.compress(data) + packer.flush()
+        else:
+            stored = data
+        crc, offset = zlib.crc32(data), len(out)
+        method = 8 if deflate else 0
+        if zip64:
+            local_extra = struct.pack("<HHQQ", 0x0001, 16, len(data), len(stored))
+            central_extra = struct.pack("<HHQQQ", 0x0001, 24, len(data), len(stored), offset)
+            csize = usize = off = 0xFFFFFFFF
+        else:
+            local_extra = central_extra = b""
+            csize, usize, off = len(stored), len(data), offset
+        out += struct.pack("<4sHHHHHIIIHH", b"PK\x03\x04", 45 if zip64 else 20, 0x800, method, 0, 0x21,
+                           crc, csize, usize, len(encoded_name), len(local_extra)) + encoded_name + local_extra
+        out += stored
+        central += struct.pack("<4sHHHHHHIIIHHHHHII", b"PK\x01\x02", 45 if zip64 else 20, 45 if zip64 else 20,
+                               0x800, method, 0, 0x21, crc, csize, usize, len(encoded_name), len(central_extra),
+                               0, 0, 0, 0, off) + encoded_name + central_extra
+    out += before_central_directory
+    cd_offset = len(out)
+    out += central
+    count = len(entries)
+    if zip64:
+        zip64_eocd = len(out)
+        out += struct.pack("<4sQHHIIQQQQ", b"PK\x06\x06", 44, 45, 45, 0, 0, count, count, len(central), cd_offset)
+        out += struct.pack("<4sIQI", b"PK\x06\x07", 0, zip64_eocd, 1)
+        out += struct.pack("<4sHHHHIIH", b"PK\x05\x06", 0, 0, 0xFFFF, 0xFFFF, 0xFFFFFFFF, 0xFFFFFFFF, 0)
+    else:
+        out += struct.pack("<4sHHHHIIH", b"PK\x05\x06", 0, 0, count, count, len(central), cd_offset, 0)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def build_apk(path, package="com.example.app", debuggable=False, permissions=("android.permission.INTERNET",),
+              allow_backup=None, utf8=True, v1=None, v2=None, v3=None, zip64=False, dex=b"dex\n035\0" * 4096):
+    """Write an APK; `v1` is a list of DER certificates for META-INF/CERT.RSA, `v2`/`v3` lists of signer chains."""
+    entries = [
+        ("AndroidManifest.xml", axml(manifest_tree(package, debuggable, permissions, allow_backup), utf8), True),
+        ("classes.dex", dex, True),
+        ("lib/arm64-v8a/libnative.so", b"\x7fELF" + bytes(range(256)) * 16, False),
+        ("assets/payload/classes2.dex", b"dex\n035\0hidden", False),
+    ]
+    if v1:
+        entries += [("META-INF/MANIFEST.MF", b"Manifest-Version: 1.0\n", True),
+                    ("META-INF/CERT.RSA", pkcs7(v1), False)]
+    schemes = {k: v for k, v in (("v2", v2), ("v3", v3)) if v}
+    write_zip(path, entries, signing_block(schemes) if schemes else b"", zip64=zip64)
+    return path
+
+
+DEBUG_CERT = certificate("Android Debug", serial=1)
+RELEASE_CERT = certificate("Example Corp", serial=0x218330DF)
+CA_CERT = certificate("Example Root CA", serial=7)
+CHAIN_LEAF = certificate("Example Signer", issuer_cn="Example Root CA", serial=0)
+
+
+def build_all(out_dir):
+    """The standard fixture set: {name: path}."""
+    os.makedirs(out_dir, exist_ok=True)
+    specs = {
+        "debug": dict(package="com.example.evil", debuggable=True, allow_backup=True,
+                      permissions=("android.permission.READ_SMS", "android.permission.INTERNET",
+                                   "android.permission.CAMERA"),
+                      v1=[DEBUG_CERT], v2=[[DEBUG_CERT]]),
+        "release_utf16": dict(package="com.example.good", utf8=False, v2=[[RELEASE_CERT]], v3=[[RELEASE_CERT]]),
+        "v1_only": dict(package="org.example.v1", v1=[RELEASE_CERT]),
+        "chain": dict(package="com.example.chain", v1=[CA_CERT, CHAIN_LEAF], v2=[[CHAIN_LEAF, CA_CERT]]),
+        "zip64": dict(package="com.example.zip64", zip64=True, v2=[[RELEASE_CERT]]),
+        "unsigned": dict(package="com.example.unsigned"),
+    }
+    return {name: build_apk(os.path.join(out_dir, f"{name}.apk"), **spec) for name, spec in specs.items()}
+
+
+if __name__ == "__main__":
+    for name, path in build_all(sys.argv[1] if len(sys.argv) > 1 else "apk_fixtures").items():
+        print(f"✓ {name}: {path} ({os.path.getsize(path)} bytes)")
@@ -0,0 +1,95 @@
+"""Compare per-keyword str.count scans with the single-pass PatternMatcher.
+
+Whole dumps (count_behavior) use str.count, streamed lines (BehaviorCounter)
+use the matcher; both layouts are measured with both methods so the choice
+can be rechecked on real captures.
+
+    python -m benchmarks.bench_behavior --mb 200
+    python -m benchmarks.bench_behavior --log captured_logcat.txt
+"""
+import argparse
+import random
+import time
+from collections import Counter
+
+from app.behavior import BEHAVIOR_PATTERNS, DEFAULT_MATCHER, BehaviorCounter, count_behavior
+
+NOISE = ["ActivityManager", "Start", "proc", "com.example.app", "GET", "I/chromium", "OpenGLRenderer",
+         "Choreographer", "Skipped", "frames", "vsync", "binder", "transaction", "pid", "uid", "W/System"]
+KEYWORDS = [kw for kws in BEHAVIOR_PATTERNS.values() for kw in kws]
+
+
+def synthetic_log(target_mb, hit_ratio=0.1, seed=1):
+    rng = random.Random(seed)
+    lines = []
+    for i in range(50000):
+        line = f"11-09 14:49:30.150  1234  5678 D Tag{i % 50}: " + " ".join(rng.choice(NOISE) for _ in range(12))
+        if rng.random() < hit_ratio:
+            line += " " + rng.choice(KEYWORDS)
+        lines.append(line)
+    block = "\n".join(lines) + "\n"
+    return block * max(1, int(target_mb * 1e6 // len(block)))
+
+
+def matcher_whole(logs):
+    counts = DEFAULT_MATCHER.count(logs)
+    return {k: counts[k] for k in BEHAVIOR_PATTERNS if counts[k] > 0}
+
+
+def legacy_lines(lines):
+    counts = Counter()
+    for line in lines:
+        for category, kws in BEHAVIOR_PATTERNS.items():
+            for kw in kws:
+                n = line.count(kw)
+                if n:
+                    counts[category] += n
+    return {k: counts[k] for k in BEHAVIOR_PATTERNS if counts[k] > 0}
+
+
+def matcher_lines(lines):
+    counter = BehaviorCounter()
+    for line in lines:
+        counter.feed(line)
+    return counter.summary()
+
+
+def timed(fn, arg, repeat):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn(arg)
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--mb", type=float, default=100, help="size of the synthetic log")
+    parser.add_argument("--log", help="benchmark a captured logcat text file instead")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.log:
+        with open(args.log, encoding="utf-8", errors="replace") as f:
+            logs = f.read()
+    else:
+        logs = synthetic_log(args.mb)
+    lines = logs.splitlines(keepends=True)
+    mb = len(logs) / 1e6
+    print(f"Log: {mb:.1f} MB, {len(lines)} lines, {len(KEYWORDS)} keywords")
+
+    rows = [
+        ("whole dump", count_behavior, matcher_whole, logs),      # production: str.count
+        ("streamed lines", legacy_lines, matcher_lines, lines),   # production: single pass
+    ]
+    for name, old, new, arg in rows:
+        t_old, r_old = timed(old, arg, args.repeat)
+        t_new, r_new = timed(new, arg, args.repeat)
+        assert r_old == r_new, f"{name}: results differ\n{r_old}\n{r_new}"
+        print(f"{name:>15}: str.count x{len(KEYWORDS)} {t_old:7.3f}s ({mb / t_old:6.1f} MB/s) | "
+              f"single pass {t_new:7.3f}s ({mb / t_new:6.1f} MB/s) | speedup {t_old / t_new:4.2f}x")
+
+
+if __name__ == "__main__":
+    main()
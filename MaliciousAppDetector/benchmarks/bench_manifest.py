@@ -0,0 +1,63 @@
+"""Compare the in-process AXML manifest decoder with `aapt dump badging`.
+
+    python -m benchmarks.bench_manifest path/to/app.apk [more.apk ...] --repeat 20
+
+aapt is only measured when it is on PATH; its package name is checked against
+the decoder's for every APK.
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import time
+
+from app.apk_manifest import read_manifest
+
+
+def aapt_package(apk_path):
+    out = subprocess.run(["aapt", "dump", "badging", apk_path], capture_output=True, text=True, timeout=15).stdout
+    for line in out.split("\n"):
+        if line.startswith("package:"):
+            return line.split("name='")[1].split("'")[0]
+    return None
+
+
+def decoder_package(apk_path):
+    return read_manifest(apk_path)["package"]
+
+
+def measure(fn, apk_path, repeat):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn(apk_path)
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples), max(samples), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("apks", nargs="+")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    aapt = shutil.which("aapt")
+    if not aapt:
+        print("aapt not on PATH: only the decoder is measured")
+    print(f"{'apk':<40}{'size':>9} | {'decoder p50/max':>22} | {'aapt p50/max':>22} | speedup")
+    for path in args.apks:
+        size = os.path.getsize(path) / 1e6
+        d_med, d_max, d_pkg = measure(decoder_package, path, args.repeat)
+        line = f"{os.path.basename(path):<40}{size:>7.2f}MB | {d_med * 1e3:9.3f}ms {d_max * 1e3:9.3f}ms | "
+        if aapt:
+            a_med, a_max, a_pkg = measure(aapt_package, path, args.repeat)
+            agree = "" if a_pkg == d_pkg else f"  MISMATCH aapt={a_pkg} decoder={d_pkg}"
+            line += f"{a_med * 1e3:9.3f}ms {a_max * 1e3:9.3f}ms | {a_med / d_med:6.1f}x{agree}"
+        else:
+            line += f"{'-':>22} | -"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""Latency, throughput and peak memory of feature extraction, inference and training.
+
+    python -m benchmarks.bench_ml
+    python -m benchmarks.bench_ml --quick --output results.json
+    python -m benchmarks.bench_ml --compare benchmarks/results/previous.json
+
+Uses the bundled reports in model/reports plus synthetic variants scaled up
+x4/x16 (every list/dict section replicated), so the effect of report size is
+visible. Results are saved as JSON; --compare prints the p50 change against
+an earlier run so regressions between versions stand out.
+"""
+import argparse
+import copy
+import glob
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import sklearn
+
+from app.forest import ForestModel, forest_to_arrays
+from app.ml_model import FEATURE_NAMES, classify_batch, classify_report, extract_features, train_dummy_model
+from app.report_stream import extract_features_from_file
+
+ROOT = os.path.dirname(os.path.dirname(__file__))
+DEFAULT_REPORTS = os.path.join(ROOT, "model", "reports")
+DEFAULT_OUTPUT_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+
+# --- INPUTS ---
+def _replicate(value, factor):
+    if isinstance(value, list):
+        return value * factor
+    if isinstance(value, dict):
+        out = dict(value)
+        for i in range(1, factor):
+            out.update({f"{k}#{i}": v for k, v in value.items()})
+        return out
+    return value
+
+
+def scale_report(report, factor):
+    """Copy of `report` with every list/dict section of the static report replicated `factor` times."""
+    if factor == 1:
+        return report
+    scaled = copy.deepcopy(report)
+    rep = scaled.get("static_analysis", {}).get("full_report") or {}
+    for key, value in rep.items():
+        if key in ("manifest_analysis", "code_analysis", "strings"):
+            rep[key] = {k: _replicate(v, factor) if k != "manifest_summary" and k != "summary" else v
+                        for k, v in value.items()} if isinstance(value, dict) else value
+        elif key != "certificate_analysis":
+            rep[key] = _replicate(value, factor)
+    return scaled
+
+
+def load_reports(directory, scales):
+    cases = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        with open(path) as f:
+            report = json.load(f)
+        for factor in scales:
+            cases.append((f"{os.path.splitext(os.path.basename(path))[0]}@x{factor}", scale_report(report, factor)))
+    return cases
+
+
+# --- MEASUREMENT ---
+def measure(fn, repeat, warmup=1, items=1):
+    """Time `fn` `repeat` times, then run it once more under tracemalloc for peak memory."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    # tracemalloc slows allocation-heavy code a lot, so it never overlaps the timed runs
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    s = np.asarray(samples) * 1e3
+    return {
+        "repeat": repeat,
+        "items": items,
+        "p50_ms": round(float(np.percentile(s, 50)), 4),
+        "p90_ms": round(float(np.percentile(s, 90)), 4),
+        "p99_ms": round(float(np.percentile(s, 99)), 4),
+        "mean_ms": round(float(s.mean()), 4),
+        "throughput_per_s": round(items / (float(np.median(s)) / 1e3), 2) if s.any() else None,
+        "peak_mb": round(peak / 1e6, 3),
+    }
+
+
+def bench_extraction(cases, repeat, tmp_dir):
+    results = {}
+    for name, report in cases:
+        path = os.path.join(tmp_dir, f"{name}.json")
+        with open(path, "w") as f:
+            json.dump(report, f, indent=4)
+        size = os.path.getsize(path)
+        results[f"{name}/in_memory"] = {"report_mb": round(size / 1e6, 3),
+                                        **measure(lambda: extract_features(report), repeat)}
+        results[f"{name}/from_file"] = {"report_mb": round(size / 1e6, 3),
+                                        **measure(lambda: extract_features_from_file(path), repeat)}
+        print(f"  extract {name:<34} {size / 1e6:7.2f}MB  in-memory p50 "
+              f"{results[f'{name}/in_memory']['p50_ms']:8.3f}ms  from file p50 "
+              f"{results[f'{name}/from_file']['p50_ms']:8.3f}ms")
+    return results
+
+
+def bench_single(models, cases, repeat):
+    results = {}
+    report = cases[0][1]
+    for model_name, model in models.items():
+        results[model_name] = measure(lambda: classify_report(report, model), repeat)
+        print(f"  single  {model_name:<34} p50 {results[model_name]['p50_ms']:8.3f}ms "
+              f"p99 {results[model_name]['p99_ms']:8.3f}ms")
+    return results
+
+
+def bench_batch(models, rows, batch_sizes, repeat):
+    results = {}
+    for model_name, model in models.items():
+        for size in batch_sizes:
+            batch = [rows[i % len(rows)] for i in range(size)]
+            key = f"{model_name}/batch{size}"
+            results[key] = measure(lambda: classify_batch(model, feature_rows=batch), repeat, items=size)
+            print(f"  batch   {key:<34} p50 {results[key]['p50_ms']:8.3f}ms "
+                  f"{results[key]['throughput_per_s']:>12,.0f} rows/s")
+    return results
+
+
+def bench_training(sample_sizes, repeat):
+    results = {}
+    for n in sample_sizes:
+        key = f"samples{n}"
+        results[key] = measure(lambda: train_dummy_model(samples=n, random_state=0), repeat, warmup=0, items=n)
+        print(f"  train   {key:<34} p50 {results[key]['p50_ms']:8.1f}ms  peak {results[key]['peak_mb']:.1f}MB")
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=ROOT, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "sklearn": sklearn.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def compare(current, previous):
+    print(f"\n{'case':<60}{'before':>12}{'after':>12}{'change':>10}")
+    for group, cases in current["results"].items():
+        for name, r in cases.items():
+            old = previous.get("results", {}).get(group, {}).get(name)
+            if not old or not old.get("p50_ms"):
+                continue
+            change = r["p50_ms"] / old["p50_ms"] - 1
+            flag = "  <-- slower" if change > 0.1 else ""
+            print(f"{group + '/' + name:<60}{old['p50_ms']:>10.3f}ms{r['p50_ms']:>10.3f}ms{change:>+9.0%}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reports", default=DEFAULT_REPORTS)
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 32, 256, 1024])
+    parser.add_argument("--train-samples", type=int, nargs="+", default=[200, 2000, 20000])
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--quick", action="store_true", help="small scales and few repeats, for CI")
+    parser.add_argument("--output", default=None, help="JSON path (default: benchmarks/results/bench_ml-<time>.json)")
+    parser.add_argument("--compare", default=None, help="earlier results JSON to diff against")
+    args = parser.parse_args()
+    if args.quick:
+        args.scales, args.repeat = [1, 4], 5
+        args.batch_sizes, args.train_samples = [1, 256], [200, 2000]
+
+    cases = load_reports(args.reports, args.scales)
+    if not cases:
+        parser.error(f"no reports found in {args.reports}")
+    estimator = train_dummy_model(random_state=0)
+    models = {
+        "sklearn": estimator,
+        "packed_forest": ForestModel(forest_to_arrays(estimator), estimator.classes_),
+    }
+    rows = [{k: extract_features(r)[k] for k in FEATURE_NAMES} for _, r in cases]
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        print("Feature extraction")
+        results["extraction"] = bench_extraction(cases, args.repeat, tmp_dir)
+    print("Single inference")
+    results["single_inference"] = bench_single(models, cases, args.repeat * 10)
+    print("Batch inference")
+    results["batch_inference"] = bench_batch(models, rows, args.batch_sizes, args.repeat)
+    print("Training")
+    results["training"] = bench_training(args.train_samples, max(1, args.repeat // 10))
+
+    output = {"environment": environment(), "config": vars(args), "results": results}
+    path = args.output or os.path.join(DEFAULT_OUTPUT_DIR, f"bench_ml-{datetime.utcnow():%Y%m%d_%H%M%S}.json")
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(output, f, indent=2)
+    print(f"\n✓ Results written to {path}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(output, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
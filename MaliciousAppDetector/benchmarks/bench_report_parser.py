@@ -0,0 +1,64 @@
+"""Compare json.load + extract_features with the section-skipping report parser.
+
+    python -m benchmarks.bench_report_parser
+    python -m benchmarks.bench_report_parser --reports path/to/reports --repeat 20
+
+Each report is measured as stored (indented) and re-serialised compactly, the
+shape MobSF's own API returns.
+"""
+import argparse
+import glob
+import json
+import os
+import time
+import tracemalloc
+
+from app.ml_model import extract_features
+from app.report_stream import parse_feature_sections
+
+DEFAULT_REPORTS = os.path.join(os.path.dirname(os.path.dirname(__file__)), "model", "reports")
+
+
+def full_parse(data):
+    return extract_features(json.loads(data))
+
+
+def section_parse(data):
+    return extract_features(parse_feature_sections(data))
+
+
+def measure(fn, data, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn(data)
+        best = min(best, time.perf_counter() - t0)
+    tracemalloc.start()
+    fn(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reports", default=DEFAULT_REPORTS)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'report':<34}{'layout':<9}{'size':>9} | {'json.load':>20} | {'sections':>20} | speedup")
+    for path in sorted(glob.glob(os.path.join(args.reports, "*.json"))):
+        with open(path, "rb") as f:
+            pretty = f.read()
+        compact = json.dumps(json.loads(pretty)).encode()
+        for layout, data in (("indented", pretty), ("compact", compact)):
+            t_full, m_full, r_full = measure(full_parse, data, args.repeat)
+            t_sec, m_sec, r_sec = measure(section_parse, data, args.repeat)
+            assert r_full == r_sec, f"feature mismatch for {path} ({layout})"
+            print(f"{os.path.basename(path):<34}{layout:<9}{len(data) / 1e6:>7.2f}MB | "
+                  f"{t_full * 1e3:7.2f}ms {m_full / 1e6:7.2f}MB peak | "
+                  f"{t_sec * 1e3:7.2f}ms {m_sec / 1e6:7.2f}MB peak | {t_full / t_sec:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Measure MinHash signature and LSH lookup latency of the similarity index.
+
+    python -m benchmarks.bench_similarity --apks 20000 --queries 500
+
+Synthetic APKs are built as families of repackaged variants (shared code
+strings and permissions, a few strings changed per variant) and indexed into a
+throwaway SQLite file; queries are fresh variants of the same families.
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from app.similarity import SimilarityIndex
+
+
+def variant(rng, base, churn):
+    strings = set(rng.sample(sorted(base["strings"]), int(len(base["strings"]) * (1 - churn))))
+    strings.update(f"s{rng.getrandbits(48)}" for _ in range(len(base["strings"]) - len(strings)))
+    return {"code": {f"dex:{rng.getrandbits(128):032x}"}, "permissions": base["permissions"], "strings": strings}
+
+
+def families(rng, count, strings):
+    perms = [f"android.permission.P{i}" for i in range(60)]
+    return [{"permissions": set(rng.sample(perms, rng.randint(3, 20))),
+             "strings": {f"s{rng.getrandbits(48)}" for _ in range(strings)}} for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--apks", type=int, default=20000)
+    parser.add_argument("--families", type=int, default=2000)
+    parser.add_argument("--strings", type=int, default=2000, help="code strings per APK")
+    parser.add_argument("--churn", type=float, default=0.1, help="share of strings changed per variant")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    bases = families(rng, args.families, args.strings)
+    with tempfile.TemporaryDirectory() as tmp:
+        index = SimilarityIndex(os.path.join(tmp, "similarity.db"))
+        t0 = time.perf_counter()
+        signatures = [index.signature(variant(rng, bases[i % len(bases)], args.churn)) for i in range(args.apks)]
+        sign_s = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        for i, sig in enumerate(signatures):
+            index.add(f"{i:064x}", sig, label="malicious" if i % 3 == 0 else "benign")
+        add_s = time.perf_counter() - t0
+
+        samples, hits = [], 0
+        for q in range(args.queries):
+            family = rng.randrange(len(bases))
+            sig = index.signature(variant(rng, bases[family], args.churn))
+            t0 = time.perf_counter()
+            neighbours = index.query(sig)
+            samples.append(time.perf_counter() - t0)
+            hits += any(int(n["sha256"], 16) % len(bases) == family for n in neighbours)
+        index.close()
+
+    samples.sort()
+    print(f"signature: {sign_s / args.apks * 1e3:.3f} ms/APK ({args.strings} strings)")
+    print(f"index add: {add_s / args.apks * 1e3:.3f} ms/APK (SQLite commit included)")
+    print(f"lookup over {args.apks} APKs: p50 {statistics.median(samples) * 1e3:.3f} ms, "
+          f"p99 {samples[int(len(samples) * 0.99) - 1] * 1e3:.3f} ms, "
+          f"family found in {hits / args.queries:.1%} of queries")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Check the in-process APK parsers against synthetic APKs with known contents.
+
+    python -m benchmarks.check_apk_parsers [--keep out_dir]
+
+Covers the AXML decoder (UTF-8 and UTF-16 string pools), signer extraction
+(v1/v2/v3, debug vs release certificates, chain certificates, zero serials)
+and the zip index (ZIP64 records, CRCs and hashes against zipfile/hashlib).
+Exits non-zero if any check fails.
+"""
+import argparse
+import hashlib
+import sys
+import tempfile
+import zipfile
+
+from app.apk_index import open_apk_index
+from app.apk_manifest import read_manifest
+from app.apk_signing import read_signing_info
+from app.triage import triage_apk
+from benchmarks.apk_fixtures import build_all
+
+failures = []
+
+
+def check(name, actual, expected):
+    if actual == expected:
+        print(f"✓ {name}")
+    else:
+        failures.append(name)
+        print(f"✗ {name}: expected {expected!r}, got {actual!r}")
+
+
+def check_manifests(apks):
+    for name in ("debug", "release_utf16"):
+        m = read_manifest(apks[name])
+        pool = "UTF-16" if name == "release_utf16" else "UTF-8"
+        package = "com.example.good" if name == "release_utf16" else "com.example.evil"
+        check(f"{pool} pool: package", m["package"], package)
+        check(f"{pool} pool: version", (m["version_code"], m["version_name"]), (42, "1.2.3"))
+        check(f"{pool} pool: sdk", (m["min_sdk"], m["target_sdk"], m["max_sdk"]), (21, 33, None))
+        check(f"{pool} pool: components", {k: [c["name"] for c in v] for k, v in m["components"].items() if v}, {
+            "activities": [f"{package}.Activity0", f"{package}.Activity1"],
+            "receivers": [f"{package}.Receiver"],
+            "services": [f"{package}.Service"],
+        })
+        check(f"{pool} pool: exported", [c["exported"] for c in m["components"]["activities"]], [True, False])
+    debug = read_manifest(apks["debug"])
+    check("debug manifest flags", (debug["debuggable"], debug["allow_backup"]), (True, True))
+    check("debug manifest permissions", debug["permissions"],
+          ["android.permission.READ_SMS", "android.permission.INTERNET", "android.permission.CAMERA"])
+    check("debug manifest dangerous permissions", sorted(debug["dangerous_permissions"]),
+          ["android.permission.CAMERA", "android.permission.READ_SMS"])
+    release = read_manifest(apks["release_utf16"])
+    check("release manifest flags", (release["debuggable"], release["allow_backup"]), (False, None))
+
+
+def check_signers(apks):
+    debug = read_signing_info(apks["debug"])
+    check("debug schemes", debug["schemes"], ["v1", "v2"])
+    check("debug signer (v1 and v2 deduplicated)", [c["is_debug"] for c in debug["certificates"]], [True])
+    release = read_signing_info(apks["release_utf16"])
+    check("release schemes", release["schemes"], ["v2", "v3"])
+    check("release signer", [(c["subject"], c["serial"], c["is_debug"]) for c in release["certificates"]],
+          [("C=US, O=Android, CN=Example Corp", "0x218330df", False)])
+    check("release validity", (release["certificates"][0]["not_before"], release["certificates"][0]["not_after"]),
+          ("2020-01-01T00:00:00+00:00", "2045-01-01T00:00:00+00:00"))
+    v1_only = read_signing_info(apks["v1_only"])
+    check("v1-only schemes", v1_only["schemes"], ["v1"])
+    check("v1-only signer is the v2 signer", [c["sha256"] for c in v1_only["certificates"]],
+          [c["sha256"] for c in release["certificates"]])
+    chain = read_signing_info(apks["chain"])
+    check("chain certificates dropped (v2 [leaf, CA], v1 [CA, leaf])",
+          [(c["subject"], c["issuer"]) for c in chain["certificates"]],
+          [("C=US, O=Android, CN=Example Signer", "C=US, O=Android, CN=Example Root CA")])
+    check("zero serial", chain["certificates"][0]["serial"], "0x0")
+    check("unsigned", read_signing_info(apks["unsigned"]), {"schemes": [], "certificates": []})
+
+
+def check_zip(apks):
+    for name in ("debug", "zip64"):
+        index = open_apk_index(apks[name])
+        with zipfile.ZipFile(apks[name]) as zf:
+            expected = {i.filename: (i.CRC, i.file_size, i.compress_size, hashlib.sha256(zf.read(i)).hexdigest())
+                        for i in zf.infolist()}
+        actual = {e["name"]: (e["crc32"], e["size"], e["compressed_size"], index.sha256(e["name"]))
+                  for e in index.entries}
+        check(f"{name} entries match zipfile", actual, expected)
+    check("zip64 signing block", read_signing_info(apks["zip64"])["schemes"], ["v2"])
+    check("zip64 manifest", read_manifest(apks["zip64"])["package"], "com.example.zip64")
+
+
+def check_triage(apks):
+    debug = triage_apk(apks["debug"])
+    check("triage debug", (debug["status"], debug["features"]["is_debuggable"],
+                           debug["features"]["is_signed_with_debug_cert"]), ("success", 1, 1))
+    release = triage_apk(apks["release_utf16"])
+    check("triage release", (release["status"], release["features"]["is_signed_with_debug_cert"]), ("success", 0))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keep", metavar="DIR", help="write the fixture APKs here instead of a temporary directory")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        apks = build_all(args.keep or tmp)
+        check_manifests(apks)
+        check_signers(apks)
+        check_zip(apks)
+        check_triage(apks)
+    print(f"{'✗' if failures else '✓'} {len(failures)} failed check(s)")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
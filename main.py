@@ -3,7 +3,10 @@ from supabase import create_client, Client
 from pydantic import BaseModel
 from dotenv import load_dotenv
 import os
-import requests
+import hashlib
+import tempfile
+from contextlib import asynccontextmanager
+import httpx
 
 # Load environment variables
 load_dotenv(override=True)
@@ -12,6 +15,8 @@ SUPABASE_URL = os.getenv("SUPABASE_URL", "").strip()
 SUPABASE_KEY = os.getenv("SUPABASE_KEY", "").strip()
 MOBSF_API_KEY = os.getenv("MOBSF_API_KEY", "").strip()
 MOBSF_URL = os.getenv("MOBSF_URL", "http://127.0.0.1:8001/api/v1").strip()
+MAX_UPLOAD_SIZE = int(os.getenv("MAX_UPLOAD_SIZE", str(300 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = 1024 * 1024
 
 if not SUPABASE_URL or not SUPABASE_KEY or not MOBSF_API_KEY:
     raise RuntimeError("Missing SUPABASE_URL, SUPABASE_KEY, or MOBSF_API_KEY in .env")
@@ -26,7 +31,15 @@ class LogEntry(BaseModel):
     severity: str
     message: str
 
-app = FastAPI(title="Capstone Backend", description="Malicious APK Detector 🚀")
+# One pooled client for every MobSF call, so connections are reused across requests
+mobsf_http = httpx.AsyncClient(timeout=300.0)
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    await mobsf_http.aclose()
+
+app = FastAPI(title="Capstone Backend", description="Malicious APK Detector 🚀", lifespan=lifespan)
 
 @app.get("/")
 def root():
@@ -47,14 +60,36 @@ def get_logs():
         raise HTTPException(status_code=500, detail=f"Failed to fetch logs: {resp['error']}")
     return {"logs": resp.data}
 
+async def save_upload_to_temp(file: UploadFile):
+    """Stream the upload to disk in chunks, hashing as we go. Returns (path, sha256, md5)."""
+    sha256, md5, size = hashlib.sha256(), hashlib.md5(), 0
+    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".apk")
+    try:
+        with tmp:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > MAX_UPLOAD_SIZE:
+                    raise HTTPException(status_code=413, detail=f"Upload exceeds {MAX_UPLOAD_SIZE} bytes")
+                sha256.update(chunk)
+                md5.update(chunk)
+                tmp.write(chunk)
+    except BaseException:
+        try:
+            os.remove(tmp.name)
+        except OSError:
+            pass
+        raise
+    return tmp.name, sha256.hexdigest(), md5.hexdigest()
+
 @app.post("/analyze-apk/")
 async def analyze_apk(file: UploadFile = File(...)):
+    apk_path, apk_sha256, apk_md5 = await save_upload_to_temp(file)
     try:
-        # Upload APK to MobSF
-        file_content = await file.read()
-        files = {"file": (file.filename, file_content, "application/octet-stream")}
+        # Upload APK to MobSF, streaming the multipart body from disk
         headers = {"Authorization": MOBSF_API_KEY}
-        upload_resp = requests.post(f"{MOBSF_URL}/upload", files=files, headers=headers)
+        with open(apk_path, "rb") as fh:
+            files = {"file": (file.filename, fh, "application/octet-stream")}
+            upload_resp = await mobsf_http.post(f"{MOBSF_URL}/upload", files=files, headers=headers)
 
         try:
             upload_json = upload_resp.json()
@@ -67,17 +102,17 @@ async def analyze_apk(file: UploadFile = File(...)):
         apk_hash = upload_json["hash"]
 
         # Scan APK
-        scan_resp = requests.post(
+        scan_resp = (await mobsf_http.post(
             f"{MOBSF_URL}/scan",
             json={"hash": apk_hash},
             headers={"Authorization": MOBSF_API_KEY, "Content-Type": "application/json"}
-        ).json()
+        )).json()
 
         # Get report
-        report_resp = requests.get(
+        report_resp = (await mobsf_http.get(
             f"{MOBSF_URL}/report_json/{apk_hash}/",
             headers={"Authorization": MOBSF_API_KEY}
-        ).json()
+        )).json()
 
         # Extract findings
         keywords = ["debug", "root", "strandhogg", "vulnerable"]
@@ -112,9 +147,14 @@ async def analyze_apk(file: UploadFile = File(...)):
                 "severity": "High" if "root" in f.lower() or "strandhogg" in f.lower() else "Medium"
             }).execute()
 
-        return {"status": "success", "findings": findings}
+        return {"status": "success", "sha256": apk_sha256, "md5": apk_md5, "findings": findings}
 
     except HTTPException as e:
         raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"APK scan failed: {e}")
+    finally:
+        try:
+            os.remove(apk_path)
+        except OSError:
+            pass